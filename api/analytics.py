@@ -0,0 +1,368 @@
+import os
+import random
+import asyncio
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from neo4j.exceptions import ClientError
+from database import Neo4jClient, neo4j_client
+from snapshot import GraphSnapshot
+
+# Network name -> (GDS projection, relationship type, orientation), as in scripts/gds.md;
+# the projection of a graph generation is named "<projection>-<epoch>-<generation>"
+NETWORKS = {
+    "formal": ("formal-network", "REPORTS_TO", "NATURAL"),
+    "informal": ("informal-network", "FRIENDS_WITH", "UNDIRECTED"),
+}
+
+GDS_VERSION_QUERY = "RETURN gds.version() as version"
+
+GDS_DROP_QUERY = "CALL gds.graph.drop($graph, false) YIELD graphName RETURN graphName"
+
+GDS_EXISTS_QUERY = "CALL gds.graph.exists($graph) YIELD exists RETURN exists"
+
+GDS_LIST_QUERY = "CALL gds.graph.list() YIELD graphName RETURN graphName"
+
+GDS_PROJECT_QUERY = """
+    CALL gds.graph.project($graph, 'Employee', $relationships)
+    YIELD graphName, nodeCount, relationshipCount
+    RETURN graphName, nodeCount, relationshipCount
+"""
+
+GDS_LOUVAIN_QUERY = """
+    CALL gds.louvain.stream($graph)
+    YIELD nodeId, communityId
+    RETURN gds.util.asNode(nodeId).name as name, communityId as community
+"""
+
+GDS_CENTRALITY_QUERIES = {
+    "pagerank": """
+        CALL gds.pageRank.stream($graph)
+        YIELD nodeId, score
+        RETURN gds.util.asNode(nodeId).name as name, score
+    """,
+    "betweenness": """
+        CALL gds.betweenness.stream($graph, $config)
+        YIELD nodeId, score
+        RETURN gds.util.asNode(nodeId).name as name, score
+    """,
+}
+
+
+def louvain(node_count: int, edges: Iterable[Tuple[int, int]], max_levels: int = 10) -> List[int]:
+    """Community of every node, by the Louvain method on the undirected graph of edges"""
+    # Weighted adjacency of the current level; in an aggregated graph the self loop of a
+    # node holds twice the weight of the edges inside it, so degrees stay sum(row)
+    adjacency: List[Dict[int, float]] = [{} for _ in range(node_count)]
+    for a, b in edges:
+        if a != b:
+            adjacency[a][b] = adjacency[a].get(b, 0) + 1
+            adjacency[b][a] = adjacency[b].get(a, 0) + 1
+
+    membership = list(range(node_count))
+    for _ in range(max_levels):
+        communities, moved = _louvain_level(adjacency)
+        if not moved:
+            break
+        ids: Dict[int, int] = {}
+        communities = [ids.setdefault(community, len(ids)) for community in communities]
+        membership = [communities[community] for community in membership]
+        aggregated: List[Dict[int, float]] = [{} for _ in range(len(ids))]
+        for node, neighbours in enumerate(adjacency):
+            row = aggregated[communities[node]]
+            for other, weight in neighbours.items():
+                community = communities[other]
+                row[community] = row.get(community, 0) + weight
+        adjacency = aggregated
+    return membership
+
+
+def _louvain_level(adjacency: List[Dict[int, float]], max_passes: int = 50) -> Tuple[List[int], bool]:
+    """Local moving phase: move nodes to the neighbouring community with the best modularity gain"""
+    node_count = len(adjacency)
+    degrees = [sum(neighbours.values()) for neighbours in adjacency]
+    total_weight = sum(degrees)
+    communities = list(range(node_count))
+    if total_weight == 0:
+        return communities, False
+    totals = list(degrees)
+    moved = False
+    for _ in range(max_passes):
+        improved = False
+        for node in range(node_count):
+            current = communities[node]
+            degree = degrees[node]
+            links: Dict[int, float] = {}
+            for other, weight in adjacency[node].items():
+                if other != node:
+                    links[communities[other]] = links.get(communities[other], 0) + weight
+            totals[current] -= degree
+            best = current
+            best_gain = links.get(current, 0) - totals[current] * degree / total_weight
+            for community, weight in links.items():
+                gain = weight - totals[community] * degree / total_weight
+                if gain > best_gain + 1e-12:
+                    best, best_gain = community, gain
+            totals[best] += degree
+            if best != current:
+                communities[node] = best
+                improved = moved = True
+        if not improved:
+            break
+    return communities, moved
+
+
+def pagerank(node_count: int, edges: List[Tuple[int, int]], damping: float = 0.85,
+             max_iterations: int = 20, tolerance: float = 1e-7) -> np.ndarray:
+    """PageRank with the GDS defaults and scale: every node starts at, and gets at least, 1 - damping"""
+    scores = np.full(node_count, 1 - damping)
+    if not edges:
+        return scores
+    sources, targets = np.array(edges, dtype=np.int64).T
+    out_degrees = np.bincount(sources, minlength=node_count)
+    for _ in range(max_iterations):
+        shares = np.divide(scores, out_degrees, out=np.zeros(node_count), where=out_degrees > 0)
+        updated = (1 - damping) + damping * np.bincount(targets, weights=shares[sources], minlength=node_count)
+        converged = np.abs(updated - scores).max() < tolerance
+        scores = updated
+        if converged:
+            break
+    return scores
+
+
+def betweenness(node_count: int, edges: List[Tuple[int, int]], directed: bool,
+                sampling_size: Optional[int] = None, seed: int = 42) -> List[float]:
+    """Brandes betweenness centrality, from sampling_size random sources when given.
+
+    Sampled scores are scaled up to the whole graph; on an undirected graph each pair of
+    nodes counts once.
+    """
+    neighbours = [set() for _ in range(node_count)]
+    for a, b in edges:
+        if a != b:
+            neighbours[a].add(b)
+            if not directed:
+                neighbours[b].add(a)
+    sources: Iterable[int] = range(node_count)
+    if sampling_size and sampling_size < node_count:
+        sources = random.Random(seed).sample(range(node_count), sampling_size)
+    scores = [0.0] * node_count
+    for source in sources:
+        stack = []
+        paths = {source: 1}
+        distances = {source: 0}
+        predecessors: Dict[int, List[int]] = {source: []}
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            stack.append(node)
+            for other in neighbours[node]:
+                if other not in distances:
+                    distances[other] = distances[node] + 1
+                    paths[other] = 0
+                    predecessors[other] = []
+                    queue.append(other)
+                if distances[other] == distances[node] + 1:
+                    paths[other] += paths[node]
+                    predecessors[other].append(node)
+        dependencies = dict.fromkeys(stack, 0.0)
+        while stack:
+            node = stack.pop()
+            for predecessor in predecessors[node]:
+                dependencies[predecessor] += paths[predecessor] / paths[node] * (1 + dependencies[node])
+            if node != source:
+                scores[node] += dependencies[node]
+    scale = node_count / sampling_size if sampling_size and sampling_size < node_count else 1.0
+    if not directed:
+        scale /= 2
+    return [score * scale for score in scores]
+
+
+def network_edges(snapshot: GraphSnapshot, network: str) -> List[Tuple[int, int]]:
+    """(from, to) node pairs of the relationships of a network, each pair once"""
+    edges = set(snapshot.edge_pairs(snapshot.reports_to if network == "formal" else snapshot.friends_with))
+    if NETWORKS[network][2] == "UNDIRECTED":
+        edges = {(min(pair), max(pair)) for pair in edges}
+    return sorted(edges)
+
+
+def group_communities(assignments: Iterable[Tuple[str, int]]) -> List[List[str]]:
+    """Members of every community, largest first, then by first member name"""
+    groups: Dict[int, List[str]] = {}
+    for name, community in assignments:
+        groups.setdefault(community, []).append(name)
+    return sorted((sorted(members) for members in groups.values()), key=lambda members: (-len(members), members[0]))
+
+
+class GraphAnalytics:
+    """Community detection and centrality on the formal and informal networks.
+
+    Runs on the Neo4j GDS plugin when it is installed, reusing one in-memory projection per
+    network until the graph generation changes, and otherwise on the GraphSnapshot in
+    Python/NumPy. Results are memoized for the current generation.
+    """
+
+    def __init__(self, client: Neo4jClient):
+        self.client = client
+        # "auto" uses GDS when the plugin answers, "gds" or "python" force a backend
+        self.backend_setting = os.getenv("ANALYTICS_BACKEND", "auto").lower()
+        self._gds_available: Optional[bool] = None
+        # Network -> (generation, projection name)
+        self._projections: Dict[str, Tuple[int, str]] = {}
+        self._projection_lock = asyncio.Lock()
+        self._results: Dict[tuple, object] = {}
+        self._results_generation: Optional[int] = None
+
+    async def backend(self) -> str:
+        """"gds" or "python", probing the plugin once"""
+        if self.backend_setting in ("gds", "python"):
+            return self.backend_setting
+        if self._gds_available is None:
+            try:
+                await self.client._read_async("gds_version", GDS_VERSION_QUERY)
+                self._gds_available = True
+            except ClientError as e:
+                # Unknown function: the plugin is not installed
+                print(f"GDS plugin not available, running analytics in Python: {e}")
+                self._gds_available = False
+            except Exception as e:
+                # Not connected (e.g. snapshot only), ask again next time
+                print(f"Could not probe the GDS plugin, running analytics in Python: {e}")
+                return "python"
+        return "gds" if self._gds_available else "python"
+
+    async def _memo(self, key: tuple, compute: Callable):
+        generation = self.client.generation.value
+        if self._results_generation != generation:
+            self._results = {}
+            self._results_generation = generation
+        if key not in self._results:
+            result = await compute()
+            # Only keep it if no write happened meanwhile
+            if self.client.generation.value == generation:
+                self._results[key] = result
+            return result
+        return self._results[key]
+
+    async def _projection(self, network: str) -> str:
+        """Name of the GDS projection of network for the current graph generation.
+
+        GDS graph names are global to the database, and every worker process (see serve.py)
+        keeps its own memo: naming the projection by generation lets the workers share it,
+        and an algorithm streaming on a projection never sees it dropped and projected again
+        under its feet. The name also carries the epoch of the generation counter, which
+        changes when the counter starts again from 0 (a restart with the in-memory counter):
+        a projection left by an earlier epoch was built from another graph and is never
+        reused. Projections older than the previous generation, or of another epoch, are dropped.
+        """
+        base, rel_type, orientation = NETWORKS[network]
+        generation = self.client.generation.value
+        async with self._projection_lock:
+            projected = self._projections.get(network)
+            if projected is not None and projected[0] == generation:
+                return projected[1]
+            epoch = self.client.generation.epoch
+            graph = f"{base}-{epoch}-{generation}"
+            if not await self._projection_exists(graph):
+                try:
+                    records = await self.client._call_async(
+                        "gds_project", GDS_PROJECT_QUERY, graph=graph,
+                        relationships={rel_type: {"orientation": orientation}},
+                    )
+                    print(f"Projected {graph}: {records[0]['nodeCount']} nodes, "
+                          f"{records[0]['relationshipCount']} relationships")
+                except ClientError:
+                    # Another worker projected it meanwhile
+                    if not await self._projection_exists(graph):
+                        raise
+            await self._drop_stale_projections(base, epoch, generation)
+            self._projections[network] = (generation, graph)
+        return graph
+
+    async def _projection_exists(self, graph: str) -> bool:
+        return (await self.client._call_async("gds_exists", GDS_EXISTS_QUERY, graph=graph))[0]["exists"]
+
+    async def _drop_stale_projections(self, base: str, epoch: str, generation: int):
+        """Drop the projections of base older than the previous generation, of another epoch,
+        and the unversioned one"""
+        for record in await self.client._call_async("gds_list", GDS_LIST_QUERY):
+            name = record["graphName"]
+            if name != base and not name.startswith(base + "-"):
+                continue
+            name_epoch, _, suffix = name[len(base) + 1:].rpartition("-")
+            if name_epoch != epoch or not suffix.isdigit() or int(suffix) < generation - 1:
+                await self.client._call_async("gds_drop", GDS_DROP_QUERY, graph=name)
+
+    async def _snapshot_network(self, network: str) -> Tuple[GraphSnapshot, List[Tuple[int, int]]]:
+        snapshot = await self.client.snapshot_async()
+        edges = await self._memo(("edges", network), lambda: asyncio.to_thread(network_edges, snapshot, network))
+        return snapshot, edges
+
+    async def communities(self, network: str) -> List[List[str]]:
+        """Louvain communities of network, largest first"""
+        async def compute():
+            if await self.backend() == "gds":
+                records = await self.client._call_async(
+                    "gds_louvain", GDS_LOUVAIN_QUERY, graph=await self._projection(network)
+                )
+                return group_communities((record["name"], record["community"]) for record in records)
+            snapshot, edges = await self._snapshot_network(network)
+            membership = await asyncio.to_thread(louvain, snapshot.node_count, edges)
+            return group_communities(zip(snapshot.names, membership))
+
+        return await self._memo(("communities", network), compute)
+
+    async def centrality(self, network: str, algorithm: str,
+                         sampling_size: Optional[int] = None) -> List[Tuple[str, float]]:
+        """(name, score) of every employee, highest score first"""
+        async def compute():
+            if await self.backend() == "gds":
+                config = {"samplingSize": sampling_size, "samplingSeed": 42} if sampling_size else {}
+                records = await self.client._call_async(
+                    f"gds_{algorithm}", GDS_CENTRALITY_QUERIES[algorithm],
+                    graph=await self._projection(network), config=config,
+                )
+                scores = [(record["name"], record["score"]) for record in records]
+            else:
+                snapshot, edges = await self._snapshot_network(network)
+                if algorithm == "pagerank":
+                    if NETWORKS[network][2] == "UNDIRECTED":
+                        edges = edges + [(b, a) for a, b in edges]
+                    values = (await asyncio.to_thread(pagerank, snapshot.node_count, edges)).tolist()
+                else:
+                    values = await asyncio.to_thread(
+                        betweenness, snapshot.node_count, edges, NETWORKS[network][2] != "UNDIRECTED", sampling_size
+                    )
+                scores = list(zip(snapshot.names, values))
+            return sorted(scores, key=lambda item: (-item[1], item[0]))
+
+        return await self._memo(("centrality", network, algorithm, sampling_size), compute)
+
+    async def overlap(self) -> Tuple[List[Tuple[int, int, List[str]]], List[str]]:
+        """Employees grouped by (formal, informal) community, and the bridging employees.
+
+        Like the analysis of scripts/gds.md, a bridging employee is the only one of their
+        formal/informal combination; employees alone in either network are left out.
+        """
+        formal_groups = await self.communities("formal")
+        formal = {name: i for i, members in enumerate(formal_groups) for name in members}
+        informal_groups = await self.communities("informal")
+        informal = {name: i for i, members in enumerate(informal_groups) for name in members}
+
+        groups: Dict[Tuple[int, int], List[str]] = {}
+        for name in sorted(formal.keys() & informal.keys()):
+            groups.setdefault((formal[name], informal[name]), []).append(name)
+        overlaps = sorted(
+            ((formal_community, informal_community, members)
+             for (formal_community, informal_community), members in groups.items()),
+            key=lambda item: (-len(item[2]), item[0], item[1]),
+        )
+        bridging = sorted(
+            members[0] for (formal_community, informal_community), members in groups.items()
+            if len(members) == 1 and len(formal_groups[formal_community]) > 1
+            and len(informal_groups[informal_community]) > 1
+        )
+        return overlaps, bridging
+
+# Create a global instance for use across the application
+graph_analytics = GraphAnalytics(neo4j_client)
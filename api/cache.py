@@ -0,0 +1,381 @@
+import os
+import mmap
+import time
+import uuid
+import fcntl
+import struct
+import asyncio
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+try:
+    import redis
+    import redis.asyncio as async_redis
+except ImportError:
+    redis = None
+
+# Where the generation and the responses are shared between worker processes:
+# "memory" (not shared, one process), "file" (the workers of one host) or "redis"
+CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "neo4j-api-cache"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_PREFIX = os.getenv("REDIS_PREFIX", "neo4j-api:")
+
+
+class GenerationCounter:
+    """Graph generation, bumped after every write so cached reads know they are stale.
+
+    The epoch names the lifetime of the counter: a generation number only means the same
+    graph within one epoch, and this counter starts again at 0 in every process.
+    """
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+        self.epoch = uuid.uuid4().hex[:8]
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def bump(self) -> int:
+        with self._lock:
+            self._value += 1
+            return self._value
+
+
+class FileGenerationCounter:
+    """Graph generation shared by the worker processes of one host, in a memory-mapped file"""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            # The generation, then the epoch written by the process creating the file
+            if os.fstat(self._fd).st_size < 16:
+                os.ftruncate(self._fd, 16)
+            self._map = mmap.mmap(self._fd, 16)
+            if not any(self._map[8:16]):
+                self._map[8:16] = uuid.uuid4().bytes[:8]
+            self.epoch = self._map[8:12].hex()
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        # flock only excludes other processes, not the threads of this one
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> int:
+        return struct.unpack_from("<q", self._map)[0]
+
+    def bump(self) -> int:
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                value = self.value + 1
+                struct.pack_into("<q", self._map, 0, value)
+                return value
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+class RedisGenerationCounter:
+    """Graph generation shared by every worker through a Redis counter"""
+
+    def __init__(self, url: str, key: str):
+        self._redis = redis.Redis.from_url(url)
+        self._key = key
+
+    @property
+    def epoch(self) -> str:
+        # Set by the first worker, again after the Redis data was lost with the counter
+        self._redis.set(self._key + ":epoch", uuid.uuid4().hex[:8], nx=True)
+        return self._redis.get(self._key + ":epoch").decode()
+
+    @property
+    def value(self) -> int:
+        return int(self._redis.get(self._key) or 0)
+
+    def bump(self) -> int:
+        return int(self._redis.incr(self._key))
+
+
+class CachedResponse(NamedTuple):
+    """Serialized response body and its ETag"""
+    body: bytes
+    etag: str
+    generation: int
+    expires_at: float
+
+
+def _pack(entry: CachedResponse) -> bytes:
+    return f"{entry.generation} {entry.etag}\n".encode() + entry.body
+
+
+def _unpack(data: bytes, generation: int, ttl_left: float) -> Optional[CachedResponse]:
+    header, _, body = data.partition(b"\n")
+    entry_generation, etag = header.decode().split(" ", 1)
+    if int(entry_generation) != generation:
+        return None
+    return CachedResponse(body, etag, generation, time.monotonic() + ttl_left)
+
+
+class FileResponseStore:
+    """Shared tier of the response cache: one file per response, read by every worker of the host.
+
+    Files are replaced atomically, expire with their modification time and the oldest are
+    removed once the directory outgrows max_bytes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl: float):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.blake2b(key.encode(), digest_size=16).hexdigest())
+
+    def _get(self, key: str, generation: int) -> Optional[CachedResponse]:
+        try:
+            with open(self._path(key), "rb") as file:
+                ttl_left = self.ttl - (time.time() - os.fstat(file.fileno()).st_mtime)
+                if ttl_left <= 0:
+                    return None
+                return _unpack(file.read(), generation, ttl_left)
+        except FileNotFoundError:
+            return None
+
+    def _set(self, key: str, entry: CachedResponse):
+        if len(entry.body) > self.max_bytes:
+            return
+        fd, temporary = tempfile.mkstemp(dir=self.directory, prefix=".")
+        with os.fdopen(fd, "wb") as file:
+            file.write(_pack(entry))
+        os.replace(temporary, self._path(key))
+        self._prune()
+
+    def _prune(self):
+        files = []
+        for item in os.scandir(self.directory):
+            if item.name.startswith("."):
+                continue
+            try:
+                stat = item.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, item.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    async def get(self, key: str, generation: int) -> Optional[CachedResponse]:
+        return await asyncio.to_thread(self._get, key, generation)
+
+    async def set(self, key: str, entry: CachedResponse):
+        await asyncio.to_thread(self._set, key, entry)
+
+    def clear(self):
+        for item in os.scandir(self.directory):
+            try:
+                os.remove(item.path)
+            except FileNotFoundError:
+                pass
+
+
+class RedisResponseStore:
+    """Shared tier of the response cache in Redis (or anything speaking its protocol), expiring with the TTL"""
+
+    def __init__(self, url: str, prefix: str, ttl: float):
+        self._url = url
+        self._redis = async_redis.Redis.from_url(url)
+        self._prefix = prefix + "response:"
+        self.ttl = ttl
+
+    async def get(self, key: str, generation: int) -> Optional[CachedResponse]:
+        data, ttl_ms = await self._redis.pipeline().get(self._prefix + key).pttl(self._prefix + key).execute()
+        if data is None:
+            return None
+        return _unpack(data, generation, ttl_ms / 1000 if ttl_ms > 0 else self.ttl)
+
+    async def set(self, key: str, entry: CachedResponse):
+        await self._redis.set(self._prefix + key, _pack(entry), px=max(1, int(self.ttl * 1000)))
+
+    def clear(self):
+        client = redis.Redis.from_url(self._url)
+        for key in client.scan_iter(self._prefix + "*"):
+            client.delete(key)
+
+
+class ResponseCache:
+    """In-process LRU of serialized read responses.
+
+    Entries are keyed by request and tagged with the graph generation they were built
+    from: an entry of an older generation is never served. The cache is bounded by
+    entry count, total body size and a TTL (writes made outside this API only show up
+    once the TTL expires).
+
+    With a shared store (FileResponseStore, RedisResponseStore) a miss is first looked
+    up there, so a response built by one worker process is served by all of them.
+    """
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None, ttl: float = None, shared=None):
+        self.max_entries = max_entries or int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "128"))
+        self.max_bytes = max_bytes or int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+        self.ttl = ttl if ttl is not None else float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+        # Misses served by the shared store
+        self.shared_hits = 0
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._size = 0
+        self._inflight: Dict[Tuple[str, int], asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @staticmethod
+    def make_etag(body: bytes) -> str:
+        return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._size -= len(entry.body)
+
+    def get(self, key: str, generation: int) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.generation != generation or entry.expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, generation: int, body: bytes) -> CachedResponse:
+        return self._keep(key, CachedResponse(body, self.make_etag(body), generation, time.monotonic() + self.ttl))
+
+    def _keep(self, key: str, entry: CachedResponse) -> CachedResponse:
+        body = entry.body
+        if len(body) > self.max_bytes:
+            # Too big to keep, still hand it out
+            return entry
+        self._remove(key)
+        self._entries[key] = entry
+        self._size += len(body)
+        while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+        if self.shared is not None:
+            self.shared.clear()
+
+    async def _load_shared(self, key: str, generation: int) -> Optional[CachedResponse]:
+        try:
+            return await self.shared.get(key, generation)
+        except Exception as e:
+            # The shared store is an optimization, a failing one only costs the recomputation
+            print(f"Shared response cache read failed: {e}")
+            return None
+
+    async def _store_shared(self, key: str, entry: CachedResponse):
+        try:
+            await self.shared.set(key, entry)
+        except Exception as e:
+            print(f"Shared response cache write failed: {e}")
+
+    async def _compute(self, key: str, generation: int, produce: Callable[[], Awaitable[bytes]]) -> CachedResponse:
+        if self.shared is not None:
+            entry = await self._load_shared(key, generation)
+            if entry is not None:
+                self.shared_hits += 1
+                return self._keep(key, entry)
+        entry = self.set(key, generation, await produce())
+        if self.shared is not None:
+            await self._store_shared(key, entry)
+        return entry
+
+    async def get_or_compute(self, key: str, generation: int,
+                             produce: Callable[[], Awaitable[bytes]]) -> CachedResponse:
+        """Return the cached response, building it once even when many requests miss together"""
+        entry = self.get(key, generation)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+
+        inflight = self._inflight.get((key, generation))
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[(key, generation)] = future
+        try:
+            entry = await self._compute(key, generation, produce)
+            future.set_result(entry)
+            return entry
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody may be waiting on it, do not warn about an unretrieved exception
+            future.exception()
+            raise
+        finally:
+            del self._inflight[(key, generation)]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def make_generation_counter():
+    """Generation counter of the configured backend"""
+    if CACHE_BACKEND == "file":
+        return FileGenerationCounter(os.path.join(CACHE_DIR, "generation"))
+    if CACHE_BACKEND == "redis":
+        return RedisGenerationCounter(REDIS_URL, REDIS_PREFIX + "generation")
+    return GenerationCounter()
+
+
+def make_shared_store():
+    """Shared response store of the configured backend, None for a cache of this process only"""
+    ttl = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+    if CACHE_BACKEND == "file":
+        max_bytes = int(os.getenv("RESPONSE_CACHE_SHARED_MAX_BYTES", str(1024 * 1024 * 1024)))
+        return FileResponseStore(os.path.join(CACHE_DIR, "responses"), max_bytes, ttl)
+    if CACHE_BACKEND == "redis":
+        return RedisResponseStore(REDIS_URL, REDIS_PREFIX, ttl)
+    return None
+
+
+if CACHE_BACKEND not in ("memory", "file", "redis"):
+    raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND: {CACHE_BACKEND}")
+if CACHE_BACKEND == "redis" and redis is None:
+    raise ImportError("RESPONSE_CACHE_BACKEND=redis needs the redis package, pip install redis")
+
+# Create a global instance for use across the application
+response_cache = ResponseCache(shared=make_shared_store())
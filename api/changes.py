@@ -0,0 +1,115 @@
+import os
+import asyncio
+import threading
+from collections import deque
+from typing import AsyncIterator, Callable, List, Optional
+
+# Seconds between keepalives of an idle subscription
+KEEPALIVE = 15.0
+
+# Seconds a missing generation is waited for before the subscriber is told to reset
+GAP_TIMEOUT = 1.0
+
+
+def node_added(node: dict) -> dict:
+    """A node in the NVL format of /graph, replacing any node with the same id"""
+    return {"op": "add_node", "node": node}
+
+
+def node_removed(node_id: str) -> dict:
+    return {"op": "remove_node", "id": node_id}
+
+
+def relationship_added(source: str, target: str, rel_type: str) -> dict:
+    return {"op": "add_relationship", "relationship": {
+        "id": f"{source}|{rel_type}|{target}", "from": source, "to": target, "type": rel_type,
+    }}
+
+
+def relationship_removed(source: str, target: str, rel_type: str) -> dict:
+    """Relationships are matched on their ends and type, /graph gives them database ids"""
+    return {"op": "remove_relationship", "from": source, "to": target, "type": rel_type}
+
+
+class ChangeFeed:
+    """Recent graph changes for the /changes server-sent events, one event per generation.
+
+    Every write publishes the generation it bumped with the node and relationship deltas it
+    made, in the NVL format of /graph. A write too large to describe (a full CSV load) or
+    of unknown extent (one that failed half way) publishes a reset instead: clients fetch
+    the graph again. Writers publish from any thread, subscribers wait on the event loop.
+    """
+
+    def __init__(self, size: int = None, max_changes: int = None):
+        # Events kept for subscribers catching up
+        self.size = size or int(os.getenv("CHANGE_FEED_SIZE", "1000"))
+        # Above this many deltas a write is published as a reset
+        self.max_changes = max_changes or int(os.getenv("CHANGE_FEED_MAX_CHANGES", "10000"))
+        self._events = deque(maxlen=self.size)
+        self._lock = threading.Lock()
+        self._waiters = set()
+
+    def publish(self, generation: int, changes: Optional[List[dict]] = None):
+        """Record the changes of a generation, None for a reset"""
+        if changes is not None and len(changes) > self.max_changes:
+            changes = None
+        event = {"generation": generation, "reset": changes is None, "changes": changes or []}
+        with self._lock:
+            self._events.append(event)
+            waiters = list(self._waiters)
+        for loop, wake in waiters:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                # The subscriber's loop is closed
+                pass
+
+    def events_after(self, generation: int) -> dict:
+        """Kept events newer than generation, by generation"""
+        with self._lock:
+            return {event["generation"]: event for event in self._events if event["generation"] > generation}
+
+    async def subscribe(self, generation: int, current_generation: Callable[[], int]) -> AsyncIterator[Optional[dict]]:
+        """The events after generation, in order, as they are published; None after KEEPALIVE seconds without any.
+
+        A generation missing for GAP_TIMEOUT seconds (already dropped from the feed, or
+        written by another worker process, see current_generation) becomes a reset to the
+        newest generation, and so does a generation newer than any (a client reconnecting
+        after a restart reset the in-memory counter) right away.
+        """
+        loop = asyncio.get_running_loop()
+        waiter = (loop, asyncio.Event())
+        with self._lock:
+            self._waiters.add(waiter)
+        missing_since = None
+        try:
+            while True:
+                waiter[1].clear()
+                events = self.events_after(generation)
+                while generation + 1 in events:
+                    generation += 1
+                    missing_since = None
+                    yield events[generation]
+                latest = max([current_generation(), *events])
+                if generation > latest:
+                    generation, missing_since = latest, None
+                    yield {"generation": latest, "reset": True, "changes": []}
+                    continue
+                if latest > generation:
+                    # Bumped but not published yet, published by another process, or dropped
+                    if missing_since is None:
+                        missing_since = loop.time()
+                    elif loop.time() - missing_since >= GAP_TIMEOUT:
+                        generation, missing_since = latest, None
+                        yield {"generation": latest, "reset": True, "changes": []}
+                        continue
+                else:
+                    missing_since = None
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), GAP_TIMEOUT if missing_since is not None else KEEPALIVE)
+                except asyncio.TimeoutError:
+                    if missing_since is None:
+                        yield None
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
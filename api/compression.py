@@ -0,0 +1,116 @@
+import os
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bodies worth compressing, binary exports are already compressed
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+# Server-sent events must reach the client as they are sent, not behind compressor flushes
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+
+class _Gzip:
+    encoding = "gzip"
+
+    def __init__(self, level: int):
+        # wbits=31 writes the gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        # Sync-flush streamed chunks, so a client reading NDJSON gets every line as it is sent
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _Zstd:
+    encoding = "zstd"
+
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        flush = zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        return self._compressor.compress(data) + self._compressor.flush(flush)
+
+
+def _weaken_etag(headers: MutableHeaders):
+    """The compressed bytes differ from the identity ones a strong ETag stands for"""
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["ETag"] = "W/" + etag
+
+
+class CompressionMiddleware:
+    """Compress JSON and NDJSON responses with zstd (when zstandard is installed) or gzip,
+    whichever the client accepts, zstd first. Small bodies are sent as they are."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.minimum_size = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+        self.gzip_level = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+        self.zstd_level = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+
+    def _compressor(self, accept_encoding: str):
+        accepted = {coding.split(";")[0].strip().lower() for coding in accept_encoding.split(",")}
+        if "zstd" in accepted and zstandard is not None:
+            return _Zstd(self.zstd_level)
+        if "gzip" in accepted:
+            return _Gzip(self.gzip_level)
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        compressor = None
+        if scope["type"] == "http":
+            compressor = self._compressor(Headers(scope=scope).get("Accept-Encoding", ""))
+        if compressor is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Message = {}
+        # None until the first body message decided whether to compress
+        compressing = None
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, compressing
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk tells the size
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressing is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                compressing = (
+                    "content-encoding" not in headers
+                    and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                    and not headers.get("content-type", "").startswith(UNCOMPRESSED_TYPES)
+                    and (more_body or len(body) >= self.minimum_size)
+                )
+                if compressing or start_message["status"] == 304:
+                    # A 304 stands for the compressed body this client would get
+                    _weaken_etag(headers)
+                if compressing:
+                    headers["Content-Encoding"] = compressor.encoding
+                    headers.add_vary_header("Accept-Encoding")
+                    if "content-length" in headers:
+                        del headers["Content-Length"]
+                    if not more_body:
+                        body = compressor.compress(body, final=True)
+                        headers["Content-Length"] = str(len(body))
+                        await send(start_message)
+                        await send({**message, "body": body})
+                        return
+                await send(start_message)
+            if compressing:
+                message = {**message, "body": compressor.compress(body, final=not more_body)}
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -1,11 +1,190 @@
 import os
 import csv
-from neo4j import GraphDatabase
-from typing import List
-from models import Employee, EmployeeWithRelationships, Relationship
+import time
+import asyncio
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+from neo4j import AsyncGraphDatabase, GraphDatabase
+from neo4j.exceptions import ClientError
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+from models import BulkItemError, Employee, EmployeeWithRelationships, HierarchyMember, HierarchyResponse, Relationship
+from metrics import PoolMetrics, query_metrics, record_db_time, total_db_hits
+from cache import make_generation_counter
+from snapshot import SNAPSHOT_EDGES_QUERY, SNAPSHOT_NODES_QUERY, GraphSnapshot, page_cursor, parse_page_cursor
+from layout import GraphLayout
+from rollup import GraphRollups
+from ingest import ParallelIngest
+from changes import ChangeFeed, node_added, node_removed, relationship_added, relationship_removed
+from search import CREATE_SEARCH_INDEX_QUERY, SEARCH_QUERY, PrefixIndex, fulltext_query
+
+# Read queries shared by the sync and the async API
+EMPLOYEES_QUERY = """
+    MATCH (e:Employee)
+    RETURN e.name as name, 
+           e.emp_id as emp_id, 
+           e.email as email,
+           e.department as department,
+           e.position as position
+    ORDER BY e.name
+"""
+
+# One row per employee: the relationships are collected per row by subqueries instead of
+# chained OPTIONAL MATCHes, which produced bosses x subordinates x friends rows per employee
+EMPLOYEES_WITH_RELATIONSHIPS_QUERY = """
+    MATCH (e:Employee)
+    {where}
+    WITH e ORDER BY e.name {page}
+    RETURN e.name as name,
+           e.emp_id as emp_id,
+           e.email as email,
+           e.department as department,
+           e.position as position,
+           e.hire_date as hire_date,
+           head([(e)-[:REPORTS_TO]->(boss:Employee) | boss.name]) as boss_name,
+           [(subordinate:Employee)-[:REPORTS_TO]->(e) | subordinate.name] as direct_reports,
+           COLLECT {{
+               MATCH (e)-[:FRIENDS_WITH]-(friend:Employee)
+               RETURN DISTINCT friend.name
+           }} as friends
+    ORDER BY name
+"""
+
+RELATIONSHIPS_QUERY = """
+    MATCH (a:Employee)-[r]->(b:Employee)
+    RETURN a.name as from_employee, 
+           b.name as to_employee, 
+           TYPE(r) as relationship_type
+    ORDER BY a.name, b.name
+"""
+
+BOSS_FILE = "employees-and-their-boss.csv"
+BOSS_COLUMNS = ('employee name', 'has boss')
+FRIENDS_FILE = "employees-and-their-friends.csv"
+FRIENDS_COLUMNS = ('employee name', 'is friends with')
+
+LOAD_BOSS_QUERY = """
+    UNWIND $rows AS row
+    MERGE (emp:Employee {name: row.employee})
+    MERGE (boss:Employee {name: row.other})
+    MERGE (emp)-[:REPORTS_TO]->(boss)
+"""
+
+LOAD_FRIENDS_QUERY = """
+    UNWIND $rows AS row
+    MERGE (emp:Employee {name: row.employee})
+    MERGE (friend:Employee {name: row.other})
+    MERGE (emp)-[:FRIENDS_WITH]->(friend)
+"""
+
+# A new employee has no boss yet, so it is the root of its own hierarchy. Employees created
+# through the API are marked with their source, an incremental CSV load never removes them
+CREATE_EMPLOYEE_QUERY = """
+     CREATE (e:Employee {
+        emp_id: $emp_id,
+        name: $name,
+        email: $email,
+        department: $department,
+        position: $position,
+        level: 0,
+        direct_report_count: 0,
+        subtree_size: 0,
+        friend_count: 0,
+        source: 'api'
+    })
+    SET e.path = '/' + elementId(e) + '/'
+"""
+
+CREATE_EMPLOYEES_QUERY = """
+    UNWIND $rows AS row
+    CREATE (e:Employee)
+    SET e = row, e.level = 0, e.path = '/' + elementId(e) + '/',
+        e.direct_report_count = 0, e.subtree_size = 0, e.friend_count = 0, e.source = 'api'
+"""
+
+# Upsert on emp_id: only the fields given in a row are overwritten
+UPSERT_EMPLOYEES_QUERY = """
+    UNWIND $rows AS row
+    MERGE (e:Employee {emp_id: row.emp_id})
+    ON CREATE SET e.level = 0, e.path = '/' + elementId(e) + '/',
+                  e.direct_report_count = 0, e.subtree_size = 0, e.friend_count = 0, e.source = 'api'
+    SET e += row
+"""
+
+# Everyone below $name: the materialized path turns the REPORTS_TO* expansion into an
+# index seek on Employee.path, and the level bounds the depth
+SUBTREE_QUERY = """
+    MATCH (root:Employee {{name: $name}})
+    CALL {{
+        WITH root
+        MATCH (e:Employee)
+        WHERE e.path STARTS WITH root.path AND e <> root
+        {filters}
+        WITH root, e ORDER BY e.name, elementId(e) {page}
+        RETURN collect(e {{.name, .emp_id, .email, .department, .position, element_id: elementId(e),
+                           depth: e.level - root.level}}) as members
+    }}
+    RETURN root.name as root, members
+"""
+
+# Relationship counts materialized on every employee (see update_employee_stats), the
+# subtree is read from the materialized path; employees in a reporting cycle have no subtree
+SET_EMPLOYEE_STATS = """
+    SET e.direct_report_count = COUNT { (:Employee)-[:REPORTS_TO]->(e) },
+        e.friend_count = COUNT { MATCH (e)-[:FRIENDS_WITH]-(friend:Employee) RETURN DISTINCT friend },
+        e.subtree_size = CASE WHEN e.path IS NULL THEN null
+                         ELSE COUNT { MATCH (member:Employee) WHERE member.path STARTS WITH e.path } - 1 END
+"""
+
+# Sort keys of /employees/stats and the property each one reads, the depth is the hierarchy level
+STATS_FIELDS = {
+    "direct_reports": "direct_report_count",
+    "subtree_size": "subtree_size",
+    "friends": "friend_count",
+    "depth": "level",
+}
+
+# Ordered on, and filtered by, one indexed property
+EMPLOYEE_STATS_QUERY = """
+    MATCH (e:Employee)
+    WHERE e.{field} IS NOT NULL {filters}
+    RETURN e.name as name,
+           e.emp_id as emp_id,
+           e.email as email,
+           e.department as department,
+           e.position as position,
+           e.direct_report_count as direct_reports,
+           e.subtree_size as subtree_size,
+           e.friend_count as friends,
+           e.level as depth
+    ORDER BY e.{field} {order}, e.name
+    {page}
+"""
+
+# Everyone above $name, nearest boss first, read back from the materialized path
+CHAIN_QUERY = """
+    MATCH (e:Employee {name: $name})
+    WITH e, coalesce(e.path, '/' + elementId(e) + '/') as path
+    WITH e, reverse(split(substring(path, 1, size(path) - 2), '/'))[1..] as ancestors
+    WITH e, CASE WHEN $max_depth IS NULL THEN ancestors ELSE ancestors[..$max_depth] END as ancestors
+    CALL {
+        WITH ancestors
+        UNWIND range(0, size(ancestors) - 1) as i
+        MATCH (boss:Employee) WHERE elementId(boss) = ancestors[i]
+        WITH boss, i ORDER BY i
+        RETURN collect(boss {.name, .emp_id, .email, .department, .position, depth: i + 1}) as members
+    }
+    RETURN e.name as root, members
+"""
+
 
 class Neo4jClient:   
-    """Singleton class to manage Neo4j database connection and operations"""
+    """Singleton class to manage Neo4j database connection and operations.
+
+    The blocking methods use `driver` and stay available for scripts; the `*_async`
+    methods use `async_driver` and are the ones the FastAPI routes await.
+    """
     
     def __init__(self):
         # Try to load local .env file for development outside container
@@ -18,7 +197,46 @@ class Neo4jClient:
         self.username = os.getenv("NEO4J_USERNAME", "neo4j")
         self.password = os.getenv("NEO4J_PASSWORD", "password")
         self.database = os.getenv("NEO4J_DATABASE", "neo4j")
+        self.batch_size = int(os.getenv("NEO4J_BATCH_SIZE", "5000"))
+        # Writer sessions of a full CSV load, 1 loads the files one after the other
+        self.ingest_workers = int(os.getenv("NEO4J_INGEST_WORKERS", "1"))
+        # Directory of the CSV files loaded by /seed
+        self.dataset_dir = os.getenv("DATASET_DIR", "./dataset")
         self.driver = None
+        self.async_driver = None
+
+        # Connection pool settings, shared by the sync and the async driver
+        self.pool_config = {
+            "max_connection_pool_size": int(os.getenv("NEO4J_MAX_POOL_SIZE", "100")),
+            "connection_acquisition_timeout": float(os.getenv("NEO4J_CONNECTION_ACQUISITION_TIMEOUT", "60")),
+            "max_connection_lifetime": float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600")),
+            "connection_timeout": float(os.getenv("NEO4J_CONNECTION_TIMEOUT", "5")),
+            "keep_alive": os.getenv("NEO4J_KEEP_ALIVE", "true").lower() in ("1", "true", "yes"),
+        }
+        # Connections opened by warm_up_async() during startup
+        self.pool_warmup = int(os.getenv("NEO4J_POOL_WARMUP", "10"))
+        self.pool_metrics = {"sync": PoolMetrics(), "async": PoolMetrics()}
+        # Bumped by every write, versions the cached read responses (shared by the workers, see cache.py)
+        self.generation = make_generation_counter()
+        # Serve the async reads from an in-memory copy of the graph instead of Neo4j
+        self.snapshot_enabled = os.getenv("NEO4J_SNAPSHOT", "false").lower() in ("1", "true", "yes")
+        self._snapshot = None
+        self._snapshot_lock = asyncio.Lock()
+        # Server-side coordinates of the /graph nodes, computed on the snapshot
+        self.graph_layout = GraphLayout()
+        self._layout_lock = asyncio.Lock()
+        # Aggregated views of the snapshot, rebuilt with it
+        self._rollups = None
+        self._rollups_lock = asyncio.Lock()
+        # Deltas of the recent generations, streamed by /changes
+        self.changes = ChangeFeed()
+        # Employee names for /employees/autocomplete, kept up to date by the writes
+        self.name_index = PrefixIndex()
+        self._name_index_lock = asyncio.Lock()
+        # Queries slower than this are printed, 0 prints every query
+        self.slow_query_ms = float(os.getenv("NEO4J_SLOW_QUERY_MS", "500"))
+        # Re-run slow reads under PROFILE and print their db hits
+        self.profile_slow_queries = os.getenv("NEO4J_PROFILE_SLOW_QUERIES", "false").lower() in ("1", "true", "yes")
         
         # Store fallback URIs for different scenarios
         self.fallback_uris = [
@@ -28,298 +246,1331 @@ class Neo4jClient:
             "bolt://neo4j-gds:7687",  # Direct container name
         ]
         
+    def _probe(self, uri: str):
+        """Open a driver on uri and check it answers, return the driver"""
+        print(f"Attempting to connect to Neo4j at {uri}")
+        driver = GraphDatabase.driver(uri, auth=(self.username, self.password), **self.pool_config)
+        try:
+            # Test the connection
+            with driver.session(database=self.database) as session:
+                session.run("RETURN 1").consume()
+        except Exception:
+            driver.close()
+            raise
+        return driver
+
+    async def _probe_async(self, uri: str):
+        """Async version of _probe"""
+        driver = AsyncGraphDatabase.driver(uri, auth=(self.username, self.password), **self.pool_config)
+        try:
+            async with driver.session(database=self.database) as session:
+                result = await session.run("RETURN 1")
+                await result.consume()
+        except BaseException:
+            await driver.close()
+            raise
+        return driver
+
     def connect(self):
-        """Try to connect to Neo4j using different URI strategies"""
+        """Probe all the fallback URIs concurrently and keep the first one that answers"""
+        uris = list(dict.fromkeys(self.fallback_uris))
+        executor = ThreadPoolExecutor(max_workers=len(uris))
+        futures = {executor.submit(self._probe, uri): uri for uri in uris}
+        winner = None
         last_error = None
-        
-        for uri in self.fallback_uris:
+
+        for future in as_completed(futures):
             try:
-                print(f"Attempting to connect to Neo4j at {uri}")
-                self.driver = GraphDatabase.driver(
-                    uri, 
-                    auth=(self.username, self.password)
-                )
-                # Test the connection
-                with self.driver.session(database=self.database) as session:
-                    session.run("RETURN 1")
-                print(f"Successfully connected to Neo4j at {uri}")
-                self.uri = uri  # Store the successful URI
-                return
+                driver = future.result()
             except Exception as e:
-                print(f"Failed to connect to {uri}: {e}")
+                print(f"Failed to connect to {futures[future]}: {e}")
                 last_error = e
-                if self.driver:
-                    self.driver.close()
-                    self.driver = None
-        
-        # If all attempts failed, raise the last error
-        raise Exception(f"Could not connect to Neo4j after trying all URIs. Last error: {last_error}")
+                continue
+            winner = future
+            self.driver = driver
+            self.uri = futures[future]  # Store the successful URI
+            print(f"Successfully connected to Neo4j at {self.uri}")
+            break
+
+        # Do not wait for the slower probes, close their drivers when they finish
+        def close_loser(future):
+            if future is not winner and not future.cancelled() and future.exception() is None:
+                future.result().close()
+
+        for future in futures:
+            future.add_done_callback(close_loser)
+        executor.shutdown(wait=False)
+
+        if winner is None:
+            # If all attempts failed, raise the last error
+            raise Exception(f"Could not connect to Neo4j after trying all URIs. Last error: {last_error}")
+        self.pool_metrics["sync"].instrument(self.driver)
+
+    async def connect_async(self):
+        """Build the async driver, probing the fallback URIs concurrently"""
+        uris = list(dict.fromkeys([self.uri] + self.fallback_uris))
+        tasks = {asyncio.create_task(self._probe_async(uri)): uri for uri in uris}
+        pending = set(tasks)
+        last_error = None
+
+        try:
+            while pending and self.async_driver is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        driver = task.result()
+                    except Exception as e:
+                        print(f"Failed to connect the async driver to {tasks[task]}: {e}")
+                        last_error = e
+                        continue
+                    if self.async_driver is None:
+                        self.async_driver = driver
+                        self.uri = tasks[task]
+                        print(f"Async driver connected to Neo4j at {self.uri}")
+                    else:
+                        await driver.close()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        if self.async_driver is None:
+            raise Exception(f"Could not connect the async driver to Neo4j after trying all URIs. Last error: {last_error}")
+        self.pool_metrics["async"].instrument(self.async_driver)
+
+    async def warm_up_async(self, connections: int = None):
+        """Open pool connections up front so the first requests skip the Bolt handshake"""
+        connections = min(connections or self.pool_warmup, self.pool_config["max_connection_pool_size"])
+
+        async def ping():
+            async with self.async_driver.session(database=self.database) as session:
+                result = await session.run("RETURN 1")
+                await result.consume()
+
+        # Concurrent sessions each hold their own connection, which then stays idle in the pool
+        await asyncio.gather(*(ping() for _ in range(connections)))
+        print(f"Warmed up {connections} Neo4j connections")
     
     def close(self):
         if self.driver:
             self.driver.close()
+
+    async def close_async(self):
+        if self.async_driver:
+            await self.async_driver.close()
+
+    @staticmethod
+    def _employee_from_record(record) -> Employee:
+        employee_data = {
+            "name": record["name"],
+            "emp_id": record["emp_id"],
+            "email": record["email"],
+            "department": record["department"],
+            "position": record["position"]
+        }
+        # Filter out None values
+        employee_data = {k: v for k, v in employee_data.items() if v is not None}
+        return Employee(**employee_data)
+
+    @classmethod
+    def _employee_with_relationships_from_record(cls, record) -> EmployeeWithRelationships:
+        employee = cls._employee_from_record(record)
+        
+        # Filter out None/empty values from relationships
+        direct_reports = [name for name in record["direct_reports"] if name]
+        friends = [name for name in record["friends"] if name]
+        
+        return EmployeeWithRelationships(
+            employee=employee,
+            boss=record["boss_name"],
+            direct_reports=direct_reports,
+            friends=friends
+        )
+
+    @staticmethod
+    def _employee_network_row(record) -> dict:
+        """EmployeeWithRelationships as the plain dict it serializes to, without building models"""
+        return {
+            "employee": {
+                "name": record["name"],
+                "emp_id": record["emp_id"],
+                "email": record["email"],
+                "department": record["department"],
+                "position": record["position"],
+            },
+            "boss": record["boss_name"],
+            "direct_reports": [name for name in record["direct_reports"] if name],
+            "friends": [name for name in record["friends"] if name],
+        }
+
+    @staticmethod
+    def _employee_stats_row(record) -> dict:
+        """Employee and its materialized counts, in the EmployeeStats schema"""
+        return {
+            "employee": {field: record[field] for field in ("name", "emp_id", "email", "department", "position")},
+            **{field: record[field] for field in STATS_FIELDS},
+        }
+
+    @staticmethod
+    def _relationship_from_record(record) -> Relationship:
+        return Relationship(
+            from_employee=record["from_employee"],
+            to_employee=record["to_employee"],
+            relationship_type=record["relationship_type"]
+        )
+
+    def _observe(self, query_name: str, query: str, seconds: float, rows: int, summary) -> bool:
+        """Record the timings of a finished query, print it when slow, return whether it was"""
+        record_db_time(seconds)
+        slow = seconds * 1000 >= self.slow_query_ms
+        db_hits = total_db_hits(summary.profile) if summary.profile else None
+        query_metrics.observe(query_name, seconds, rows, summary.result_available_after,
+                              summary.result_consumed_after, db_hits, slow)
+        if slow:
+            print(f"Slow query {query_name}: {seconds * 1000:.1f} ms, {rows} rows, "
+                  f"server {summary.result_available_after} ms to first record, "
+                  f"{summary.result_consumed_after} ms to consume: {' '.join(query.split())[:300]}")
+        return slow
+
+    def _print_profile(self, query_name: str, summary):
+        print(f"Slow query {query_name} profile: {total_db_hits(summary.profile)} db hits")
+
+    def _run(self, runner, query_name: str, query: str, params: dict = None, profile_slow: bool = False) -> list:
+        """Run query on a session or transaction and return all of its records.
+
+        Every query of the client goes through here (or _stream), so its duration, rows and
+        server timings end up in query_metrics under query_name. With profile_slow, a slow
+        query is run once more under PROFILE, which only makes sense for reads.
+        """
+        params = params or {}
+        start = time.perf_counter()
+        try:
+            result = runner.run(query, params)
+            records = list(result)
+            summary = result.consume()
+        except Exception:
+            query_metrics.observe_error(query_name, time.perf_counter() - start)
+            raise
+        slow = self._observe(query_name, query, time.perf_counter() - start, len(records), summary)
+        if slow and profile_slow and self.profile_slow_queries:
+            self._print_profile(query_name, runner.run("PROFILE " + query, params).consume())
+        return records
+
+    async def _run_async(self, runner, query_name: str, query: str, params: dict = None,
+                         profile_slow: bool = False) -> list:
+        """Async version of _run"""
+        params = params or {}
+        start = time.perf_counter()
+        try:
+            result = await runner.run(query, params)
+            records = [record async for record in result]
+            summary = await result.consume()
+        except Exception:
+            query_metrics.observe_error(query_name, time.perf_counter() - start)
+            raise
+        slow = self._observe(query_name, query, time.perf_counter() - start, len(records), summary)
+        if slow and profile_slow and self.profile_slow_queries:
+            result = await runner.run("PROFILE " + query, params)
+            self._print_profile(query_name, await result.consume())
+        return records
+
+    def _stream(self, runner, query_name: str, query: str, params: dict = None) -> Iterator:
+        """Like _run, but yield the records as they arrive; the duration includes the caller's time"""
+        start = time.perf_counter()
+        rows = 0
+        try:
+            result = runner.run(query, params or {})
+            for record in result:
+                rows += 1
+                yield record
+            summary = result.consume()
+        except Exception:
+            query_metrics.observe_error(query_name, time.perf_counter() - start)
+            raise
+        self._observe(query_name, query, time.perf_counter() - start, rows, summary)
+
+    async def _stream_async(self, runner, query_name: str, query: str, params: dict = None) -> AsyncIterator:
+        """Async version of _stream"""
+        start = time.perf_counter()
+        rows = 0
+        try:
+            result = await runner.run(query, params or {})
+            async for record in result:
+                rows += 1
+                yield record
+            summary = await result.consume()
+        except Exception:
+            query_metrics.observe_error(query_name, time.perf_counter() - start)
+            raise
+        self._observe(query_name, query, time.perf_counter() - start, rows, summary)
+
+    def _read(self, query_name: str, query: str, **params) -> list:
+        """Run a read query on the sync driver and return all of its records"""
+        with self.driver.session(database=self.database) as session:
+            return self._run(session, query_name, query, params, profile_slow=True)
+
+    async def _read_async(self, query_name: str, query: str, **params) -> list:
+        """Run a read query on the async driver and return all of its records"""
+        async with self.async_driver.session(database=self.database) as session:
+            return await self._run_async(session, query_name, query, params, profile_slow=True)
+
+    async def _call_async(self, query_name: str, query: str, **params) -> list:
+        """Run a procedure call on the async driver and return all of its records.
+        Never re-run under PROFILE, a procedure may have side effects"""
+        async with self.async_driver.session(database=self.database) as session:
+            return await self._run_async(session, query_name, query, params)
     
+    def snapshot(self) -> GraphSnapshot:
+        """In-memory snapshot of the current graph generation, rebuilt once the graph changed"""
+        generation = self.generation.value
+        if self._snapshot is None or self._snapshot.generation != generation:
+            self._snapshot = GraphSnapshot(generation, self._read("snapshot_nodes", SNAPSHOT_NODES_QUERY),
+                                           self._read("snapshot_edges", SNAPSHOT_EDGES_QUERY))
+            self._print_snapshot()
+        return self._snapshot
+
+    async def snapshot_async(self) -> GraphSnapshot:
+        """Async version of snapshot(), concurrent callers share one rebuild"""
+        generation = self.generation.value
+        if self._snapshot is not None and self._snapshot.generation == generation:
+            return self._snapshot
+        async with self._snapshot_lock:
+            if self._snapshot is None or self._snapshot.generation != generation:
+                nodes = await self._read_async("snapshot_nodes", SNAPSHOT_NODES_QUERY)
+                edges = await self._read_async("snapshot_edges", SNAPSHOT_EDGES_QUERY)
+                # Building the arrays is CPU work, keep it off the event loop
+                self._snapshot = await asyncio.to_thread(GraphSnapshot, generation, nodes, edges)
+                self._print_snapshot()
+            return self._snapshot
+
+    def layout(self) -> Dict[str, Tuple[float, float]]:
+        """(x, y) of every employee by element id, laid out again for the employees touched since the last layout"""
+        return self.graph_layout.update(self.snapshot())
+
+    async def layout_async(self) -> Dict[str, Tuple[float, float]]:
+        """Async version of layout(), concurrent callers share one computation"""
+        snapshot = await self.snapshot_async()
+        async with self._layout_lock:
+            # NumPy work, keep it off the event loop
+            return await asyncio.to_thread(self.graph_layout.update, snapshot)
+
+    async def rollups_async(self) -> GraphRollups:
+        """Department and team rollups of the current snapshot"""
+        snapshot = await self.snapshot_async()
+        async with self._rollups_lock:
+            if self._rollups is None or self._rollups.generation != snapshot.generation:
+                self._rollups = await asyncio.to_thread(GraphRollups, snapshot)
+                print(f"Built graph rollups of generation {snapshot.generation} in {self._rollups.build_seconds:.2f}s")
+            return self._rollups
+
+    async def get_graph_rollup_async(self, by: str, expand: Optional[str] = None) -> Optional[dict]:
+        """Aggregated graph by department or manager (see GraphRollups), None when expand does not exist"""
+        rollups = await self.rollups_async()
+        view = rollups.by_department if by == "department" else rollups.by_manager
+        # The first request of a view reads the relationships of the expanded part
+        return await asyncio.to_thread(view, expand)
+
+    def _print_snapshot(self):
+        snapshot = self._snapshot
+        print(f"Built graph snapshot of generation {snapshot.generation}: {snapshot.node_count} employees, "
+              f"{snapshot.edge_count} relationships in {snapshot.build_seconds:.2f}s")
+
     def get_employees(self) -> List[Employee]:
         """Fetch all employees from Neo4j database"""
-        with self.driver.session(database=self.database) as session:
-            result = session.run("""
-                MATCH (e:Employee)
-                RETURN e.name as name, 
-                       e.emp_id as emp_id, 
-                       e.email as email,
-                       e.department as department,
-                       e.position as position
-                ORDER BY e.name
-            """)
-            
-            employees = []
-            for record in result:
-                employee_data = {
-                    "name": record["name"],
-                    "emp_id": record["emp_id"],
-                    "email": record["email"],
-                    "department": record["department"],
-                    "position": record["position"]
-                }
-                # Filter out None values
-                employee_data = {k: v for k, v in employee_data.items() if v is not None}
-                employees.append(Employee(**employee_data))
-            
-            return employees
+        return [self._employee_from_record(record) for record in self._read("employees", EMPLOYEES_QUERY)]
+
+    async def get_employees_async(self) -> List[Employee]:
+        """Fetch all employees from Neo4j database"""
+        if self.snapshot_enabled:
+            return (await self.snapshot_async()).employees()
+        return [self._employee_from_record(record) for record in await self._read_async("employees", EMPLOYEES_QUERY)]
+
+    # Fast reads: the same data as plain dicts, in the field order of the response models.
+    # The RETURN columns of EMPLOYEES_QUERY and RELATIONSHIPS_QUERY are exactly the Employee
+    # and Relationship fields, so their records are taken as they come from the driver.
+
+    def get_employee_rows(self) -> List[dict]:
+        """get_employees as plain dicts"""
+        return [dict(record) for record in self._read("employees", EMPLOYEES_QUERY)]
+
+    async def get_employee_rows_async(self) -> List[dict]:
+        """get_employees as plain dicts"""
+        if self.snapshot_enabled:
+            return (await self.snapshot_async()).employee_rows()
+        return [dict(record) for record in await self._read_async("employees", EMPLOYEES_QUERY)]
     
+    def ensure_schema(self):
+        """Create the constraints and indexes of the API, once per start (see serve.py for several workers)"""
+        self.ensure_unique_constraints()
+        self.ensure_name_index()
+        self.ensure_search_index()
+        self.ensure_hierarchy_indexes()
+        self.ensure_stats_indexes()
+
     def ensure_unique_constraints(self):
         """Set up database constraints for unique employee IDs"""
         with self.driver.session(database=self.database) as session:
             try:
-                session.run("CREATE CONSTRAINT emp_id FOR (e:Employee) REQUIRE e.emp_id IS UNIQUE")
+                self._run(session, "create_constraint", "CREATE CONSTRAINT emp_id FOR (e:Employee) REQUIRE e.emp_id IS UNIQUE")
             except Exception as e:
                 print(f"Constraints may already exist: {e}")
 
+    def ensure_name_index(self):
+        """Index Employee.name so the MERGEs of the CSV loaders are index seeks, not label scans"""
+        with self.driver.session(database=self.database) as session:
+            self._run(session, "create_index", "CREATE INDEX employee_name IF NOT EXISTS FOR (e:Employee) ON (e.name)")
 
-    def create_employee(self, employee: Employee):
-        """Create a new employee node in the Neo4j database"""
+    def ensure_search_index(self):
+        """Full-text index behind /employees/search"""
         with self.driver.session(database=self.database) as session:
-            session.run("""
-                 CREATE (e:Employee {
-                    emp_id: $emp_id,
-                    name: $name,
-                    email: $email,
-                    department: $department,
-                    position: $position
-                })
-            """, 
-            name=employee.name, 
-            emp_id=employee.emp_id, 
-            email=employee.email, 
-            department=employee.department, 
-            position=employee.position)
-
-    def get_employees_with_relationships(self) -> List[EmployeeWithRelationships]:
-        """Fetch all employees with their relationships"""
+            self._run(session, "create_index", CREATE_SEARCH_INDEX_QUERY)
+
+    def ensure_hierarchy_indexes(self):
+        """Index the materialized hierarchy: level for the level-by-level build, path for subtree prefix seeks"""
+        with self.driver.session(database=self.database) as session:
+            self._run(session, "create_index", "CREATE INDEX employee_level IF NOT EXISTS FOR (e:Employee) ON (e.level)")
+            self._run(session, "create_index", "CREATE INDEX employee_path IF NOT EXISTS FOR (e:Employee) ON (e.path)")
+
+    def ensure_stats_indexes(self):
+        """Index the materialized counts, so /employees/stats sorts and filters by an index seek"""
         with self.driver.session(database=self.database) as session:
-            result = session.run("""
+            for field in ("direct_report_count", "subtree_size", "friend_count"):
+                self._run(session, "create_index", f"CREATE INDEX employee_{field} IF NOT EXISTS FOR (e:Employee) ON (e.{field})")
+
+    def update_employee_stats(self, batch_size: int = None, names: Optional[Iterable[str]] = None) -> int:
+        """Materialize the direct report, subtree and friend counts of every employee, or only of names
+        and their bosses up to the root (whose subtrees include them). Needs the hierarchy of update_hierarchy.
+        Returns the number of employees updated.
+        """
+        batch_size = batch_size or self.batch_size
+        start = time.perf_counter()
+        self.ensure_stats_indexes()
+        if names is None:
+            with self.driver.session(database=self.database) as session:
+                self._run(session, "employee_stats", f"""
+                    MATCH (e:Employee)
+                    CALL {{ WITH e {SET_EMPLOYEE_STATS} }} IN TRANSACTIONS OF $batch_size ROWS
+                """, {"batch_size": batch_size})
+            count = self._read("employee_count", "MATCH (e:Employee) RETURN count(e) as count")[0]["count"]
+        else:
+            stale = set()
+            for record in self._read("employee_stats_paths", """
+                UNWIND $names AS name
+                MATCH (e:Employee {name: name})
+                RETURN elementId(e) as id, e.path as path
+            """, names=sorted(set(names))):
+                stale.add(record["id"])
+                stale.update(self._path_keys(record["path"]))
+            rows = [{"id": key} for key in sorted(stale)]
+            count = self._write_batches("employee_stats", f"""
+                UNWIND $rows AS row
+                MATCH (e:Employee) WHERE elementId(e) = row.id
+                {SET_EMPLOYEE_STATS}
+            """, (rows[i:i + batch_size] for i in range(0, len(rows), batch_size)))
+        print(f"Materialized the stats of {count} employees in {time.perf_counter() - start:.2f}s")
+        return count
+
+    @staticmethod
+    def _path_keys(path: Optional[str]) -> List[str]:
+        """Element ids on a materialized '/root/.../employee/' path, root first"""
+        return path.strip("/").split("/") if path else []
+
+    def update_hierarchy(self, batch_size: int = None) -> int:
+        """Materialize the REPORTS_TO tree as a level and a '/root/.../employee/' path on every employee.
+
+        The path is made of element ids, so employees sharing a name or renamed keep their
+        own subtree. Employees without a boss are level 0, then each level is derived from the one above,
+        in batched transactions. Employees caught in a reporting cycle keep no path.
+        Returns the number of levels.
+        """
+        batch_size = batch_size or self.batch_size
+        start = time.perf_counter()
+        self.ensure_hierarchy_indexes()
+        with self.driver.session(database=self.database) as session:
+            self._run(session, "hierarchy_reset", """
                 MATCH (e:Employee)
-                OPTIONAL MATCH (e)-[:REPORTS_TO]->(boss:Employee)
-                OPTIONAL MATCH (subordinate:Employee)-[:REPORTS_TO]->(e)
-                OPTIONAL MATCH (e)-[:FRIENDS_WITH]-(friend:Employee)
-                RETURN e.name as name,
-                       e.emp_id as emp_id,
-                       e.email as email,
-                       e.department as department,
-                       e.position as position,
-                       e.hire_date as hire_date,
-                       boss.name as boss_name,
-                       COLLECT(DISTINCT subordinate.name) as direct_reports,
-                       COLLECT(DISTINCT friend.name) as friends
-                ORDER BY e.name
-            """)
-            
-            employees = []
-            for record in result:
-                employee_data = {
-                    "name": record["name"],
-                    "emp_id": record["emp_id"],
-                    "email": record["email"],
-                    "department": record["department"],
-                    "position": record["position"],
-                    "hire_date": record["hire_date"]
-                }
-                # Filter out None values
-                employee_data = {k: v for k, v in employee_data.items() if v is not None}
-                employee = Employee(**employee_data)
-                
-                # Filter out None/empty values from relationships
-                direct_reports = [name for name in record["direct_reports"] if name]
-                friends = [name for name in record["friends"] if name]
-                
-                emp_with_rel = EmployeeWithRelationships(
-                    employee=employee,
-                    boss=record["boss_name"],
-                    direct_reports=direct_reports,
-                    friends=friends
-                )
-                employees.append(emp_with_rel)
-            
-            return employees
+                CALL { WITH e SET e.level = null, e.path = null } IN TRANSACTIONS OF $batch_size ROWS
+            """, {"batch_size": batch_size})
+            self._run(session, "hierarchy_roots", """
+                MATCH (e:Employee) WHERE NOT (e)-[:REPORTS_TO]->(:Employee)
+                CALL { WITH e SET e.level = 0, e.path = '/' + elementId(e) + '/' } IN TRANSACTIONS OF $batch_size ROWS
+            """, {"batch_size": batch_size})
+
+            level = 0
+            while True:
+                self._run(session, "hierarchy_level", """
+                    MATCH (e:Employee)-[:REPORTS_TO]->(boss:Employee)
+                    WHERE boss.level = $level AND e.level IS NULL
+                    CALL {
+                        WITH e, boss
+                        SET e.level = $level + 1, e.path = boss.path + elementId(e) + '/'
+                    } IN TRANSACTIONS OF $batch_size ROWS
+                """, {"level": level, "batch_size": batch_size})
+                next_level = self._run(
+                    session, "hierarchy_next_level",
+                    "RETURN exists { MATCH (e:Employee) WHERE e.level = $level } as found", {"level": level + 1},
+                )[0]["found"]
+                if not next_level:
+                    break
+                level += 1
+        print(f"Materialized a hierarchy of {level + 1} levels in {time.perf_counter() - start:.2f}s")
+        return level + 1
+
+    def _commit_generation(self, changes: Optional[List[dict]] = None) -> int:
+        """Start a new graph generation after a write and publish its changes, None publishes a reset"""
+        generation = self.generation.bump()
+        self.changes.publish(generation, changes)
+        return generation
+
+    @classmethod
+    def _graph_node_from_employee(cls, employee: dict) -> dict:
+        """NVL node of the fields of an employee row"""
+        return cls._graph_node_from_record({
+            "id": employee.get("emp_id"),
+            **{field: employee.get(field) for field in ("name", "department", "position", "email")},
+        })
+
+    def create_employee(self, employee: Employee):
+        """Create a new employee node in the Neo4j database"""
+        with self.driver.session(database=self.database) as session:
+            self._run(session, "create_employee", CREATE_EMPLOYEE_QUERY, employee.model_dump())
+        self.name_index.add(employee.name)
+        self.name_index.advance(self._commit_generation([node_added(self._graph_node_from_employee(employee.model_dump()))]))
+
+    async def create_employee_async(self, employee: Employee):
+        """Create a new employee node in the Neo4j database"""
+        async with self.async_driver.session(database=self.database) as session:
+            await self._run_async(session, "create_employee", CREATE_EMPLOYEE_QUERY, employee.model_dump())
+        self.name_index.add(employee.name)
+        self.name_index.advance(self._commit_generation([node_added(self._graph_node_from_employee(employee.model_dump()))]))
+
+    @staticmethod
+    def _bulk_rows(employees: List[Tuple[int, Employee]], upsert: bool) -> Tuple[List[Tuple[int, dict]], List[BulkItemError]]:
+        """(index, row) pairs to write and the items rejected up front"""
+        rows, errors = [], []
+        for index, employee in employees:
+            if upsert and employee.emp_id is None:
+                errors.append(BulkItemError(index=index, error="emp_id is required to upsert"))
+                continue
+            rows.append((index, employee.model_dump(exclude_none=True)))
+        return rows, errors
+
+    def _bulk_written(self, rows: List[Tuple[int, dict]], errors: List[BulkItemError], upsert: bool, completed: bool):
+        """Start a new generation with the written rows, and add their names to the autocomplete index.
+        When the write stopped half way, which rows made it in is unknown"""
+        if not completed:
+            self.name_index.invalidate()
+            self._commit_generation()
+            return
+        failed = {error.index for error in errors}
+        written = [row for index, row in rows if index not in failed]
+        if upsert:
+            # An upsert may rename an employee, read the names again
+            self.name_index.invalidate()
+        else:
+            for row in written:
+                self.name_index.add(row["name"])
+        # Upserted rows only carry the fields they set, clients merge them into the node
+        self.name_index.advance(self._commit_generation([node_added(self._graph_node_from_employee(row)) for row in written]))
+
+    def create_employees(self, employees: List[Tuple[int, Employee]], upsert: bool = False,
+                         batch_size: int = None) -> List[BulkItemError]:
+        """Create (or upsert on emp_id) (index, employee) items in UNWIND batches, return the failed items.
+
+        A batch is one managed write transaction. When the database rejects it (a ClientError,
+        such as a constraint violation) its items are retried one by one, so a bad item only
+        fails itself. Any other error, like a lost connection the driver already retried, fails
+        the whole request.
+        """
+        batch_size = batch_size or self.batch_size
+        query = UPSERT_EMPLOYEES_QUERY if upsert else CREATE_EMPLOYEES_QUERY
+        query_name = "upsert_employees" if upsert else "create_employees"
+        rows, errors = self._bulk_rows(employees, upsert)
+
+        def write(tx, rows):
+            self._run(tx, query_name, query, {"rows": rows})
+
+        completed = False
+        try:
+            with self.driver.session(database=self.database) as session:
+                for start in range(0, len(rows), batch_size):
+                    batch = rows[start:start + batch_size]
+                    try:
+                        session.execute_write(write, [row for _, row in batch])
+                    except ClientError:
+                        # Find the items that broke the batch
+                        for index, row in batch:
+                            try:
+                                session.execute_write(write, [row])
+                            except ClientError as e:
+                                errors.append(BulkItemError(index=index, error=str(e)))
+            completed = True
+        finally:
+            if rows:
+                self._bulk_written(rows, errors, upsert, completed)
+        return sorted(errors, key=lambda error: error.index)
+
+    async def create_employees_async(self, employees: List[Tuple[int, Employee]], upsert: bool = False,
+                                     batch_size: int = None) -> List[BulkItemError]:
+        """Async version of create_employees"""
+        batch_size = batch_size or self.batch_size
+        query = UPSERT_EMPLOYEES_QUERY if upsert else CREATE_EMPLOYEES_QUERY
+        query_name = "upsert_employees" if upsert else "create_employees"
+        rows, errors = self._bulk_rows(employees, upsert)
+
+        async def write(tx, rows):
+            await self._run_async(tx, query_name, query, {"rows": rows})
+
+        completed = False
+        try:
+            async with self.async_driver.session(database=self.database) as session:
+                for start in range(0, len(rows), batch_size):
+                    batch = rows[start:start + batch_size]
+                    try:
+                        await session.execute_write(write, [row for _, row in batch])
+                    except ClientError:
+                        # Find the items that broke the batch
+                        for index, row in batch:
+                            try:
+                                await session.execute_write(write, [row])
+                            except ClientError as e:
+                                errors.append(BulkItemError(index=index, error=str(e)))
+            completed = True
+        finally:
+            if rows:
+                self._bulk_written(rows, errors, upsert, completed)
+        return sorted(errors, key=lambda error: error.index)
+
+    @staticmethod
+    def _employees_with_relationships_query(department: Optional[str] = None,
+                                            name_prefix: Optional[str] = None,
+                                            limit: Optional[int] = None,
+                                            offset: int = 0) -> str:
+        """Employee network query, filtered by department and name prefix and paged with SKIP/LIMIT"""
+        conditions = []
+        if department is not None:
+            conditions.append("e.department = $department")
+        if name_prefix:
+            # Served by the employee_name index
+            conditions.append("e.name STARTS WITH $name_prefix")
+        page = ""
+        if offset:
+            page += "SKIP $offset "
+        if limit:
+            page += "LIMIT $limit"
+        return EMPLOYEES_WITH_RELATIONSHIPS_QUERY.format(
+            where=f"WHERE {' AND '.join(conditions)}" if conditions else "",
+            page=page,
+        )
+
+    def get_employees_with_relationships(self, department: Optional[str] = None,
+                                         name_prefix: Optional[str] = None,
+                                         limit: Optional[int] = None,
+                                         offset: int = 0) -> List[EmployeeWithRelationships]:
+        """Fetch employees with their relationships, optionally filtered and paged"""
+        records = self._read(
+            "employees_with_relationships",
+            self._employees_with_relationships_query(department, name_prefix, limit, offset),
+            department=department, name_prefix=name_prefix, limit=limit, offset=offset,
+        )
+        return [self._employee_with_relationships_from_record(record) for record in records]
+
+    async def get_employees_with_relationships_async(self, department: Optional[str] = None,
+                                                     name_prefix: Optional[str] = None,
+                                                     limit: Optional[int] = None,
+                                                     offset: int = 0) -> List[EmployeeWithRelationships]:
+        """Fetch employees with their relationships, optionally filtered and paged"""
+        if self.snapshot_enabled:
+            return (await self.snapshot_async()).employees_with_relationships(department, name_prefix, limit, offset)
+        records = await self._read_async(
+            "employees_with_relationships",
+            self._employees_with_relationships_query(department, name_prefix, limit, offset),
+            department=department, name_prefix=name_prefix, limit=limit, offset=offset,
+        )
+        return [self._employee_with_relationships_from_record(record) for record in records]
+
+    def get_employee_network_rows(self, department: Optional[str] = None,
+                                  name_prefix: Optional[str] = None,
+                                  limit: Optional[int] = None,
+                                  offset: int = 0) -> List[dict]:
+        """get_employees_with_relationships as plain dicts"""
+        records = self._read(
+            "employees_with_relationships",
+            self._employees_with_relationships_query(department, name_prefix, limit, offset),
+            department=department, name_prefix=name_prefix, limit=limit, offset=offset,
+        )
+        return [self._employee_network_row(record) for record in records]
+
+    async def get_employee_network_rows_async(self, department: Optional[str] = None,
+                                              name_prefix: Optional[str] = None,
+                                              limit: Optional[int] = None,
+                                              offset: int = 0) -> List[dict]:
+        """get_employees_with_relationships as plain dicts"""
+        if self.snapshot_enabled:
+            return (await self.snapshot_async()).employee_network_rows(department, name_prefix, limit, offset)
+        records = await self._read_async(
+            "employees_with_relationships",
+            self._employees_with_relationships_query(department, name_prefix, limit, offset),
+            department=department, name_prefix=name_prefix, limit=limit, offset=offset,
+        )
+        return [self._employee_network_row(record) for record in records]
     
     def get_relationships(self) -> List[Relationship]:
         """Get all relationships in the database"""
+        return [self._relationship_from_record(record) for record in self._read("relationships", RELATIONSHIPS_QUERY)]
+
+    async def get_relationships_async(self) -> List[Relationship]:
+        """Get all relationships in the database"""
+        if self.snapshot_enabled:
+            return (await self.snapshot_async()).relationships()
+        return [self._relationship_from_record(record) for record in await self._read_async("relationships", RELATIONSHIPS_QUERY)]
+
+    def get_relationship_rows(self) -> List[dict]:
+        """get_relationships as plain dicts"""
+        return [dict(record) for record in self._read("relationships", RELATIONSHIPS_QUERY)]
+
+    async def get_relationship_rows_async(self) -> List[dict]:
+        """get_relationships as plain dicts"""
+        if self.snapshot_enabled:
+            return (await self.snapshot_async()).relationship_rows()
+        return [dict(record) for record in await self._read_async("relationships", RELATIONSHIPS_QUERY)]
+
+    async def search_employees_async(self, text: str, limit: int = 20) -> List[dict]:
+        """Employees matching every word of text in their name, email, department or position,
+        best first, as {"employee", "score"} dicts"""
+        query = fulltext_query(text)
+        if not query:
+            return []
+        records = await self._read_async("search", SEARCH_QUERY, query=query, limit=limit)
+        return [{"employee": self._employee_from_record(record).model_dump(),
+                 "score": record["score"]} for record in records]
+
+    async def autocomplete_async(self, prefix: str, limit: int = 10) -> List[str]:
+        """Names starting with prefix, or with a word starting with it, from the in-memory name index"""
+        if self.name_index.generation != self.generation.value:
+            async with self._name_index_lock:
+                if self.name_index.generation != self.generation.value:
+                    await self._rebuild_name_index_async()
+        return self.name_index.complete(prefix, limit)
+
+    async def _rebuild_name_index_async(self):
+        start = time.perf_counter()
+        generation = self.generation.value
+        if self.snapshot_enabled:
+            snapshot = await self.snapshot_async()
+            generation, names = snapshot.generation, snapshot.names
+        else:
+            names = [record["name"] for record in await self._read_async("autocomplete_names", "MATCH (e:Employee) RETURN e.name as name")]
+        # Sorting a large graph's names is CPU work, keep it off the event loop. Writes made
+        # meanwhile moved the generation on, the next reader rebuilds it again
+        await asyncio.to_thread(self.name_index.rebuild, names, generation)
+        print(f"Built the name index of {len(names)} employees in {time.perf_counter() - start:.2f}s")
+
+    def load_csv_data(self, batch_size: int = None, mode: str = "full"):
+        """Load employee data from CSV files.
+
+        mode "full" wipes the graph and loads both files, "incremental" only applies the
+        differences between the files and the graph (nothing at all when the files did not
+        change since the last import). An incremental load keeps the employees created through
+        the API, even when they are in neither file; a full load removes them.
+        """
+        if mode not in ("full", "incremental"):
+            raise ValueError(f"Unknown load mode: {mode}")
+        batch_size = batch_size or self.batch_size
+        boss_file = os.path.join(self.dataset_dir, BOSS_FILE)
+        friends_file = os.path.join(self.dataset_dir, FRIENDS_FILE)
+        content_hash = self._csv_content_hash(boss_file, friends_file)
+        if mode == "incremental" and content_hash == self._last_import_hash():
+            print("CSV files unchanged since the last import, nothing to do")
+            return
+        # Deltas of an incremental load, a full load is published as a reset
+        changes = None
+        # Employees whose counts an incremental load changed
+        stale = set()
+        try:
+            # Make sure MERGE on name can use an index before the first batch is sent
+            self.ensure_name_index()
+            self.ensure_search_index()
+
+            if mode == "incremental":
+                changes = []
+                self._sync_csv_data(boss_file, friends_file, batch_size, changes, stale)
+            else:
+                self._clear_data(batch_size)
+                if self.ingest_workers > 1:
+                    self._load_csv_parallel(boss_file, friends_file, batch_size)
+                else:
+                    # Load employees from boss relationships CSV
+                    if os.path.exists(boss_file):
+                        self._load_boss_relationships(boss_file, batch_size)
+                    else:
+                        print(f"Boss relationships file not found: {boss_file}")
+
+                    # Load friend relationships CSV
+                    if os.path.exists(friends_file):
+                        self._load_friend_relationships(friends_file, batch_size)
+                    else:
+                        print(f"Friends relationships file not found: {friends_file}")
+
+            if mode == "full":
+                # The sync moved the changed subtrees itself
+                self.update_hierarchy(batch_size)
+            self.update_employee_stats(batch_size, stale if mode == "incremental" else None)
+            self._store_import_hash(content_hash)
+        except Exception:
+            # Unknown which names made it in, read them again
+            self.name_index.invalidate()
+            changes = None
+            raise
+        finally:
+            # The graph changed, even if the load stopped half way
+            generation = self._commit_generation(changes)
+            if mode == "incremental":
+                # The sync updated the index itself
+                self.name_index.advance(generation)
+            else:
+                self.name_index.invalidate()
+
+    def _clear_data(self, batch_size: int):
+        """Delete the whole graph in batches, so the wipe never needs one huge transaction"""
         with self.driver.session(database=self.database) as session:
-            result = session.run("""
-                MATCH (a:Employee)-[r]->(b:Employee)
-                RETURN a.name as from_employee, 
-                       b.name as to_employee, 
-                       TYPE(r) as relationship_type
-                ORDER BY a.name, b.name
-            """)
-            
-            relationships = []
-            for record in result:
-                rel = Relationship(
-                    from_employee=record["from_employee"],
-                    to_employee=record["to_employee"],
-                    relationship_type=record["relationship_type"]
-                )
-                relationships.append(rel)
-            
-            return relationships
-    
-    def load_csv_data(self):
-        """Load employee data from CSV files"""
-        # Clear existing data
+            self._run(session, "clear_data", """
+                MATCH (n)
+                CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF $batch_size ROWS
+            """, {"batch_size": batch_size})
+        print("Cleared existing data")
+
+    @staticmethod
+    def _csv_content_hash(*file_paths: str) -> str:
+        """Hash of the CSV files, to tell whether they changed since the last import"""
+        digest = hashlib.sha256()
+        for file_path in file_paths:
+            digest.update(os.path.basename(file_path).encode("utf-8") + b"\0")
+            if os.path.exists(file_path):
+                with open(file_path, "rb") as file:
+                    for chunk in iter(lambda: file.read(1 << 20), b""):
+                        digest.update(chunk)
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _last_import_hash(self) -> Optional[str]:
+        records = self._read("import_hash", "MATCH (state:ImportState {name: 'csv'}) RETURN state.hash as hash")
+        return records[0]["hash"] if records else None
+
+    def _store_import_hash(self, content_hash: str):
         with self.driver.session(database=self.database) as session:
-            session.run("MATCH (n) DETACH DELETE n")
-            print("Cleared existing data")
-        
-        # Load employees from boss relationships CSV
-        boss_file = "./dataset/employees-and-their-boss.csv"
-        if os.path.exists(boss_file):
-            self._load_boss_relationships(boss_file)
-        else:
-            print(f"Boss relationships file not found: {boss_file}")
-        
-        # Load friend relationships CSV
-        friends_file = "./dataset/employees-and-their-friends.csv"
-        if os.path.exists(friends_file):
-            self._load_friend_relationships(friends_file)
+            self._run(
+                session, "store_import_hash",
+                "MERGE (state:ImportState {name: 'csv'}) SET state.hash = $hash, state.imported_at = datetime()",
+                {"hash": content_hash},
+            )
+
+    def _read_csv_edges(self, file_path: str, columns: tuple, skip_self_references: bool = False) -> set:
+        """All (employee, other) pairs of a CSV file"""
+        if not os.path.exists(file_path):
+            print(f"Relationships file not found: {file_path}")
+            return set()
+        return {
+            (row["employee"], row["other"])
+            for batch in self._read_csv_batches(file_path, columns, self.batch_size, skip_self_references)
+            for row in batch
+        }
+
+    def _sync_csv_data(self, boss_file: str, friends_file: str, batch_size: int, changes: Optional[List[dict]] = None,
+                       stale: Optional[set] = None):
+        """Apply only the employees and relationships added to or removed from the CSV files,
+        appending the /changes deltas to changes and the employees whose counts changed to stale"""
+        changes = [] if changes is None else changes
+        stale = set() if stale is None else stale
+        start = time.perf_counter()
+        wanted = {
+            "REPORTS_TO": self._read_csv_edges(boss_file, BOSS_COLUMNS),
+            "FRIENDS_WITH": self._read_csv_edges(friends_file, FRIENDS_COLUMNS, skip_self_references=True),
+        }
+        wanted_names = {name for edges in wanted.values() for edge in edges for name in edge}
+
+        emp_ids, paths, names_by_key, api_names = {}, {}, {}, set()
+        for record in self._read("sync_employees", """
+            MATCH (e:Employee)
+            RETURN elementId(e) as id, e.name as name, e.emp_id as emp_id, e.path as path, e.source = 'api' as from_api
+        """):
+            emp_ids[record["name"]] = record["emp_id"]
+            paths[record["name"]] = record["path"]
+            names_by_key[record["id"]] = record["name"]
+            if record["from_api"]:
+                api_names.add(record["name"])
+        current_names = set(emp_ids)
+        current = {rel_type: set() for rel_type in wanted}
+        for record in self._read("sync_relationships", """
+            MATCH (a:Employee)-[r:REPORTS_TO|FRIENDS_WITH]->(b:Employee)
+            RETURN a.name as employee, b.name as other, TYPE(r) as rel_type
+        """):
+            current[record["rel_type"]].add((record["employee"], record["other"]))
+
+        def rows(pairs):
+            return [{"employee": employee, "other": other} for employee, other in sorted(pairs)]
+
+        def batches(items):
+            return (items[i:i + batch_size] for i in range(0, len(items), batch_size))
+
+        # Employees created through the API stay, without the relationships the files dropped
+        removed_names = [{"name": name} for name in sorted(current_names - wanted_names - api_names)]
+        deleted = {row["name"] for row in removed_names}
+        added_names = [{"name": name} for name in sorted(wanted_names - current_names)]
+        counts = {
+            "removed employees": self._write_batches("sync_remove_employees", """
+                UNWIND $rows AS row
+                MATCH (e:Employee {name: row.name})
+                DETACH DELETE e
+            """, batches(removed_names)),
+            "added employees": self._write_batches("sync_add_employees", """
+                UNWIND $rows AS row
+                MERGE (:Employee {name: row.name})
+            """, batches(added_names)),
+        }
+        for row in removed_names:
+            self.name_index.remove(row["name"])
+            changes.append(node_removed(self._graph_node_id(emp_ids[row["name"]], row["name"])))
+        for row in added_names:
+            self.name_index.add(row["name"])
+            changes.append(node_added(self._graph_node_from_employee(row)))
+
+        def node_id(name):
+            return self._graph_node_id(emp_ids.get(name), name)
+
+        for rel_type, add_query in (("REPORTS_TO", LOAD_BOSS_QUERY), ("FRIENDS_WITH", LOAD_FRIENDS_QUERY)):
+            # Relationships of removed employees are already gone with them
+            removed = {edge for edge in current[rel_type] - wanted[rel_type] if not set(edge) & deleted}
+            added = wanted[rel_type] - current[rel_type]
+            counts[f"removed {rel_type}"] = self._write_batches(f"sync_remove_{rel_type.lower()}", f"""
+                UNWIND $rows AS row
+                MATCH (:Employee {{name: row.employee}})-[r:{rel_type}]->(:Employee {{name: row.other}})
+                DELETE r
+            """, batches(rows(removed)))
+            counts[f"added {rel_type}"] = self._write_batches(f"sync_add_{rel_type.lower()}", add_query, batches(rows(added)))
+            # Including the relationships of removed employees, gone with them
+            for edge in (current[rel_type] - wanted[rel_type]) | added:
+                stale.update(edge)
+                # The bosses an employee leaves, its new bosses are found from the new paths
+                for name in edge:
+                    stale.update(names_by_key[key] for key in self._path_keys(paths.get(name)) if key in names_by_key)
+            changes.extend(relationship_removed(node_id(a), node_id(b), rel_type) for a, b in sorted(removed))
+            changes.extend(relationship_added(node_id(a), node_id(b), rel_type) for a, b in sorted(added))
+
+        # Employees whose boss changed, or who are new: their subtrees move
+        moved = {employee for employee, _ in current["REPORTS_TO"] ^ wanted["REPORTS_TO"]} - deleted
+        moved |= {row["name"] for row in added_names}
+        counts["moved subtrees"] = self._move_subtrees(
+            moved, {row["name"] for row in added_names}, dict(wanted["REPORTS_TO"]), batch_size
+        )
+
+        summary = ", ".join(f"{count} {change}" for change, count in counts.items())
+        print(f"Synced CSV data in {time.perf_counter() - start:.2f}s: {summary}")
+        return counts
+
+    def _move_subtrees(self, names: set, new_names: set, bosses: Dict[str, str], batch_size: int) -> int:
+        """Give the employees of names the level and path under their current boss, and rewrite
+        the paths of everyone under them (one transaction per subtree, reads never see it half
+        done). A subtree moved later rewrites the paths already derived from it, so only a boss
+        without a path yet (a new employee) has to come first: names are moved bosses first
+        (bosses maps employee -> boss). Falls back to update_hierarchy for more than batch_size
+        subtrees and for reporting cycles, made or broken. Returns the number of subtrees moved."""
+        if len(names) > batch_size:
+            self.update_hierarchy(batch_size)
+            return len(names)
+
+        def moved_bosses(name):
+            count, seen = 0, {name}
+            while bosses.get(name) is not None and bosses[name] not in seen:
+                name = bosses[name]
+                seen.add(name)
+                count += name in names
+            return count
+
+        pending = sorted(names, key=lambda name: (moved_bosses(name), name))
+        while pending:
+            blocked = [name for name in pending if not self._move_subtree(name, name in new_names)]
+            if len(blocked) == len(pending):
+                print(f"Reporting cycle around {', '.join(blocked[:5])}, rebuilding the whole hierarchy")
+                self.update_hierarchy(batch_size)
+                break
+            pending = blocked
+        return len(names)
+
+    def _move_subtree(self, name: str, new: bool) -> bool:
+        """Move the subtree of name under its current boss, False while its boss has no path (a
+        cycle, or a new boss not placed yet) or is inside the subtree"""
+        records = self._read("hierarchy_move_read", """
+            MATCH (e:Employee {name: $name})
+            RETURN elementId(e) as id, e.path as path, e.level as level,
+                   head([(e)-[:REPORTS_TO]->(boss:Employee) | boss {.path, .level}]) as boss
+        """, name=name)
+        if not records:
+            return True
+        key, old_path, old_level, boss = records[0]["id"], records[0]["path"], records[0]["level"], records[0]["boss"]
+        if old_path is None and not new:
+            # Part of a cycle until now
+            return False
+        if boss is None:
+            new_path, new_level = f"/{key}/", 0
+        elif boss["path"] is None or (old_path is not None and boss["path"].startswith(old_path)):
+            # Under a cycle, or under its own subtree
+            return False
         else:
-            print(f"Friends relationships file not found: {friends_file}")
-    
-    def _load_boss_relationships(self, file_path: str):
-        """Load boss-employee relationships from CSV"""
+            new_path, new_level = f"{boss['path']}{key}/", boss["level"] + 1
+        with self.driver.session(database=self.database) as session:
+            if old_path is None:
+                self._run(session, "hierarchy_move_new", """
+                    MATCH (e:Employee) WHERE elementId(e) = $id SET e.path = $new_path, e.level = $new_level
+                """, {"id": key, "new_path": new_path, "new_level": new_level})
+            elif old_path != new_path:
+                self._run(session, "hierarchy_move", """
+                    MATCH (e:Employee) WHERE e.path STARTS WITH $old_path
+                    SET e.path = $new_path + substring(e.path, size($old_path)),
+                        e.level = e.level + $shift
+                """, {"old_path": old_path, "new_path": new_path, "shift": new_level - old_level})
+        return True
+
+    @staticmethod
+    def _read_csv_batches(file_path: str, columns: tuple, batch_size: int,
+                          skip_self_references: bool = False) -> Iterator[List[dict]]:
+        """Stream a CSV file as lists of at most batch_size {"employee": ..., "other": ...} rows"""
+        employee_column, other_column = columns
         with open(file_path, 'r', encoding='utf-8') as file:
             reader = csv.DictReader(file)
-            
-            with self.driver.session(database=self.database) as session:
-                for row in reader:
-                    employee_name = row['employee name'].strip()
-                    boss_name = row['has boss'].strip()
-                    
-                    # Create employee and boss nodes if they don't exist
-                    session.run("""
-                        MERGE (emp:Employee {name: $employee_name})
-                        MERGE (boss:Employee {name: $boss_name})
-                        MERGE (emp)-[:REPORTS_TO]->(boss)
-                    """, employee_name=employee_name, boss_name=boss_name)
-        
-        print(f"Loaded boss relationships from {file_path}")
+            rows = (
+                {"employee": row[employee_column].strip(), "other": row[other_column].strip()}
+                for row in reader
+            )
+            if skip_self_references:
+                # Skip self-references (like "Millie,Millie")
+                rows = (row for row in rows if row["employee"] != row["other"])
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    return
+                yield batch
+
+    def _write_batches(self, query_name: str, query: str, batches: Iterator[List[dict]]) -> int:
+        """Send each batch as `UNWIND $rows` in its own write transaction, return the row count"""
+        def write_batch(tx, rows):
+            self._run(tx, query_name, query, {"rows": rows})
+
+        total = 0
+        with self.driver.session(database=self.database) as session:
+            for rows in batches:
+                session.execute_write(write_batch, rows)
+                total += len(rows)
+        return total
+
+    def _load_relationships(self, file_path: str, columns: tuple, query_name: str, query: str, batch_size: int,
+                            skip_self_references: bool = False) -> int:
+        """Bulk load one relationship CSV and report the throughput"""
+        start = time.perf_counter()
+        batches = self._read_csv_batches(file_path, columns, batch_size, skip_self_references)
+        count = self._write_batches(query_name, query, batches)
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed if elapsed > 0 else float("inf")
+        print(f"Loaded {count} rows from {file_path} in {elapsed:.2f}s ({rate:.0f} rows/sec)")
+        return count
     
-    def _load_friend_relationships(self, file_path: str):
+    def _load_boss_relationships(self, file_path: str, batch_size: int = None):
+        """Load boss-employee relationships from CSV"""
+        return self._load_relationships(
+            file_path,
+            BOSS_COLUMNS,
+            "load_boss",
+            LOAD_BOSS_QUERY,
+            batch_size or self.batch_size,
+        )
+    
+    def _load_friend_relationships(self, file_path: str, batch_size: int = None):
         """Load friendship relationships from CSV"""
-        with open(file_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            
-            with self.driver.session(database=self.database) as session:
-                for row in reader:
-                    employee_name = row['employee name'].strip()
-                    friend_name = row['is friends with'].strip()
-                    
-                    # Skip self-references (like "Millie,Millie")
-                    if employee_name == friend_name:
-                        continue
-                    
-                    # Create employee and friend nodes if they don't exist
-                    session.run("""
-                        MERGE (emp:Employee {name: $employee_name})
-                        //SET emp.id = $employee_name
-                        MERGE (friend:Employee {name: $friend_name})
-                        //SET friend.id = $friend_name
-                        MERGE (emp)-[:FRIENDS_WITH]->(friend)
-                    """, employee_name=employee_name, friend_name=friend_name)
-        
-        print(f"Loaded friendship relationships from {file_path}")
+        return self._load_relationships(
+            file_path,
+            FRIENDS_COLUMNS,
+            "load_friends",
+            LOAD_FRIENDS_QUERY,
+            batch_size or self.batch_size,
+            skip_self_references=True,
+        )
     
-    def seed_sample_data(self):
+    def _load_csv_parallel(self, boss_file: str, friends_file: str, batch_size: int) -> Dict[str, int]:
+        """Load both CSV files into the empty graph with ingest_workers writer sessions (see ParallelIngest)"""
+        files = []
+        for rel_type, file_path, columns, skip_self_references in (
+            ("REPORTS_TO", boss_file, BOSS_COLUMNS, False),
+            ("FRIENDS_WITH", friends_file, FRIENDS_COLUMNS, True),
+        ):
+            if os.path.exists(file_path):
+                files.append((rel_type, file_path, columns, skip_self_references))
+            else:
+                print(f"Relationships file not found: {file_path}")
+        return ParallelIngest(self, self.ingest_workers, batch_size).run(files)
+
+    def seed_sample_data(self, mode: str = "full"):
         """Load data from CSV files instead of hardcoded sample data"""
-        print("Loading employee data from CSV files...")
+        print(f"Loading employee data from CSV files ({mode})...")
         try:
-            self.load_csv_data()
+            self.load_csv_data(mode=mode)
             
             # Get count of employees loaded
             with self.driver.session(database=self.database) as session:
-                result = session.run("MATCH (e:Employee) RETURN COUNT(e) as count")
-                count = result.single()["count"]
+                count = self._run(session, "count_employees", "MATCH (e:Employee) RETURN COUNT(e) as count")[0]["count"]
                 print(f"Successfully loaded {count} employees from CSV data!")
                 
         except Exception as e:
             print(f"Error loading CSV data: {e}")
             # Fallback to sample data if CSV loading fails   
-    def get_graph_data(self) -> dict:
-        """Get graph data in NVL format with nodes and relationships"""
+
+    @staticmethod
+    def _subtree_query(max_depth: Optional[int], exclude_friends: bool,
+                       after: Optional[str], limit: Optional[int]) -> str:
+        filters = []
+        if max_depth is not None:
+            filters.append("AND e.level <= root.level + $max_depth")
+        if exclude_friends:
+            filters.append("AND NOT (e)-[:FRIENDS_WITH]-(root)")
+        if after is not None:
+            # Keyset on (name, element id) as for /graph, a bare name cursor has no $after_id
+            filters.append("AND (e.name > $after_name OR (e.name = $after_name AND elementId(e) > $after_id))")
+        return SUBTREE_QUERY.format(filters=" ".join(filters), page="LIMIT $limit" if limit else "")
+
+    @classmethod
+    def _hierarchy_from_records(cls, records: list, limit: Optional[int] = None) -> Optional[HierarchyResponse]:
+        """HierarchyResponse of a subtree/chain record, None when the employee does not exist"""
+        if not records:
+            return None
+        record = records[0]
+        members = [
+            HierarchyMember(employee=cls._employee_from_record(member), depth=member["depth"])
+            for member in record["members"]
+        ]
+        last = record["members"][-1] if members else None
+        next_cursor = page_cursor(last["name"], last["element_id"]) if limit and len(members) == limit else None
+        return HierarchyResponse(root=record["root"], employees=members, total=len(members), next_cursor=next_cursor)
+
+    def get_subtree(self, name: str, max_depth: Optional[int] = None, exclude_friends: bool = False,
+                    after: Optional[str] = None, limit: Optional[int] = None) -> Optional[HierarchyResponse]:
+        """Everyone reporting to name, directly or not, paged by name and element id"""
+        records = self._read("subtree", self._subtree_query(max_depth, exclude_friends, after, limit),
+                             name=name, max_depth=max_depth, **self._graph_page_params(after, limit))
+        return self._hierarchy_from_records(records, limit)
+
+    async def get_subtree_async(self, name: str, max_depth: Optional[int] = None, exclude_friends: bool = False,
+                                after: Optional[str] = None, limit: Optional[int] = None) -> Optional[HierarchyResponse]:
+        """Everyone reporting to name, directly or not, paged by name and element id"""
+        if self.snapshot_enabled:
+            return (await self.snapshot_async()).subtree(name, max_depth, exclude_friends, after, limit)
+        records = await self._read_async("subtree", self._subtree_query(max_depth, exclude_friends, after, limit),
+                                         name=name, max_depth=max_depth, **self._graph_page_params(after, limit))
+        return self._hierarchy_from_records(records, limit)
+
+    def get_chain(self, name: str, max_depth: Optional[int] = None) -> Optional[HierarchyResponse]:
+        """The bosses of name up to the root, nearest first"""
+        return self._hierarchy_from_records(self._read("chain", CHAIN_QUERY, name=name, max_depth=max_depth))
+
+    async def get_chain_async(self, name: str, max_depth: Optional[int] = None) -> Optional[HierarchyResponse]:
+        """The bosses of name up to the root, nearest first"""
+        if self.snapshot_enabled:
+            return (await self.snapshot_async()).chain(name, max_depth)
+        return self._hierarchy_from_records(await self._read_async("chain", CHAIN_QUERY, name=name, max_depth=max_depth))
+
+    @staticmethod
+    def _employee_stats_query(sort: str, order: str, department: Optional[str] = None,
+                              min_value: Optional[int] = None, max_value: Optional[int] = None,
+                              limit: Optional[int] = None, offset: int = 0) -> str:
+        """Employees with their counts ordered by one of STATS_FIELDS, bounded by min_value/max_value of it"""
+        field = STATS_FIELDS[sort]
+        filters = ""
+        if min_value is not None:
+            filters += f"AND e.{field} >= $min_value "
+        if max_value is not None:
+            filters += f"AND e.{field} <= $max_value "
+        if department is not None:
+            filters += "AND e.department = $department"
+        page = ""
+        if offset:
+            page += "SKIP $offset "
+        if limit:
+            page += "LIMIT $limit"
+        return EMPLOYEE_STATS_QUERY.format(field=field, filters=filters, order="DESC" if order == "desc" else "ASC", page=page)
+
+    def get_employee_stats(self, sort: str = "subtree_size", order: str = "desc", department: Optional[str] = None,
+                           min_value: Optional[int] = None, max_value: Optional[int] = None,
+                           limit: Optional[int] = None, offset: int = 0) -> List[dict]:
+        """Employees with their direct report, subtree and friend counts and depth, sorted and filtered by one of them"""
+        records = self._read("employee_stats", self._employee_stats_query(sort, order, department, min_value, max_value, limit, offset),
+                             department=department, min_value=min_value, max_value=max_value, limit=limit, offset=offset)
+        return [self._employee_stats_row(record) for record in records]
+
+    async def get_employee_stats_async(self, sort: str = "subtree_size", order: str = "desc", department: Optional[str] = None,
+                                       min_value: Optional[int] = None, max_value: Optional[int] = None,
+                                       limit: Optional[int] = None, offset: int = 0) -> List[dict]:
+        """Employees with their direct report, subtree and friend counts and depth, sorted and filtered by one of them"""
+        records = await self._read_async(
+            "employee_stats", self._employee_stats_query(sort, order, department, min_value, max_value, limit, offset),
+            department=department, min_value=min_value, max_value=max_value, limit=limit, offset=offset,
+        )
+        return [self._employee_stats_row(record) for record in records]
+
+    @staticmethod
+    def _graph_node_id(emp_id, name: str) -> str:
+        """NVL node id: the emp_id when there is one, the name otherwise"""
+        return str(emp_id) if emp_id is not None else name.replace(" ", "_")
+
+    @staticmethod
+    def _page_clause(variable: str, after: Optional[str], limit: Optional[int]) -> str:
+        """Keyset pagination on the employee name, then the element id: names are not unique"""
+        clause = ""
+        if after is not None:
+            # A bare name cursor has no $after_id, elementId(e) > null never holds
+            clause = (f"WHERE {variable}.name > $after_name "
+                      f"OR ({variable}.name = $after_name AND elementId({variable}) > $after_id) ")
+        clause += f"WITH {variable} ORDER BY {variable}.name, elementId({variable})"
+        if limit:
+            clause += " LIMIT $limit"
+        return clause
+
+    @staticmethod
+    def _graph_cursor(name: str, element_id: str) -> str:
+        """next_cursor of a /graph page: the name and element id of its last employee"""
+        return page_cursor(name, element_id)
+
+    @staticmethod
+    def _graph_page_params(after: Optional[str], limit: Optional[int]) -> dict:
+        """Query parameters of a /graph or subtree page, after is a _graph_cursor or a bare name"""
+        after_name, after_id = parse_page_cursor(after)
+        return {"after_name": after_name, "after_id": after_id, "limit": limit}
+
+    @classmethod
+    def _graph_queries(cls, after: Optional[str], limit: Optional[int]) -> Tuple[str, str]:
+        """Node and relationship queries of one /graph page"""
+        page = cls._page_clause("e", after, limit)
+        # Get nodes (employees)
+        nodes_query = f"""
+            MATCH (e:Employee)
+            {page}
+            RETURN elementId(e) as element_id,
+                   e.emp_id as id,
+                   e.name as name,
+                   e.department as department,
+                   e.position as position,
+                   e.email as email
+        """
+        # Get relationships leaving the nodes of this page
+        rels_query = f"""
+            MATCH (e:Employee)
+            {page}
+            MATCH (e)-[r]->(b:Employee)
+            RETURN e.emp_id as from_id,
+                   e.name as from_name,
+                   b.emp_id as to_id,
+                   b.name as to_name,
+                   TYPE(r) as rel_type,
+                   id(r) as rel_id
+            ORDER BY e.name, elementId(e), b.name
+        """
+        return nodes_query, rels_query
+
+    @classmethod
+    def _graph_node_from_record(cls, record) -> dict:
+        node = {
+            "id": cls._graph_node_id(record["id"], record["name"]),
+            "element_id": record.get("element_id"),
+            "name": record["name"],
+            "department": record["department"],
+            "position": record["position"],
+            "email": record["email"]
+        }
+        # Remove None values
+        return {k: v for k, v in node.items() if v is not None}
+
+    @classmethod
+    def _graph_relationship_from_record(cls, record) -> dict:
+        return {
+            "id": str(record["rel_id"]),
+            "from": cls._graph_node_id(record["from_id"], record["from_name"]),
+            "to": cls._graph_node_id(record["to_id"], record["to_name"]),
+            "type": record["rel_type"]
+        }
+
+    def iter_graph_data(self, after: Optional[str] = None, limit: Optional[int] = None) -> Iterator[Tuple[str, dict]]:
+        """Yield graph data in NVL format as ("node" | "relationship", item) pairs, as records arrive.
+
+        Nodes are paged by name: `after` is the next_cursor of the previous page and `limit`
+        the page size. A page carries the relationships leaving its nodes, so every
+        relationship is sent exactly once across all pages. The last pair is
+        ("cursor", {"next_cursor": ...}), where next_cursor is None after the last page.
+        """
+        nodes_query, rels_query = self._graph_queries(after, limit)
+        params = self._graph_page_params(after, limit)
+        last_node = None
+        node_count = 0
         with self.driver.session(database=self.database) as session:
-            # Get nodes (employees)
-            nodes_result = session.run("""
-                MATCH (e:Employee)
-                RETURN e.emp_id as id,
-                       e.name as name,
-                       e.department as department,
-                       e.position as position,
-                       e.email as email
-                ORDER BY e.name
-            """)
-            
-            nodes = []
-            for record in nodes_result:
-                node = {
-                    "id": str(record["id"]) if record["id"] is not None else record["name"].replace(" ", "_"),
-                    "name": record["name"],
-                    "department": record["department"],
-                    "position": record["position"],
-                    "email": record["email"]
-                }
-                # Remove None values
-                node = {k: v for k, v in node.items() if v is not None}
-                nodes.append(node)
-            
-            # Get relationships
-            rels_result = session.run("""
-                MATCH (a:Employee)-[r]->(b:Employee)
-                RETURN a.emp_id as from_id,
-                       a.name as from_name,
-                       b.emp_id as to_id,
-                       b.name as to_name,
-                       TYPE(r) as rel_type,
-                       id(r) as rel_id
-                ORDER BY a.name, b.name
-            """)
+            for record in self._stream(session, "graph_nodes", nodes_query, params):
+                last_node = (record["name"], record["element_id"])
+                node_count += 1
+                yield "node", self._graph_node_from_record(record)
             
-            relationships = []
-            for record in rels_result:
-                from_id = str(record["from_id"]) if record["from_id"] is not None else record["from_name"].replace(" ", "_")
-                to_id = str(record["to_id"]) if record["to_id"] is not None else record["to_name"].replace(" ", "_")
-                
-                rel = {
-                    "id": str(record["rel_id"]),
-                    "from": from_id,
-                    "to": to_id,
-                    "type": record["rel_type"]
-                }
-                relationships.append(rel)
-            
-            return {
-                "nodes": nodes,
-                "relationships": relationships
-            }
+            for record in self._stream(session, "graph_relationships", rels_query, params):
+                yield "relationship", self._graph_relationship_from_record(record)
+
+        next_cursor = self._graph_cursor(*last_node) if limit and node_count == limit else None
+        yield "cursor", {"next_cursor": next_cursor}
+
+    async def aiter_graph_data(self, after: Optional[str] = None, limit: Optional[int] = None) -> AsyncIterator[Tuple[str, dict]]:
+        """Async version of iter_graph_data"""
+        if self.snapshot_enabled:
+            for pair in (await self.snapshot_async()).iter_graph_data(after, limit):
+                yield pair
+            return
+        nodes_query, rels_query = self._graph_queries(after, limit)
+        params = self._graph_page_params(after, limit)
+        last_node = None
+        node_count = 0
+        async with self.async_driver.session(database=self.database) as session:
+            async for record in self._stream_async(session, "graph_nodes", nodes_query, params):
+                last_node = (record["name"], record["element_id"])
+                node_count += 1
+                yield "node", self._graph_node_from_record(record)
+
+            async for record in self._stream_async(session, "graph_relationships", rels_query, params):
+                yield "relationship", self._graph_relationship_from_record(record)
+
+        next_cursor = self._graph_cursor(*last_node) if limit and node_count == limit else None
+        yield "cursor", {"next_cursor": next_cursor}
+
+    @staticmethod
+    def _add_graph_item(graph_data: dict, kind: str, item: dict, limit: Optional[int],
+                        positions: Optional[Dict[str, Tuple[float, float]]] = None):
+        if kind == "node":
+            if positions is not None and item.get("element_id") in positions:
+                item["x"], item["y"] = positions[item["element_id"]]
+            graph_data["nodes"].append(item)
+        elif kind == "relationship":
+            graph_data["relationships"].append(item)
+        elif limit:
+            graph_data.update(item)
+
+    def get_graph_data(self, after: Optional[str] = None, limit: Optional[int] = None, layout: bool = False) -> dict:
+        """Get graph data in NVL format with nodes and relationships, optionally one page of it.
+        With layout, nodes carry the server-side x/y coordinates"""
+        positions = self.layout() if layout else None
+        graph_data = {"nodes": [], "relationships": []}
+        for kind, item in self.iter_graph_data(after, limit):
+            self._add_graph_item(graph_data, kind, item, limit, positions)
+        return graph_data
+
+    async def get_graph_data_async(self, after: Optional[str] = None, limit: Optional[int] = None,
+                                   layout: bool = False) -> dict:
+        """Get graph data in NVL format with nodes and relationships, optionally one page of it.
+        With layout, nodes carry the server-side x/y coordinates"""
+        positions = await self.layout_async() if layout else None
+        graph_data = {"nodes": [], "relationships": []}
+        async for kind, item in self.aiter_graph_data(after, limit):
+            self._add_graph_item(graph_data, kind, item, limit, positions)
+        return graph_data
 
 # Create a global instance for use across the application
 neo4j_client = Neo4jClient()
@@ -0,0 +1,210 @@
+"""
+Export the graph as two columnar files for offline analysis: nodes and edges.
+
+    python api/export.py export/ --format arrow --compression zstd
+
+Nodes get integer ids (0..n-1, in name order) and the edges refer to them, department,
+position and relationship type are dictionary-encoded. Arrow IPC files can be memory-mapped:
+
+    pyarrow.ipc.open_file(pyarrow.memory_map("export/nodes.arrow")).read_all()
+"""
+import argparse
+import os
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pa = None
+
+EXPORT_NODES_QUERY = """
+    MATCH (e:Employee)
+    RETURN elementId(e) as element_id,
+           e.name as name,
+           e.emp_id as emp_id,
+           e.email as email,
+           e.department as department,
+           e.position as position
+    ORDER BY e.name
+"""
+
+EXPORT_EDGES_QUERY = """
+    MATCH (a:Employee)-[r]->(b:Employee)
+    RETURN elementId(a) as from_id,
+           elementId(b) as to_id,
+           TYPE(r) as rel_type
+"""
+
+# File extension and supported codecs of every format, the first codec is the default
+FORMATS = {
+    "parquet": (".parquet", ("zstd", "gzip", "snappy", "none")),
+    "arrow": (".arrow", ("zstd", "lz4", "none")),
+}
+
+
+def export_available() -> bool:
+    return pa is not None
+
+
+def _check_pyarrow():
+    if not export_available():
+        raise RuntimeError("The export needs pyarrow, pip install pyarrow")
+
+
+def node_schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("name", pa.string()),
+        ("emp_id", pa.int64()),
+        ("email", pa.string()),
+        ("department", pa.dictionary(pa.int32(), pa.string())),
+        ("position", pa.dictionary(pa.int32(), pa.string())),
+    ])
+
+
+def edge_schema():
+    return pa.schema([
+        ("source", pa.int64()),
+        ("target", pa.int64()),
+        ("type", pa.dictionary(pa.int32(), pa.string())),
+    ])
+
+
+class DictionaryEncoder:
+    """Codes of the values of one column across batches.
+
+    The dictionary only grows, so every batch's dictionary extends the previous one and
+    the Arrow IPC writer sends deltas instead of replacing it.
+    """
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def encode(self, values: Iterable[Optional[str]]):
+        indices = []
+        for value in values:
+            if value is None:
+                indices.append(None)
+                continue
+            code = self.codes.get(value)
+            if code is None:
+                code = self.codes[value] = len(self.values)
+                self.values.append(value)
+            indices.append(code)
+        return pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()), pa.array(self.values, pa.string()))
+
+
+class _TableWriter:
+    """Write record batches to a Parquet or Arrow IPC file"""
+
+    def __init__(self, path: str, schema, file_format: str, compression: str):
+        codec = None if compression == "none" else compression
+        if file_format == "parquet":
+            self._writer = pa.parquet.ParquetWriter(path, schema, compression=codec or "none")
+        else:
+            # Dictionaries grow from batch to batch, see DictionaryEncoder
+            options = pa.ipc.IpcWriteOptions(compression=codec, emit_dictionary_deltas=True)
+            self._writer = pa.ipc.new_file(path, schema, options=options)
+
+    def write(self, batch):
+        self._writer.write_batch(batch)
+
+    def close(self):
+        self._writer.close()
+
+
+def _batches(records: Iterator, batch_size: int) -> Iterator[list]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def export_graph(client, directory: str, file_format: str = "parquet", compression: Optional[str] = None,
+                 batch_size: Optional[int] = None) -> Dict[str, int]:
+    """Stream the employees and their relationships out of Neo4j into directory/nodes.<ext> and
+    directory/edges.<ext>, batch_size records per record batch. Returns the row counts"""
+    _check_pyarrow()
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown export format: {file_format}")
+    extension, codecs = FORMATS[file_format]
+    compression = compression or codecs[0]
+    if compression not in codecs:
+        raise ValueError(f"{file_format} does not support {compression} compression, use one of {', '.join(codecs)}")
+    batch_size = batch_size or client.batch_size
+    os.makedirs(directory, exist_ok=True)
+    start = time.perf_counter()
+
+    nodes_schema, edges_schema = node_schema(), edge_schema()
+    node_ids: Dict[str, int] = {}
+    departments, positions, rel_types = DictionaryEncoder(), DictionaryEncoder(), DictionaryEncoder()
+    skipped = 0
+    with client.driver.session(database=client.database) as session:
+        writer = _TableWriter(os.path.join(directory, f"nodes{extension}"), nodes_schema, file_format, compression)
+        try:
+            for batch in _batches(client._stream(session, "export_nodes", EXPORT_NODES_QUERY), batch_size):
+                first_id = len(node_ids)
+                for record in batch:
+                    node_ids[record["element_id"]] = len(node_ids)
+                writer.write(pa.record_batch([
+                    pa.array(range(first_id, len(node_ids)), pa.int64()),
+                    pa.array([record["name"] for record in batch], pa.string()),
+                    pa.array([record["emp_id"] for record in batch], pa.int64()),
+                    pa.array([record["email"] for record in batch], pa.string()),
+                    departments.encode(record["department"] for record in batch),
+                    positions.encode(record["position"] for record in batch),
+                ], schema=nodes_schema))
+        finally:
+            writer.close()
+
+        writer = _TableWriter(os.path.join(directory, f"edges{extension}"), edges_schema, file_format, compression)
+        edge_count = 0
+        try:
+            for batch in _batches(client._stream(session, "export_edges", EXPORT_EDGES_QUERY), batch_size):
+                # Relationships of employees created since the nodes were read are left out
+                known = [record for record in batch if record["from_id"] in node_ids and record["to_id"] in node_ids]
+                skipped += len(batch) - len(known)
+                if not known:
+                    continue
+                edge_count += len(known)
+                writer.write(pa.record_batch([
+                    pa.array([node_ids[record["from_id"]] for record in known], pa.int64()),
+                    pa.array([node_ids[record["to_id"]] for record in known], pa.int64()),
+                    rel_types.encode(record["rel_type"] for record in known),
+                ], schema=edges_schema))
+        finally:
+            writer.close()
+
+    if skipped:
+        print(f"Left {skipped} relationships to employees created during the export out")
+    print(f"Exported {len(node_ids)} employees and {edge_count} relationships as {file_format} "
+          f"({compression}) in {time.perf_counter() - start:.2f}s")
+    return {"nodes": len(node_ids), "edges": edge_count}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="output directory")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    parser.add_argument("--compression", help="zstd (default), gzip, snappy or none for Parquet; zstd, lz4 or none for Arrow")
+    parser.add_argument("--batch-size", type=int, help="records per batch (default NEO4J_BATCH_SIZE)")
+    args = parser.parse_args()
+
+    from database import neo4j_client
+    neo4j_client.connect()
+    try:
+        export_graph(neo4j_client, args.directory, args.format, args.compression, args.batch_size)
+    finally:
+        neo4j_client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import os
+import sys
+import time
+import zlib
+import queue
+import threading
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+
+# The graph was wiped and the names are deduplicated, so no MERGE is needed
+INGEST_EMPLOYEES_QUERY = """
+    UNWIND $rows AS row
+    CREATE (:Employee {name: row.name})
+"""
+
+# Every employee exists by now, only the relationship is merged
+INGEST_RELATIONSHIPS_QUERY = """
+    UNWIND $rows AS row
+    MATCH (emp:Employee {{name: row.employee}})
+    MATCH (other:Employee {{name: row.other}})
+    MERGE (emp)-[:{rel_type}]->(other)
+"""
+
+# Deadlocks, lost leaders and dropped connections: worth another try
+RETRYABLE_ERRORS = (TransientError, ServiceUnavailable, SessionExpired)
+
+# Seconds before the first retry, doubled for every next one
+RETRY_DELAY = 0.5
+
+
+def round_robin(groups: int) -> List[List[Tuple[int, int]]]:
+    """Rounds of (group, group) cells covering every pair of groups once, no group twice in a round.
+
+    The first round pairs every group with itself, the next ones are the circle method of
+    a round-robin tournament (groups must be even).
+    """
+    rounds = [[(group, group) for group in range(groups)]]
+    ring = list(range(groups))
+    for _ in range(groups - 1):
+        rounds.append([tuple(sorted((ring[i], ring[groups - 1 - i]))) for i in range(groups // 2)])
+        # Keep the first group in place and turn the others
+        ring = [ring[0], ring[-1]] + ring[1:-1]
+    return rounds
+
+
+class ParallelIngest:
+    """Full CSV load through several writer sessions at once.
+
+    A producer thread parses the CSV files into batches of rows. Every new employee name
+    is created as soon as a batch of them is complete, while the parsing goes on; the names
+    are distinct, so these batches never touch the same node. Each employee falls in one of
+    2 x workers hash groups, a relationship in the cell of its two groups. A cell's
+    relationships are written as soon as a batch of them is complete and their employees
+    exist, also while the parsing goes on: a batch is only started when no batch in flight
+    shares one of its groups, so concurrent transactions never lock the same node and
+    cannot deadlock each other. The last, partial batches are written in round-robin
+    rounds (see round_robin), which keep every writer busy. Batches failing with a
+    transient error are retried with backoff.
+    """
+
+    def __init__(self, client, workers: int, batch_size: int, max_retries: Optional[int] = None):
+        self.client = client
+        self.workers = workers
+        self.groups = 2 * workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("NEO4J_INGEST_RETRIES", "5"))
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def _group(self, name: str) -> int:
+        return zlib.crc32(name.encode("utf-8")) % self.groups
+
+    def _produce(self, files: List[tuple], rows: queue.Queue, stop: threading.Event):
+        """Parse the files into (rel_type, batch) items, then None; an exception is passed on as an item"""
+        def put(item):
+            while not stop.is_set():
+                try:
+                    rows.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        try:
+            for rel_type, file_path, columns, skip_self_references in files:
+                for batch in self.client._read_csv_batches(file_path, columns, self.batch_size, skip_self_references):
+                    put((rel_type, batch))
+            put(None)
+        except Exception as e:
+            put(e)
+
+    def _write(self, query_name: str, query: str, rows: List[dict]):
+        """One batch in its own write transaction, retried on transient errors"""
+        def write(tx):
+            self.client._run(tx, query_name, query, {"rows": rows})
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                # A fresh session per attempt, the previous one may have lost its connection
+                with self.client.driver.session(database=self.client.database) as session:
+                    session.execute_write(write)
+                return
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                with self._lock:
+                    self.retries += 1
+                delay = RETRY_DELAY * 2 ** attempt
+                print(f"Retrying a {query_name} batch in {delay:.1f}s: {e}")
+                time.sleep(delay)
+
+    def _write_relationships(self, rel_type: str, pairs: List[Tuple[str, str]]) -> Counter:
+        rows = [{"employee": employee, "other": other} for employee, other in pairs]
+        self._write(f"ingest_{rel_type.lower()}", INGEST_RELATIONSHIPS_QUERY.format(rel_type=rel_type), rows)
+        return Counter({rel_type: len(rows)})
+
+    def run(self, files: List[tuple]) -> Dict[str, int]:
+        """Load (rel_type, file_path, columns, skip_self_references) files into the empty graph,
+        return the number of employees and of relationships per type"""
+        start = time.perf_counter()
+        rows = queue.Queue(maxsize=2 * self.workers)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._produce, args=(files, rows, stop), name="csv-producer", daemon=True)
+        producer.start()
+
+        groups: Dict[str, int] = {}
+        # Name -> number of the employee batch creating it
+        batch_of: Dict[str, int] = {}
+        new_names: List[dict] = []
+        # (cell, rel_type) -> (employee, other) pairs not sent yet, and the last employee batch they need
+        pending: Dict[Tuple[Tuple[int, int], str], List[Tuple[str, str]]] = {}
+        needs: Dict[Tuple[Tuple[int, int], str], int] = {}
+        # (cell, rel_type, pairs, needed employee batch) batches waiting for their employees or groups
+        ready = deque()
+        counts = Counter()
+        try:
+            with ThreadPoolExecutor(self.workers, thread_name_prefix="ingest") as pool:
+                employee_writes = []
+                # Relationship batch in flight -> the groups it holds
+                in_flight = {}
+                busy = set()
+                created = 0
+
+                def create_employees(batch):
+                    employee_writes.append(pool.submit(self._write, "ingest_employees", INGEST_EMPLOYEES_QUERY, batch))
+
+                def queue_pairs(key):
+                    pairs = pending.pop(key)
+                    ready.append((key[0], key[1], pairs, needs.pop(key)))
+
+                def dispatch():
+                    """Collect the finished writes, start the ready batches whose groups are free"""
+                    nonlocal created
+                    for future in [future for future in in_flight if future.done()]:
+                        busy.difference_update(in_flight.pop(future))
+                        counts.update(future.result())
+                    while created < len(employee_writes) and employee_writes[created].done():
+                        # Raises the error of a failed batch
+                        employee_writes[created].result()
+                        created += 1
+                    waiting = deque()
+                    while ready:
+                        cell, rel_type, pairs, need = item = ready.popleft()
+                        if need >= created or busy.intersection(cell):
+                            waiting.append(item)
+                            continue
+                        busy.update(cell)
+                        in_flight[pool.submit(self._write_relationships, rel_type, pairs)] = set(cell)
+                    ready.extend(waiting)
+
+                while True:
+                    item = rows.get()
+                    if item is None:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    rel_type, batch = item
+                    for row in batch:
+                        pair = []
+                        for name in (row["employee"], row["other"]):
+                            if name not in groups:
+                                name = sys.intern(name)
+                                groups[name] = self._group(name)
+                                batch_of[name] = len(employee_writes) + len(new_names) // self.batch_size
+                                new_names.append({"name": name})
+                            pair.append(name)
+                        key = (tuple(sorted((groups[pair[0]], groups[pair[1]]))), rel_type)
+                        pending.setdefault(key, []).append(tuple(pair))
+                        needs[key] = max(needs.get(key, 0), batch_of[pair[0]], batch_of[pair[1]])
+                        if len(pending[key]) >= self.batch_size:
+                            queue_pairs(key)
+                    while len(new_names) >= self.batch_size:
+                        create_employees(new_names[:self.batch_size])
+                        del new_names[:self.batch_size]
+                    dispatch()
+                if new_names:
+                    create_employees(new_names)
+                counts["employees"] = len(groups)
+                parsed = time.perf_counter()
+
+                # The partial batches left, round by round
+                for cells_of_round in round_robin(self.groups):
+                    for cell in cells_of_round:
+                        for key in [key for key in pending if key[0] == cell]:
+                            queue_pairs(key)
+                while True:
+                    dispatch()
+                    waitables = list(in_flight) + employee_writes[created:]
+                    if not waitables:
+                        break
+                    wait(waitables, return_when=FIRST_COMPLETED)
+        finally:
+            stop.set()
+
+        elapsed = time.perf_counter() - start
+        relationships = sum(count for key, count in counts.items() if key != "employees")
+        rate = relationships / elapsed if elapsed > 0 else float("inf")
+        print(f"Ingested {counts['employees']} employees and {relationships} relationships in {elapsed:.2f}s "
+              f"({parsed - start:.2f}s until the files were parsed) with {self.workers} writers "
+              f"({rate:.0f} rows/sec overall, {self.retries} retried batches)")
+        return dict(counts)
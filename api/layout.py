@@ -0,0 +1,198 @@
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from snapshot import GraphSnapshot
+
+# Distance between two levels of the reporting tree, and between two leaves
+LEVEL_GAP = 150.0
+SLOT_GAP = 60.0
+
+# Force refinement: friends are pulled to FRIEND_DISTANCE apart, every node is pulled back
+# towards its place in the tree, and neighbours on a level closer than SLOT_GAP push apart
+FRIEND_DISTANCE = 2 * SLOT_GAP
+SPRING = 0.05
+ANCHOR = 0.1
+COLLISION = 0.5
+
+
+def tree_layout(snapshot: GraphSnapshot) -> np.ndarray:
+    """(x, y) of every node in a layered layout of the REPORTS_TO tree.
+
+    y is the depth below the root; leaves get consecutive slots in depth-first order, so
+    every subtree is a contiguous range, and a manager is centered over its leaves.
+    Employees caught in a reporting cycle are laid out as extra roots.
+    """
+    node_count = snapshot.node_count
+    bosses = np.full(node_count, -1, dtype=np.int64)
+    reports: List[List[int]] = [[] for _ in range(node_count)]
+    for node, boss in snapshot.edge_pairs(snapshot.reports_to):
+        if bosses[node] < 0:
+            bosses[node] = boss
+            reports[boss].append(node)
+
+    depths = np.zeros(node_count, dtype=np.int64)
+    slots = np.full(node_count, -1.0)
+    visited = np.zeros(node_count, dtype=bool)
+    next_slot = 0
+    roots = [node for node in range(node_count) if bosses[node] < 0]
+    for root in roots + list(range(node_count)):
+        if visited[root]:
+            continue
+        # A root found in the second pass sits in a cycle, it is a tree of its own
+        bosses[root] = -1
+        depths[root] = 0
+        visited[root] = True
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            children = [report for report in reports[node] if not visited[report]]
+            if not children:
+                slots[node] = next_slot
+                next_slot += 1
+            for child in reversed(children):
+                visited[child] = True
+                bosses[child] = node
+                depths[child] = depths[node] + 1
+                stack.append(child)
+
+    # Leaf range of every subtree, folded up one level at a time
+    first = np.where(slots >= 0, slots, np.inf)
+    last = np.where(slots >= 0, slots, -np.inf)
+    for depth in range(int(depths.max(initial=0)), 0, -1):
+        nodes = np.flatnonzero(depths == depth)
+        np.minimum.at(first, bosses[nodes], first[nodes])
+        np.maximum.at(last, bosses[nodes], last[nodes])
+    return np.column_stack(((first + last) / 2 * SLOT_GAP, depths * LEVEL_GAP))
+
+
+def _add_pair_forces(forces: np.ndarray, sources: np.ndarray, targets: np.ndarray, pull: np.ndarray):
+    """Add pull to the sources and -pull to the targets"""
+    node_count = len(forces)
+    for axis in (0, 1):
+        forces[:, axis] += (np.bincount(sources, weights=pull[:, axis], minlength=node_count)
+                            - np.bincount(targets, weights=pull[:, axis], minlength=node_count))
+
+
+def force_layout(positions: np.ndarray, anchors: np.ndarray, edges: List[Tuple[int, int]],
+                 movable: Optional[np.ndarray] = None, iterations: int = 50) -> np.ndarray:
+    """Move the movable nodes under the FRIENDS_WITH springs, the anchors and the collisions"""
+    positions = positions.copy()
+    node_count = len(positions)
+    moving = np.arange(node_count) if movable is None else np.flatnonzero(movable)
+    if not len(moving):
+        return positions
+    sources, targets = np.array(edges, dtype=np.int64).reshape(-1, 2).T
+    if movable is not None:
+        # Springs between two fixed nodes do not move anything
+        keep = movable[sources] | movable[targets]
+        sources, targets = sources[keep], targets[keep]
+    step = SLOT_GAP
+    for _ in range(iterations):
+        forces = (anchors - positions) * ANCHOR
+
+        delta = positions[targets] - positions[sources]
+        distances = np.linalg.norm(delta, axis=1) + 1e-9
+        pull = delta * (SPRING * (distances - FRIEND_DISTANCE) / distances)[:, None]
+        _add_pair_forces(forces, sources, targets, pull)
+
+        # Collisions between the nodes next to each other on the same level
+        levels = np.round(positions[:, 1] / LEVEL_GAP)
+        order = np.lexsort((positions[:, 0], levels))
+        left, right = order[:-1], order[1:]
+        same_level = levels[left] == levels[right]
+        left, right = left[same_level], right[same_level]
+        delta = positions[right] - positions[left]
+        distances = np.linalg.norm(delta, axis=1) + 1e-9
+        push = delta * (COLLISION * np.maximum(SLOT_GAP - distances, 0) / distances)[:, None]
+        _add_pair_forces(forces, right, left, push)
+
+        # Cap every move at the current step, which cools down over the iterations
+        moves = forces[moving]
+        lengths = np.linalg.norm(moves, axis=1) + 1e-9
+        positions[moving] += moves * (np.minimum(lengths, step) / lengths)[:, None]
+        step *= 0.95
+    return positions
+
+
+class GraphLayout:
+    """Node coordinates of the NVL graph view, kept across graph generations.
+
+    The first layout places everyone: the REPORTS_TO tree, refined by the FRIENDS_WITH
+    forces. After a write only the employees whose boss or friends changed (or who are
+    new) are placed again, below their boss, and moved by the forces while everyone else
+    stays put, unless too many changed, then everything is laid out again. Employees are
+    keyed by element id: names are not unique.
+    """
+
+    def __init__(self):
+        # Above this share of changed employees the whole graph is laid out again
+        self.full_layout_share = float(os.getenv("LAYOUT_FULL_SHARE", "0.2"))
+        self.generation: Optional[int] = None
+        self.positions: Dict[str, Tuple[float, float]] = {}
+        self._signatures: Dict[str, tuple] = {}
+
+    @staticmethod
+    def _signature(snapshot: GraphSnapshot, node: int) -> tuple:
+        boss = snapshot.boss(node)
+        return (snapshot.element_ids[boss] if boss is not None else None,
+                tuple(snapshot.element_ids[friend] for friend in snapshot.friends(node)))
+
+    def update(self, snapshot: GraphSnapshot) -> Dict[str, Tuple[float, float]]:
+        """Coordinates by employee element id for the snapshot's generation"""
+        if self.generation == snapshot.generation:
+            return self.positions
+        start = time.perf_counter()
+        element_ids = snapshot.element_ids
+        signatures = {element_ids[node]: self._signature(snapshot, node) for node in range(snapshot.node_count)}
+        touched = np.array([self._signatures.get(element_id) != signatures[element_id] or element_id not in self.positions
+                            for element_id in element_ids], dtype=bool)
+        friendships = snapshot.edge_pairs(snapshot.friends_with)
+
+        if not self.positions or touched.sum() > self.full_layout_share * snapshot.node_count:
+            anchors = tree_layout(snapshot)
+            positions = force_layout(anchors, anchors, friendships)
+            kind = "full"
+        else:
+            anchors = self._incremental_anchors(snapshot, touched)
+            positions = force_layout(anchors, anchors, friendships, movable=touched)
+            kind = f"incremental ({int(touched.sum())} employees)"
+
+        self.positions = {element_id: (round(float(x), 1), round(float(y), 1))
+                          for element_id, (x, y) in zip(element_ids, positions)}
+        self._signatures = signatures
+        self.generation = snapshot.generation
+        print(f"Computed {kind} layout of generation {snapshot.generation} in {time.perf_counter() - start:.2f}s")
+        return self.positions
+
+    def _incremental_anchors(self, snapshot: GraphSnapshot, touched: np.ndarray) -> np.ndarray:
+        """Previous coordinates of the untouched nodes, a place under the boss for the touched ones"""
+        anchors = np.zeros((snapshot.node_count, 2))
+        placed = np.zeros(snapshot.node_count, dtype=bool)
+        for node in np.flatnonzero(~touched):
+            anchors[node] = self.positions[snapshot.element_ids[node]]
+            placed[node] = True
+        # Right of everything, for new roots
+        free_x = anchors[placed, 0].max(initial=0.0) + SLOT_GAP
+
+        for node in np.flatnonzero(touched):
+            # Place the touched bosses above node first
+            chain = [node]
+            boss = snapshot.boss(node)
+            while boss is not None and not placed[boss] and boss not in chain:
+                chain.append(boss)
+                boss = snapshot.boss(boss)
+            for member in reversed(chain):
+                if placed[member]:
+                    continue
+                boss = snapshot.boss(member)
+                if boss is not None and placed[boss]:
+                    # Next to the siblings, one level down
+                    siblings = len(snapshot.direct_reports(boss))
+                    offset = (snapshot.direct_reports(boss).index(member) - (siblings - 1) / 2) * SLOT_GAP
+                    anchors[member] = (anchors[boss, 0] + offset, anchors[boss, 1] + LEVEL_GAP)
+                else:
+                    anchors[member] = (free_x, 0.0)
+                    free_x += SLOT_GAP
+                placed[member] = True
+        return anchors
@@ -1,7 +1,11 @@
-from fastapi import FastAPI
+import os
+import time
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from database import neo4j_client
+from compression import CompressionMiddleware
+from metrics import request_db_time, request_metrics
 import uvicorn
 from routes import routes
 
@@ -10,8 +14,11 @@ async def lifespan(app: FastAPI):
     # Startup
     try:
         neo4j_client.connect()
-        # Ensure unique constraints
-        neo4j_client.ensure_unique_constraints()
+        await neo4j_client.connect_async()
+        await neo4j_client.warm_up_async()
+        # serve.py creates the schema once before starting its workers
+        if os.getenv("NEO4J_SCHEMA_READY", "false").lower() not in ("1", "true", "yes"):
+            neo4j_client.ensure_schema()
         print("Initialization successfull.")
     except Exception as e:
         print(f"Failed to initialize database: {e}")
@@ -20,6 +27,7 @@ async def lifespan(app: FastAPI):
     yield
     
     # Shutdown
+    await neo4j_client.close_async()
     neo4j_client.close()
 
 app = FastAPI(
@@ -38,6 +46,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress the JSON responses for clients sending Accept-Encoding: zstd or gzip
+app.add_middleware(CompressionMiddleware)
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    """Split the time of every request between Neo4j and the rest (shaping, validation, serialization)"""
+    db_time = [0.0]
+    token = request_db_time.set(db_time)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        request_db_time.reset(token)
+    total = time.perf_counter() - start
+    route = request.scope.get("route")
+    request_metrics.observe(route.path if route else "unmatched", total, db_time[0])
+    # Streamed bodies are still being produced here, their db time is only partly counted
+    response.headers["Server-Timing"] = (
+        f"db;dur={db_time[0] * 1000:.1f}, app;dur={(total - db_time[0]) * 1000:.1f}, total;dur={total * 1000:.1f}"
+    )
+    return response
+
 app.include_router(routes)
 
 if __name__ == "__main__":
@@ -0,0 +1,273 @@
+import inspect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Database time spent by the current request, set by the timing middleware
+request_db_time: ContextVar[Optional[list]] = ContextVar("request_db_time", default=None)
+
+
+def record_db_time(seconds: float):
+    """Add database time to the request being served, if any"""
+    accumulator = request_db_time.get()
+    if accumulator is not None:
+        accumulator[0] += seconds
+
+
+class PoolMetrics:
+    """Connection pool metrics of one Neo4j driver.
+
+    The driver does not publish pool statistics, so in-use and idle connections are
+    read from its pool and the acquisition wait time is measured by wrapping the
+    pool's `acquire`. Both rely on driver internals and degrade to zeros if they move.
+    """
+
+    def __init__(self):
+        self.acquisitions = 0
+        self.acquisition_failures = 0
+        self.acquisition_seconds_total = 0.0
+        self.acquisition_seconds_max = 0.0
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _record(self, elapsed: float, failed: bool):
+        with self._lock:
+            self.acquisitions += 1
+            self.acquisition_seconds_total += elapsed
+            self.acquisition_seconds_max = max(self.acquisition_seconds_max, elapsed)
+            if failed:
+                self.acquisition_failures += 1
+
+    def instrument(self, driver):
+        """Time every connection acquisition of the driver's pool"""
+        pool = getattr(driver, "_pool", None)
+        acquire = getattr(pool, "acquire", None)
+        if acquire is None:
+            return
+        self._pool = pool
+
+        if inspect.iscoroutinefunction(acquire):
+            async def timed_acquire(*args, **kwargs):
+                start = time.perf_counter()
+                failed = True
+                try:
+                    connection = await acquire(*args, **kwargs)
+                    failed = False
+                    return connection
+                finally:
+                    self._record(time.perf_counter() - start, failed)
+        else:
+            def timed_acquire(*args, **kwargs):
+                start = time.perf_counter()
+                failed = True
+                try:
+                    connection = acquire(*args, **kwargs)
+                    failed = False
+                    return connection
+                finally:
+                    self._record(time.perf_counter() - start, failed)
+
+        pool.acquire = timed_acquire
+
+    def connection_counts(self) -> Tuple[int, int]:
+        """(in use, idle) connections across all addresses of the pool"""
+        connections = getattr(self._pool, "connections", None)
+        if not connections:
+            return 0, 0
+        in_use = idle = 0
+        for address_connections in list(connections.values()):
+            for connection in list(address_connections):
+                if getattr(connection, "in_use", False):
+                    in_use += 1
+                else:
+                    idle += 1
+        return in_use, idle
+
+    def as_dict(self) -> dict:
+        in_use, idle = self.connection_counts()
+        max_size = getattr(getattr(self._pool, "pool_config", None), "max_connection_pool_size", None)
+        return {
+            "in_use": in_use,
+            "idle": idle,
+            "max_size": max_size,
+            "acquisitions": self.acquisitions,
+            "acquisition_failures": self.acquisition_failures,
+            "acquisition_seconds_total": self.acquisition_seconds_total,
+            "acquisition_seconds_max": self.acquisition_seconds_max,
+        }
+
+
+# (metric name, type, help, [(labels, value)]), histogram samples are (suffix, labels, value)
+Metric = Tuple[str, str, str, list]
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram, one series per label values"""
+
+    def __init__(self, label_names: Tuple[str, ...], buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values: tuple, value: float):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # bucket counts, then sum and count
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self) -> list:
+        samples = []
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                labels = dict(zip(self.label_names, label_values))
+                for bound, count in zip(self.buckets, series):
+                    samples.append(("_bucket", {**labels, "le": repr(bound)}, count))
+                samples.append(("_bucket", {**labels, "le": "+Inf"}, series[-1]))
+                samples.append(("_sum", labels, series[-2]))
+                samples.append(("_count", labels, series[-1]))
+        return samples
+
+
+class QueryMetrics:
+    """Timings, rows and server-side timings of every Cypher query, by query name"""
+
+    def __init__(self):
+        self.duration = Histogram(("query",))
+        self.totals: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, query_name: str, **values):
+        with self._lock:
+            totals = self.totals.setdefault(query_name, {
+                "rows": 0, "errors": 0, "slow": 0, "db_hits": 0,
+                "server_available_seconds": 0.0, "server_consumed_seconds": 0.0,
+            })
+            for key, value in values.items():
+                totals[key] += value
+
+    def observe(self, query_name: str, seconds: float, rows: int, available_after_ms: Optional[int],
+                consumed_after_ms: Optional[int], db_hits: Optional[int] = None, slow: bool = False):
+        self.duration.observe((query_name,), seconds)
+        self._add(
+            query_name,
+            rows=rows,
+            slow=int(slow),
+            db_hits=db_hits or 0,
+            server_available_seconds=(available_after_ms or 0) / 1000,
+            server_consumed_seconds=(consumed_after_ms or 0) / 1000,
+        )
+
+    def observe_error(self, query_name: str, seconds: float):
+        self.duration.observe((query_name,), seconds)
+        self._add(query_name, errors=1)
+
+    def metrics(self) -> List[Metric]:
+        with self._lock:
+            totals = {name: dict(values) for name, values in self.totals.items()}
+
+        def samples(key):
+            return [({"query": name}, values[key]) for name, values in sorted(totals.items())]
+
+        return [
+            ("neo4j_query_duration_seconds", "histogram", "Client-side duration of Cypher queries", self.duration.samples()),
+            ("neo4j_query_rows_total", "counter", "Records returned by Cypher queries", samples("rows")),
+            ("neo4j_query_errors_total", "counter", "Cypher queries that failed", samples("errors")),
+            ("neo4j_query_slow_total", "counter", "Cypher queries over the slow query threshold", samples("slow")),
+            ("neo4j_query_db_hits_total", "counter", "Database hits of profiled Cypher queries", samples("db_hits")),
+            ("neo4j_query_server_available_seconds_total", "counter",
+             "Server time until the first record was available", samples("server_available_seconds")),
+            ("neo4j_query_server_consumed_seconds_total", "counter",
+             "Server time until all records were consumed", samples("server_consumed_seconds")),
+        ]
+
+
+class RequestMetrics:
+    """Duration of HTTP requests by route, split between database time and the rest"""
+
+    def __init__(self):
+        self.duration = Histogram(("route", "part"))
+
+    def observe(self, route: str, total_seconds: float, db_seconds: float):
+        self.duration.observe((route, "total"), total_seconds)
+        self.duration.observe((route, "db"), db_seconds)
+        # Shaping records, validation and serialization
+        self.duration.observe((route, "app"), max(0.0, total_seconds - db_seconds))
+
+    def metrics(self) -> List[Metric]:
+        return [("http_request_duration_seconds", "histogram",
+                 "Duration of HTTP requests by route, part=db|app|total", self.duration.samples())]
+
+
+def total_db_hits(plan) -> int:
+    """Database hits of a PROFILE plan and its children"""
+    if not plan:
+        return 0
+    return plan.get("dbHits", 0) + sum(total_db_hits(child) for child in plan.get("children", []))
+
+
+def pool_metrics(pools: Dict[str, PoolMetrics]) -> List[Metric]:
+    """Prometheus metrics of the driver pools, labelled by driver name"""
+    stats = {driver: metrics.as_dict() for driver, metrics in pools.items()}
+
+    def samples(key):
+        return [({"driver": driver}, values[key]) for driver, values in stats.items() if values[key] is not None]
+
+    return [
+        ("neo4j_pool_connections_in_use", "gauge", "Connections currently borrowed from the pool", samples("in_use")),
+        ("neo4j_pool_connections_idle", "gauge", "Open connections waiting in the pool", samples("idle")),
+        ("neo4j_pool_max_size", "gauge", "Configured maximum pool size", samples("max_size")),
+        ("neo4j_pool_acquisitions_total", "counter", "Connection acquisitions", samples("acquisitions")),
+        ("neo4j_pool_acquisition_failures_total", "counter", "Connection acquisitions that failed or timed out", samples("acquisition_failures")),
+        ("neo4j_pool_acquisition_seconds_total", "counter", "Time spent waiting for a connection", samples("acquisition_seconds_total")),
+        ("neo4j_pool_acquisition_seconds_max", "gauge", "Longest wait for a connection", samples("acquisition_seconds_max")),
+    ]
+
+
+def cache_metrics(cache) -> List[Metric]:
+    """Prometheus metrics of a response cache"""
+    return [
+        ("response_cache_hits_total", "counter", "Reads served from the response cache", [({}, cache.hits)]),
+        ("response_cache_misses_total", "counter", "Reads missing from the cache of this process", [({}, cache.misses)]),
+        ("response_cache_shared_hits_total", "counter", "Misses served by the cache shared between the workers",
+         [({}, cache.shared_hits)]),
+        ("response_cache_entries", "gauge", "Responses currently cached", [({}, len(cache))]),
+        ("response_cache_bytes", "gauge", "Size of the cached response bodies", [({}, cache.size)]),
+    ]
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels.items()) + "}"
+
+
+def render_prometheus(metrics: Iterable[Metric]) -> str:
+    """Render metrics in the Prometheus text exposition format"""
+    lines = []
+    for name, metric_type, help_text, samples in metrics:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for sample in samples:
+            suffix, labels, value = sample if len(sample) == 3 else ("", *sample)
+            lines.append(f"{name}{suffix}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# Create global instances for use across the application
+query_metrics = QueryMetrics()
+request_metrics = RequestMetrics()
@@ -39,6 +39,47 @@ class EmployeeWithRelationships(BaseModel):
     friends: List[str] = []
 
 
+class HierarchyMember(BaseModel):
+    """Employee found by a hierarchy traversal, depth levels away from the root"""
+    employee: Employee
+    depth: int
+
+
+class HierarchyResponse(BaseModel):
+    """Subtree under, or chain of bosses above, the root employee"""
+    root: str
+    employees: List[HierarchyMember]
+    total: int
+    next_cursor: Optional[str] = None
+
+
+class EmployeeStats(BaseModel):
+    """Employee with its materialized relationship counts; None for employees in a reporting cycle"""
+    employee: Employee
+    direct_reports: Optional[int] = None
+    subtree_size: Optional[int] = None
+    friends: Optional[int] = None
+    depth: Optional[int] = None
+
+
+class EmployeeStatsResponse(BaseModel):
+    employees: List[EmployeeStats]
+    total: int
+
+
+class BulkItemError(BaseModel):
+    """Item of a bulk request that could not be written"""
+    index: int
+    error: str
+
+
+class BulkEmployeeResponse(BaseModel):
+    """Outcome of a bulk employee request"""
+    written: int
+    errors: List[BulkItemError]
+    total: int
+
+
 class EmployeeResponse(BaseModel):
     employees: List[Employee]
     total: int
@@ -55,6 +96,67 @@ class EmployeeNetworkResponse(BaseModel):
     total: int
 
 
+class SearchHit(BaseModel):
+    """Employee matching a full-text search, with its relevance"""
+    employee: Employee
+    score: float
+
+
+class SearchResponse(BaseModel):
+    query: str
+    employees: List[SearchHit]
+    total: int
+
+
+class AutocompleteResponse(BaseModel):
+    prefix: str
+    names: List[str]
+    total: int
+
+
+class Community(BaseModel):
+    """Employees grouped together by community detection"""
+    community: int
+    size: int
+    members: List[str]
+
+
+class CommunityResponse(BaseModel):
+    network: str  # "formal" (REPORTS_TO) or "informal" (FRIENDS_WITH)
+    backend: str  # "gds" or "python"
+    communities: List[Community]
+    total: int
+
+
+class CentralityScore(BaseModel):
+    name: str
+    score: float
+
+
+class CentralityResponse(BaseModel):
+    network: str
+    algorithm: str  # "pagerank" or "betweenness"
+    backend: str
+    employees: List[CentralityScore]
+    total: int
+
+
+class CommunityOverlap(BaseModel):
+    """Employees sharing both a formal and an informal community"""
+    formal_community: int
+    informal_community: int
+    size: int
+    members: List[str]
+
+
+class OverlapResponse(BaseModel):
+    """Formal vs informal communities, and the employees bridging them"""
+    backend: str
+    overlaps: List[CommunityOverlap]
+    bridging_employees: List[str]
+    total: int
+
+
 # NVL Graph Models
 class NVLNode(BaseModel):
     """Node model for NVL visualization"""
@@ -63,6 +165,9 @@ class NVLNode(BaseModel):
     department: Optional[str] = None
     position: Optional[str] = None
     email: Optional[str] = None
+    # Server-side layout, with /graph?layout=true
+    x: Optional[float] = None
+    y: Optional[float] = None
 
 
 class NVLRelationship(BaseModel):
@@ -0,0 +1,218 @@
+import time
+from bisect import bisect_right
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+from snapshot import GraphSnapshot
+
+# Department of the employees without one
+UNASSIGNED = "Unassigned"
+
+# Super-node of everyone outside the subtree of a manager view
+OUTSIDE_ID = "outside"
+
+# Views kept per generation
+MAX_VIEWS = 256
+
+
+class GraphRollups:
+    """Level-of-detail views of one graph snapshot, in the NVL format of /graph.
+
+    A view collapses groups of employees into super-nodes carrying a member count, and
+    the relationships between groups into one relationship per type carrying a weight:
+
+    - by department: one super-node per department, `expand` shows the members of one
+    - by manager: the manager and one super-node per direct report standing for their
+      whole subtree (everyone else is a single "outside" super-node), expanding a
+      super-node is the view of that report; without a manager, one per top-level boss
+
+    Subtrees are ranges of a depth-first numbering of the REPORTS_TO forest and the
+    department totals are computed once, so a view only reads the relationships of the
+    expanded part. Views are memoized, a new generation gets new GraphRollups.
+    """
+
+    def __init__(self, snapshot: GraphSnapshot):
+        start = time.perf_counter()
+        self.snapshot = snapshot
+        self.generation = snapshot.generation
+        self._views: Dict[tuple, dict] = {}
+        self._number_subtrees()
+        self._count_departments()
+        self.build_seconds = time.perf_counter() - start
+
+    def _number_subtrees(self):
+        """Depth-first numbering: the subtree of node is order[enter[node]:exit[node]]"""
+        snapshot = self.snapshot
+        node_count = snapshot.node_count
+        self.enter = [-1] * node_count
+        self.exit = [-1] * node_count
+        self.order: List[int] = []
+        bosses = [snapshot.boss(node) for node in range(node_count)]
+        self.roots = [node for node in range(node_count) if bosses[node] is None]
+        # Employees caught in a reporting cycle become top-level bosses too
+        for root in self.roots + list(range(node_count)):
+            if self.enter[root] >= 0:
+                continue
+            if bosses[root] is not None:
+                self.roots.append(root)
+            self.enter[root] = len(self.order)
+            self.order.append(root)
+            stack = [(root, iter(snapshot.direct_reports(root)))]
+            while stack:
+                node, reports = stack[-1]
+                report = next((report for report in reports if self.enter[report] < 0), None)
+                if report is None:
+                    self.exit[node] = len(self.order)
+                    stack.pop()
+                    continue
+                self.enter[report] = len(self.order)
+                self.order.append(report)
+                stack.append((report, iter(snapshot.direct_reports(report))))
+
+    def _count_departments(self):
+        snapshot = self.snapshot
+        self.department_members: Dict[str, List[int]] = {}
+        for node in range(snapshot.node_count):
+            self.department_members.setdefault(self._department(node), []).append(node)
+        group = [self._department_id(self._department(node)) for node in range(snapshot.node_count)]
+        self.department_weights = self._aggregate(range(snapshot.node_count), group.__getitem__, incoming=False)
+
+    def _department(self, node: int) -> str:
+        return self.snapshot.departments[node] or UNASSIGNED
+
+    @staticmethod
+    def _department_id(department: str) -> str:
+        return f"department:{department}"
+
+    def subtree_size(self, node: int) -> int:
+        return self.exit[node] - self.enter[node]
+
+    def _aggregate(self, nodes: Iterable[int], group_of, incoming: bool = True) -> Counter:
+        """Weights of the (group, type, group) relationships leaving nodes, and entering them with incoming.
+        Relationships inside a group are left out"""
+        snapshot = self.snapshot
+        weights = Counter()
+        for adjacency, forward in ((snapshot.outgoing, True), (snapshot.incoming, False)):
+            if not forward and not incoming:
+                continue
+            for node in nodes:
+                source = group_of(node)
+                for edge in adjacency.edges(node):
+                    target = group_of(adjacency.targets[edge])
+                    if target == source or (not forward and target != OUTSIDE_ID):
+                        # Incoming relationships only matter from outside the nodes
+                        continue
+                    key = (source, target) if forward else (target, source)
+                    weights[key + (snapshot.type_names[adjacency.types[edge]],)] += 1
+        return weights
+
+    def _employee_node(self, node: int) -> dict:
+        snapshot = self.snapshot
+        item = {
+            "id": snapshot.graph_node_id(node),
+            "name": snapshot.names[node],
+            "department": snapshot.departments[node],
+            "position": snapshot.positions[node],
+            "email": snapshot.emails[node],
+            "kind": "employee",
+            "count": 1,
+        }
+        return {k: v for k, v in item.items() if v is not None}
+
+    @staticmethod
+    def _relationships(weights: Counter) -> List[dict]:
+        return [
+            {"id": f"{source}|{rel_type}|{target}", "from": source, "to": target, "type": rel_type, "weight": weight}
+            for (source, target, rel_type), weight in sorted(weights.items())
+        ]
+
+    def _memo(self, key: tuple, build) -> dict:
+        view = self._views.get(key)
+        if view is None:
+            if len(self._views) >= MAX_VIEWS:
+                self._views.pop(next(iter(self._views)))
+            view = self._views[key] = build()
+        return view
+
+    def by_department(self, expand: Optional[str] = None) -> Optional[dict]:
+        """Departments as super-nodes, the members of the expanded one as employees.
+        None when expand is not a department"""
+        if expand is not None and expand not in self.department_members:
+            return None
+        return self._memo(("department", expand), lambda: self._department_view(expand))
+
+    def _department_view(self, expand: Optional[str]) -> dict:
+        nodes = [
+            {"id": self._department_id(department), "name": department, "kind": "department", "count": len(members)}
+            for department, members in sorted(self.department_members.items()) if department != expand
+        ]
+        if expand is None:
+            return {"nodes": nodes, "relationships": self._relationships(self.department_weights)}
+
+        expanded_id = self._department_id(expand)
+        members = self.department_members[expand]
+        # Relationships between the other departments are already counted
+        weights = Counter({key: weight for key, weight in self.department_weights.items()
+                           if expanded_id not in key[:2]})
+        member_ids = {node: self.snapshot.graph_node_id(node) for node in members}
+
+        def group_of(node):
+            return member_ids.get(node) or self._department_id(self._department(node))
+
+        for (source, target, rel_type), weight in self._aggregate(members, group_of, incoming=False).items():
+            weights[(source, target, rel_type)] += weight
+        # Relationships from the other departments into the members
+        snapshot = self.snapshot
+        for node in members:
+            for edge in snapshot.incoming.edges(node):
+                other = snapshot.incoming.targets[edge]
+                if other not in member_ids:
+                    weights[(group_of(other), member_ids[node], snapshot.type_names[snapshot.incoming.types[edge]])] += 1
+        nodes += [self._employee_node(node) for node in members]
+        return {"nodes": nodes, "relationships": self._relationships(weights)}
+
+    def by_manager(self, manager: Optional[str] = None) -> Optional[dict]:
+        """Subtrees of the direct reports of manager (of the top-level bosses without one) as super-nodes.
+        None when the manager does not exist"""
+        node = self.snapshot.ids.get(manager) if manager is not None else None
+        if manager is not None and node is None:
+            return None
+        return self._memo(("manager", manager), lambda: self._manager_view(node))
+
+    def _team_node(self, node: int) -> dict:
+        if self.subtree_size(node) == 1:
+            return self._employee_node(node)
+        return {
+            "id": f"team:{self.snapshot.graph_node_id(node)}",
+            "name": self.snapshot.names[node],
+            "kind": "team",
+            "count": self.subtree_size(node),
+        }
+
+    def _manager_view(self, manager: Optional[int]) -> dict:
+        snapshot = self.snapshot
+        if manager is None:
+            heads = sorted(self.roots, key=self.enter.__getitem__)
+            first, last = 0, len(self.order)
+        else:
+            heads = sorted(snapshot.direct_reports(manager), key=self.enter.__getitem__)
+            # Reports reached through a cycle belong to someone else's subtree
+            heads = [head for head in heads if self.enter[manager] < self.enter[head] < self.exit[manager]]
+            first, last = self.enter[manager], self.exit[manager]
+        team_nodes = [self._team_node(head) for head in heads]
+        head_enters = [self.enter[head] for head in heads]
+        manager_id = snapshot.graph_node_id(manager) if manager is not None else None
+
+        def group_of(node):
+            if node == manager:
+                return manager_id
+            position = self.enter[node]
+            if not first <= position < last:
+                return OUTSIDE_ID
+            return team_nodes[bisect_right(head_enters, position) - 1]["id"]
+
+        weights = self._aggregate(self.order[first:last], group_of)
+        nodes = ([self._employee_node(manager)] if manager is not None else []) + team_nodes
+        outside = snapshot.node_count - (last - first)
+        if outside and any(OUTSIDE_ID in key[:2] for key in weights):
+            nodes.append({"id": OUTSIDE_ID, "name": "Rest of the organisation", "kind": "outside", "count": outside})
+        return {"nodes": nodes, "relationships": self._relationships(weights)}
@@ -1,86 +1,527 @@
-from fastapi import APIRouter, HTTPException
-from models import Employee, Relationship, BossRelationship, FriendshipRelationship, EmployeeResponse, RelationshipResponse, EmployeeNetworkResponse, GraphData
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from typing import AsyncIterator, Awaitable, Callable, List, Literal, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from pydantic import ValidationError
+from fastapi.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from models import Employee, Relationship, BossRelationship, FriendshipRelationship, EmployeeResponse, RelationshipResponse, EmployeeNetworkResponse, SearchResponse, AutocompleteResponse, EmployeeStatsResponse, GraphData, HierarchyResponse, BulkEmployeeResponse, BulkItemError, CommunityResponse, CentralityResponse, OverlapResponse
 from database import neo4j_client
+from analytics import graph_analytics
+from export import FORMATS, export_available, export_graph
+from metrics import cache_metrics, pool_metrics, query_metrics, render_prometheus, request_metrics
+from cache import etag_matches, response_cache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 routes = APIRouter()
 
+
+def dump_json(content) -> bytes:
+    """Serialize like FastAPI's JSONResponse, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+async def cached_json(request: Request, key: str, produce: Callable[[], Awaitable[bytes]]) -> Response:
+    """
+    Serve a read from the response cache of the current graph generation.
+    Clients sending a matching If-None-Match get a 304 without any database work
+    """
+    entry = await response_cache.get_or_compute(key, neo4j_client.generation.value, produce)
+    # The generation to follow /changes from
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache", "X-Graph-Generation": str(entry.generation)}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
 @routes.get("/")
-def root():
+async def root():
     return {"message": "Welcome to Neo4j Interview API"}
 
 
 @routes.get("/health")
-def health():
+async def health():
     return {"status": "healthy"}
 
 
+@routes.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Neo4j pool, query, response cache and request metrics in the Prometheus text format
+    """
+    return PlainTextResponse(
+        render_prometheus(
+            pool_metrics(neo4j_client.pool_metrics)
+            + query_metrics.metrics()
+            + cache_metrics(response_cache)
+            + request_metrics.metrics()
+        ),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
 # Optionally seed sample data on startup
 @routes.post("/seed")
-def seed_data():
+async def seed_data(mode: Literal["full", "incremental"] = "full"):
     """
-    Seed the Neo4j database with sample data
+    Seed the Neo4j database with sample data.
+    mode=incremental only applies what changed in the CSV files since the last import
     """
     try:
-        neo4j_client.seed_sample_data()
+        # The bulk loader is blocking, keep it off the event loop
+        await run_in_threadpool(neo4j_client.seed_sample_data, mode)
         return {"message": "Sample data seeded successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to seed sample data: {str(e)}")
     
 @routes.get("/employees", response_model=EmployeeResponse)
-def list_employees():
+async def list_employees(request: Request):
     """
     Get all employees from the Neo4j database
     """
+    # Plain dicts in the EmployeeResponse schema, no per-record models or response validation
+    async def produce():
+        employees = await neo4j_client.get_employee_rows_async()
+        return dump_json({"employees": employees, "total": len(employees)})
+
     try:
-        employees = neo4j_client.get_employees()
-        return EmployeeResponse(employees=employees, total=len(employees))
+        return await cached_json(request, "employees", produce)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch employees: {str(e)}")
     
 @routes.get("/employees-with-relationship", response_model=EmployeeNetworkResponse)
-def get_employee_network():
+async def get_employee_network(request: Request,
+                               department: Optional[str] = None,
+                               name_prefix: Optional[str] = None,
+                               limit: Optional[int] = Query(None, ge=1),
+                               offset: int = Query(0, ge=0)):
     """
-    Get the complete employee network including all relationship data
+    Get the complete employee network including all relationship data.
+    Optionally filtered by department and name prefix, and paged with limit/offset
     """
+    async def produce():
+        employee_network = await neo4j_client.get_employee_network_rows_async(
+            department=department, name_prefix=name_prefix, limit=limit, offset=offset
+        )
+        return dump_json({"employees": employee_network, "total": len(employee_network)})
+
     try:
-        employee_network = neo4j_client.get_employees_with_relationships()
-        return EmployeeNetworkResponse(employees=employee_network, total=len(employee_network))
+        key = f"employees-with-relationship:{json.dumps([department, name_prefix, limit, offset])}"
+        return await cached_json(request, key, produce)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch employee network: {str(e)}")
 
 
+@routes.get("/employees/search", response_model=SearchResponse)
+async def search_employees(request: Request, q: str, limit: int = Query(20, ge=1, le=1000)):
+    """
+    Full-text search on the employees' name, email, department and position, best match first.
+    Every word of q must match, as a whole word or as the start of one
+    """
+    async def produce():
+        hits = await neo4j_client.search_employees_async(q, limit=limit)
+        return dump_json({"query": q, "employees": hits, "total": len(hits)})
+
+    try:
+        return await cached_json(request, f"search:{json.dumps([q, limit])}", produce)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to search employees: {str(e)}")
+
+
+@routes.get("/employees/stats", response_model=EmployeeStatsResponse)
+async def get_employee_stats(request: Request,
+                             sort: Literal["direct_reports", "subtree_size", "friends", "depth"] = "subtree_size",
+                             order: Literal["asc", "desc"] = "desc",
+                             department: Optional[str] = None,
+                             min_value: Optional[int] = Query(None, ge=0, alias="min"),
+                             max_value: Optional[int] = Query(None, ge=0, alias="max"),
+                             limit: int = Query(50, ge=1, le=1000),
+                             offset: int = Query(0, ge=0)):
+    """
+    Employees with their direct report, subtree and friend counts and depth, ordered by `sort`
+    and bounded by `min`/`max` of it: `sort=subtree_size` for the largest teams,
+    `sort=friends&order=asc` for the least connected employees
+    """
+    async def produce():
+        employees = await neo4j_client.get_employee_stats_async(
+            sort, order, department=department, min_value=min_value, max_value=max_value, limit=limit, offset=offset
+        )
+        return dump_json({"employees": employees, "total": len(employees)})
+
+    try:
+        key = f"employee-stats:{json.dumps([sort, order, department, min_value, max_value, limit, offset])}"
+        return await cached_json(request, key, produce)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch employee stats: {str(e)}")
+
+
+@routes.get("/employees/autocomplete", response_model=AutocompleteResponse)
+async def autocomplete_employees(prefix: str, limit: int = Query(10, ge=1, le=100)):
+    """
+    Employee names starting with prefix, or with a word starting with it (case-insensitive)
+    """
+    try:
+        names = await neo4j_client.autocomplete_async(prefix, limit=limit)
+        return Response(dump_json({"prefix": prefix, "names": names, "total": len(names)}), media_type="application/json")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to autocomplete employees: {str(e)}")
+
+
+@routes.get("/employees/{name}/subtree", response_model=HierarchyResponse)
+async def get_subtree(request: Request,
+                      name: str,
+                      max_depth: Optional[int] = Query(None, ge=1),
+                      exclude_friends: bool = False,
+                      after: Optional[str] = None,
+                      limit: Optional[int] = Query(None, ge=1)):
+    """
+    Get everyone reporting to an employee, directly or not, up to max_depth levels down.
+    exclude_friends leaves out the employee's friends; page by name and element id with limit and after=next_cursor
+    """
+    async def produce():
+        subtree = await neo4j_client.get_subtree_async(
+            name, max_depth=max_depth, exclude_friends=exclude_friends, after=after, limit=limit
+        )
+        if subtree is None:
+            raise HTTPException(status_code=404, detail=f"Employee not found: {name}")
+        return subtree.model_dump_json().encode()
+
+    try:
+        key = f"subtree:{json.dumps([name, max_depth, exclude_friends, after, limit])}"
+        return await cached_json(request, key, produce)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch subtree: {str(e)}")
+
+
+@routes.get("/employees/{name}/chain", response_model=HierarchyResponse)
+async def get_chain(request: Request, name: str, max_depth: Optional[int] = Query(None, ge=1)):
+    """
+    Get the chain of bosses above an employee, nearest first, up to max_depth levels up
+    """
+    async def produce():
+        chain = await neo4j_client.get_chain_async(name, max_depth=max_depth)
+        if chain is None:
+            raise HTTPException(status_code=404, detail=f"Employee not found: {name}")
+        return chain.model_dump_json().encode()
+
+    try:
+        return await cached_json(request, f"chain:{json.dumps([name, max_depth])}", produce)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch chain: {str(e)}")
+
+
 @routes.get("/relationships", response_model=RelationshipResponse)
-def list_relationships():
+async def list_relationships(request: Request):
     """
     Get all relationships (boss and friendship) from the Neo4j database
     """
+    async def produce():
+        relationships = await neo4j_client.get_relationship_rows_async()
+        return dump_json({"relationships": relationships, "total": len(relationships)})
+
     try:
-        relationships = neo4j_client.get_relationships()
-        return RelationshipResponse(relationships=relationships, total=len(relationships))
+        return await cached_json(request, "relationships", produce)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch relationships: {str(e)}")
     
 @routes.post("/employees", response_model=EmployeeResponse)
-def create_employee(employee: Employee):
+async def create_employee(employee: Employee):
     """
     Create a new employee in the Neo4j database
     """
     try:
-        neo4j_client.create_employee(employee)
+        await neo4j_client.create_employee_async(employee)
         return EmployeeResponse(employees=[employee], total=1)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create employee: {str(e)}")
     
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'item'}: {item['msg']}" for item in error.errors()
+    )
+
+
+async def ndjson_lines(request: Request) -> AsyncIterator[bytes]:
+    """Non-empty lines of an NDJSON request body, as they arrive"""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+async def bulk_items(request: Request) -> AsyncIterator[Tuple[int, object]]:
+    """(index, Employee or BulkItemError) of a JSON array or NDJSON request body"""
+    if request.headers.get("content-type", "").startswith(("application/x-ndjson", "application/jsonl")):
+        index = 0
+        async for line in ndjson_lines(request):
+            try:
+                yield index, Employee.model_validate_json(line)
+            except ValidationError as e:
+                yield index, BulkItemError(index=index, error=validation_message(e))
+            index += 1
+        return
+
+    try:
+        items = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    for index, item in enumerate(items):
+        try:
+            yield index, Employee.model_validate(item)
+        except ValidationError as e:
+            yield index, BulkItemError(index=index, error=validation_message(e))
+
+
+@routes.post("/employees/bulk", response_model=BulkEmployeeResponse)
+async def create_employees_bulk(request: Request, upsert: bool = False):
+    """
+    Create many employees from a JSON array or an NDJSON stream (Content-Type: application/x-ndjson),
+    written in UNWIND batches. With upsert, employees are merged on emp_id.
+    Invalid items are reported by index without failing the others
+    """
+    errors: List[BulkItemError] = []
+    batch: List[Tuple[int, Employee]] = []
+    total = 0
+
+    async def flush():
+        errors.extend(await neo4j_client.create_employees_async(batch, upsert=upsert))
+        batch.clear()
+
+    try:
+        async for index, item in bulk_items(request):
+            total += 1
+            if isinstance(item, BulkItemError):
+                errors.append(item)
+                continue
+            batch.append((index, item))
+            if len(batch) >= neo4j_client.batch_size:
+                await flush()
+        if batch:
+            await flush()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create employees: {str(e)}")
+
+    errors.sort(key=lambda error: error.index)
+    return BulkEmployeeResponse(written=total - len(errors), errors=errors, total=total)
+
+
 @routes.get("/graph")
-def get_graph_data():
+async def get_graph_data(request: Request, after: Optional[str] = None, limit: Optional[int] = Query(None, ge=1),
+                         layout: bool = False):
     """
-    Get graph data in NVL format for visualization
+    Get graph data in NVL format for visualization.
+    With `limit`, return one page of nodes (keyset on name, continue with `after=next_cursor`).
+    With `layout`, nodes carry x/y coordinates computed server-side
     """
+    async def produce():
+        return dump_json(await neo4j_client.get_graph_data_async(after=after, limit=limit, layout=layout))
+
     try:
-        graph_data = neo4j_client.get_graph_data()
-        return graph_data
+        return await cached_json(request, f"graph:{json.dumps([after, limit, layout])}", produce)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch graph data: {str(e)}")
 
 
+@routes.get("/graph/rollup")
+async def get_graph_rollup(request: Request, by: Literal["department", "manager"] = "department",
+                           expand: Optional[str] = None):
+    """
+    Aggregated graph in NVL format: departments, or the teams under a manager, as super-nodes
+    with a member `count`, and relationships between them with a `weight`.
+    `expand` is the department to show the members of, or the manager whose teams to show
+    """
+    async def produce():
+        view = await neo4j_client.get_graph_rollup_async(by, expand)
+        if view is None:
+            raise HTTPException(status_code=404, detail=f"Unknown {by}: {expand}")
+        return dump_json(view)
+
+    try:
+        return await cached_json(request, f"graph-rollup:{json.dumps([by, expand])}", produce)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to aggregate graph data: {str(e)}")
+
+
+@routes.get("/graph/stream")
+async def stream_graph_data(after: Optional[str] = None, limit: Optional[int] = Query(None, ge=1)):
+    """
+    Stream graph data as NDJSON, one {"type": "node" | "relationship" | "cursor", "data": ...} per line
+    """
+    items = neo4j_client.aiter_graph_data(after=after, limit=limit)
+    try:
+        # Pull the first item so connection errors still turn into a 500
+        first_item = await anext(items)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to stream graph data: {str(e)}")
+
+    async def body():
+        kind, item = first_item
+        yield json.dumps({"type": kind, "data": item}) + "\n"
+        async for kind, item in items:
+            yield json.dumps({"type": kind, "data": item}) + "\n"
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+@routes.get("/changes")
+async def stream_changes(request: Request, since: Optional[int] = Query(None, ge=0)):
+    """
+    Server-sent events of the graph changes after generation `since` (the X-Graph-Generation of a
+    /graph response, or the Last-Event-ID of a reconnecting EventSource), one event per generation:
+    `changes` with the node and relationship deltas in NVL format, or `reset` to fetch the graph again
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id is not None:
+        try:
+            since = int(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=422, detail=f"Invalid Last-Event-ID: {last_event_id}")
+    if since is None:
+        since = neo4j_client.generation.value
+
+    async def body():
+        yield f"retry: 3000\nid: {since}\n\n"
+        async for event in neo4j_client.changes.subscribe(since, lambda: neo4j_client.generation.value):
+            if event is None:
+                yield ": keepalive\n\n"
+            elif event["reset"]:
+                yield f"id: {event['generation']}\nevent: reset\ndata: {{}}\n\n"
+            else:
+                yield f"id: {event['generation']}\nevent: changes\ndata: {json.dumps(event['changes'])}\n\n"
+
+    return StreamingResponse(body(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@routes.get("/analytics/communities", response_model=CommunityResponse)
+async def get_communities(request: Request, network: Literal["formal", "informal"] = "formal"):
+    """
+    Louvain communities of the formal (REPORTS_TO) or informal (FRIENDS_WITH) network, largest first
+    """
+    async def produce():
+        communities = await graph_analytics.communities(network)
+        return dump_json({
+            "network": network,
+            "backend": await graph_analytics.backend(),
+            "communities": [
+                {"community": i, "size": len(members), "members": members} for i, members in enumerate(communities)
+            ],
+            "total": len(communities),
+        })
+
+    try:
+        return await cached_json(request, f"analytics:communities:{network}", produce)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to detect communities: {str(e)}")
+
+
+@routes.get("/analytics/centrality", response_model=CentralityResponse)
+async def get_centrality(request: Request,
+                         network: Literal["formal", "informal"] = "informal",
+                         algorithm: Literal["pagerank", "betweenness"] = "pagerank",
+                         limit: Optional[int] = Query(20, ge=1),
+                         sampling_size: Optional[int] = Query(None, ge=1)):
+    """
+    Most central employees of a network by PageRank or betweenness.
+    sampling_size estimates betweenness from that many source employees, for large graphs
+    """
+    async def produce():
+        scores = await graph_analytics.centrality(network, algorithm, sampling_size)
+        employees = [{"name": name, "score": score} for name, score in scores[:limit]]
+        return dump_json({
+            "network": network,
+            "algorithm": algorithm,
+            "backend": await graph_analytics.backend(),
+            "employees": employees,
+            "total": len(employees),
+        })
+
+    try:
+        key = f"analytics:centrality:{json.dumps([network, algorithm, limit, sampling_size])}"
+        return await cached_json(request, key, produce)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to compute centrality: {str(e)}")
+
+
+@routes.get("/analytics/overlap", response_model=OverlapResponse)
+async def get_community_overlap(request: Request):
+    """
+    Employees grouped by formal and informal community, and the employees bridging communities
+    """
+    async def produce():
+        overlaps, bridging = await graph_analytics.overlap()
+        return dump_json({
+            "backend": await graph_analytics.backend(),
+            "overlaps": [
+                {"formal_community": formal, "informal_community": informal, "size": len(members), "members": members}
+                for formal, informal, members in overlaps
+            ],
+            "bridging_employees": bridging,
+            "total": len(overlaps),
+        })
+
+    try:
+        return await cached_json(request, "analytics:overlap", produce)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to compare communities: {str(e)}")
+
+
+def export_archive(file_format: str, compression: Optional[str]) -> str:
+    """Export the graph into a temporary directory, return the path of a zip of its two files"""
+    directory = tempfile.mkdtemp(prefix="graph-export-")
+    try:
+        export_graph(neo4j_client, directory, file_format, compression)
+        archive = os.path.join(directory, "graph.zip")
+        # The files are compressed already, store them as they are so they can be memory-mapped once extracted
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as zip_file:
+            for name in sorted(os.listdir(directory)):
+                if name != "graph.zip":
+                    zip_file.write(os.path.join(directory, name), name)
+        return archive
+    except Exception:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+
+@routes.get("/export")
+async def export_graph_data(format: Literal["parquet", "arrow"] = "parquet", compression: Optional[str] = None):
+    """
+    Download the graph as a zip of nodes and edges files in Parquet or Arrow IPC, with integer
+    node ids and dictionary-encoded department, position and relationship type
+    """
+    if not export_available():
+        raise HTTPException(status_code=501, detail="The export needs pyarrow, which is not installed")
+    codecs = FORMATS[format][1]
+    if compression is not None and compression not in codecs:
+        raise HTTPException(status_code=422, detail=f"{format} supports {', '.join(codecs)} compression")
+    try:
+        archive = await run_in_threadpool(export_archive, format, compression)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to export graph: {str(e)}")
+    return FileResponse(archive, media_type="application/zip", filename=f"graph-{format}.zip",
+                        background=BackgroundTask(shutil.rmtree, os.path.dirname(archive), ignore_errors=True))
@@ -0,0 +1,144 @@
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Iterable, List, Optional, Tuple
+
+SEARCH_INDEX = "employee_search"
+
+CREATE_SEARCH_INDEX_QUERY = f"""
+    CREATE FULLTEXT INDEX {SEARCH_INDEX} IF NOT EXISTS
+    FOR (e:Employee) ON EACH [e.name, e.email, e.department, e.position]
+"""
+
+SEARCH_QUERY = f"""
+    CALL db.index.fulltext.queryNodes('{SEARCH_INDEX}', $query, {{limit: $limit}})
+    YIELD node, score
+    RETURN node.name as name,
+           node.emp_id as emp_id,
+           node.email as email,
+           node.department as department,
+           node.position as position,
+           score
+    ORDER BY score DESC, name
+"""
+
+# Characters with a meaning in the Lucene query syntax
+_LUCENE_SPECIAL = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+
+def fulltext_query(text: str) -> str:
+    """Lucene query matching every word of text, as a whole word (ranked higher) or a prefix"""
+    terms = [_LUCENE_SPECIAL.sub(r"\\\1", word.lower()) for word in text.split()]
+    return " AND ".join(f"({term}^2 OR {term}*)" for term in terms)
+
+
+class PrefixIndex:
+    """In-memory autocomplete on employee names.
+
+    A flattened trie: the sorted list of the case-folded names and of their later words
+    ("alex adams", "adams"), so the names starting with a prefix, or with a word starting
+    with it, are the contiguous range found by one binary search. Reads need no lock: the
+    lists are never changed in place, every change builds new ones and swaps them in with
+    one assignment.
+
+    The index holds the names of one graph generation. Writes add and remove their names,
+    which are kept pending, and then advance the index to the generation they bumped, which
+    applies the pending names. A rebuild that finishes in between is older than the write,
+    so the names are applied on top of it; a rebuild finishing after the write is dropped.
+    When another process wrote in between, the index is dropped and rebuilt by the next reader.
+    """
+
+    def __init__(self):
+        # Parallel lists: the sorted keys and the name each key belongs to
+        self._entries: Tuple[List[str], List[str]] = ([], [])
+        self._lock = threading.Lock()
+        # (added, name) changes of the writes not advanced yet
+        self._pending: List[Tuple[bool, str]] = []
+        # Generation of the names, None until built
+        self.generation: Optional[int] = None
+
+    def __len__(self):
+        return len(self._entries[0])
+
+    @staticmethod
+    def _keys(name: str) -> List[str]:
+        folded = name.casefold()
+        return [folded[match.start():] for match in re.finditer(r"\S+", folded)]
+
+    def rebuild(self, names: Iterable[str], generation: int):
+        """Index names, the employees of generation; dropped when a write already moved the index past it"""
+        keys, owners = [], []
+        for name in set(names):
+            if name:
+                for key in self._keys(name):
+                    keys.append(key)
+                    owners.append(name)
+        # Sorting positions avoids building a (key, name) tuple per entry
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        entries = ([keys[i] for i in order], [owners[i] for i in order])
+        with self._lock:
+            if self.generation is None or self.generation < generation:
+                self._entries = entries
+                self.generation = generation
+
+    def invalidate(self):
+        """Forget the names, the next reader rebuilds the index"""
+        with self._lock:
+            self.generation = None
+            self._pending = []
+
+    def advance(self, generation: int):
+        """Apply the pending names and move to the generation a write bumped, or invalidate
+        when a write of another process came first"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if self.generation is None or self.generation != generation - 1:
+                self.generation = None
+                return
+            if pending:
+                keys, names = (list(entries) for entries in self._entries)
+                for added, name in pending:
+                    (self._insert if added else self._delete)(keys, names, name)
+                self._entries = (keys, names)
+            self.generation = generation
+
+    def add(self, name: str):
+        if name:
+            with self._lock:
+                self._pending.append((True, name))
+
+    def remove(self, name: str):
+        if name:
+            with self._lock:
+                self._pending.append((False, name))
+
+    def _insert(self, keys: List[str], names: List[str], name: str):
+        for key in self._keys(name):
+            index = bisect_left(keys, key)
+            if name in names[index:bisect_right(keys, key, index)]:
+                continue
+            keys.insert(index, key)
+            names.insert(index, name)
+
+    def _delete(self, keys: List[str], names: List[str], name: str):
+        for key in self._keys(name):
+            index = bisect_left(keys, key)
+            while index < len(keys) and keys[index] == key:
+                if names[index] == name:
+                    del keys[index]
+                    del names[index]
+                    break
+                index += 1
+
+    def complete(self, prefix: str, limit: int = 10) -> List[str]:
+        """Names starting with prefix, or with a word starting with it, in key order"""
+        keys, names = self._entries
+        folded = prefix.casefold().strip()
+        if not folded:
+            return []
+        found = {}
+        for index in range(bisect_left(keys, folded), len(keys)):
+            if len(found) >= limit or not keys[index].startswith(folded):
+                break
+            found.setdefault(names[index], None)
+        return list(found)
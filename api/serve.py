@@ -0,0 +1,49 @@
+"""
+Production launcher: the API in several uvicorn worker processes.
+
+    python serve.py --workers 4
+
+The schema (constraints and indexes) is created once here, before the workers start,
+instead of by every worker. Each worker opens its own Neo4j driver pools; without an
+explicit NEO4J_MAX_POOL_SIZE they are sized so all workers together stay at about 100
+connections. With more than one worker the graph generation and the cached responses are
+shared through files by default (RESPONSE_CACHE_BACKEND=file, or redis with REDIS_URL),
+so a write made through one worker is seen by all and a heavy payload is built once.
+"""
+import argparse
+import os
+
+import uvicorn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "0")) or os.cpu_count(),
+                        help="worker processes (default WEB_CONCURRENCY, or one per core)")
+    args = parser.parse_args()
+
+    # The workers inherit the environment, set it up before anything reads it
+    if args.workers > 1:
+        os.environ.setdefault("RESPONSE_CACHE_BACKEND", "file")
+        os.environ.setdefault("NEO4J_MAX_POOL_SIZE", str(max(10, 100 // args.workers)))
+
+    from cache import response_cache
+    from database import neo4j_client
+
+    # Responses cached by a previous run may predate writes made while the API was down
+    response_cache.clear()
+    neo4j_client.connect()
+    try:
+        neo4j_client.ensure_schema()
+    finally:
+        neo4j_client.close()
+    os.environ["NEO4J_SCHEMA_READY"] = "true"
+
+    print(f"Starting {args.workers} workers, response cache backend {os.getenv('RESPONSE_CACHE_BACKEND', 'memory')}")
+    uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
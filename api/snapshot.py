@@ -0,0 +1,329 @@
+import sys
+import json
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from itertools import takewhile
+from typing import Iterable, Iterator, List, Optional, Tuple
+from models import Employee, EmployeeWithRelationships, HierarchyMember, HierarchyResponse, Relationship
+
+SNAPSHOT_NODES_QUERY = """
+    MATCH (e:Employee)
+    RETURN elementId(e) as element_id,
+           e.name as name,
+           e.emp_id as emp_id,
+           e.email as email,
+           e.department as department,
+           e.position as position
+"""
+
+SNAPSHOT_EDGES_QUERY = """
+    MATCH (a:Employee)-[r]->(b:Employee)
+    RETURN elementId(a) as from_id,
+           elementId(b) as to_id,
+           TYPE(r) as rel_type,
+           id(r) as rel_id
+"""
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def page_cursor(name: str, element_id: str) -> str:
+    """next_cursor of an employee page: the name and element id of its last employee"""
+    return json.dumps([name, element_id])
+
+
+def parse_page_cursor(after: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """(name, element id) of a page_cursor, (name, None) for a bare name cursor"""
+    if after is not None and after.startswith("["):
+        try:
+            name, element_id = json.loads(after)
+            return name, element_id
+        except ValueError:
+            pass
+    return after, None
+
+
+class _Adjacency:
+    """Compressed sparse rows: the edges of node i are targets[offsets[i]:offsets[i + 1]]"""
+
+    def __init__(self, node_count: int, edges: List[Tuple[int, int, int, int]]):
+        # edges are (node, other node, type code, relationship id), sorted by node then other node
+        edges.sort()
+        self.offsets = array("q", bytes(8 * (node_count + 1)))
+        for node, _, _, _ in edges:
+            self.offsets[node + 1] += 1
+        for i in range(node_count):
+            self.offsets[i + 1] += self.offsets[i]
+        self.targets = array("q", (edge[1] for edge in edges))
+        self.types = array("b", (edge[2] for edge in edges))
+        self.rel_ids = array("q", (edge[3] for edge in edges))
+
+    def edges(self, node: int) -> range:
+        return range(self.offsets[node], self.offsets[node + 1])
+
+
+class GraphSnapshot:
+    """Read-only, array-backed copy of the employee graph.
+
+    Employees get integer ids in name then element id order (the order of the pages of
+    the Cypher queries), their names, departments and positions are
+    interned, and the REPORTS_TO/FRIENDS_WITH edges are kept as outgoing and incoming
+    CSR adjacency. Built for one graph generation, answers the Neo4jClient reads with the
+    same output as the Cypher queries.
+    """
+
+    def __init__(self, generation: int, node_records: Iterable, edge_records: Iterable):
+        start = time.perf_counter()
+        self.generation = generation
+        self.names: List[str] = []
+        self.element_ids: List[str] = []
+        self.emp_ids: list = []
+        self.emails: list = []
+        self.departments: list = []
+        self.positions: list = []
+        nodes = {}
+        # Employees in page order, so the integer ids are also the sort order
+        for record in sorted(node_records, key=lambda record: (record["name"], record["element_id"])):
+            nodes[record["element_id"]] = len(self.names)
+            self.names.append(_intern(record["name"]))
+            self.element_ids.append(record["element_id"])
+            self.emp_ids.append(record["emp_id"])
+            self.emails.append(record["email"])
+            self.departments.append(_intern(record["department"]))
+            self.positions.append(_intern(record["position"]))
+        self.node_count = len(self.names)
+        # First id of every name, names are unique for employees loaded from the CSV files
+        self.ids = {}
+        for node, name in enumerate(self.names):
+            self.ids.setdefault(name, node)
+
+        self.type_names: List[str] = []
+        type_codes = {}
+        out_edges, in_edges = [], []
+        for record in edge_records:
+            source = nodes.get(record["from_id"])
+            target = nodes.get(record["to_id"])
+            if source is None or target is None:
+                continue
+            code = type_codes.get(record["rel_type"])
+            if code is None:
+                code = type_codes[record["rel_type"]] = len(self.type_names)
+                self.type_names.append(record["rel_type"])
+            out_edges.append((source, target, code, record["rel_id"]))
+            in_edges.append((target, source, code, record["rel_id"]))
+        self.edge_count = len(out_edges)
+        self.outgoing = _Adjacency(self.node_count, out_edges)
+        self.incoming = _Adjacency(self.node_count, in_edges)
+        self.reports_to = type_codes.get("REPORTS_TO", -1)
+        self.friends_with = type_codes.get("FRIENDS_WITH", -1)
+        self.build_seconds = time.perf_counter() - start
+
+    # Neighbours
+
+    def boss(self, node: int) -> Optional[int]:
+        for edge in self.outgoing.edges(node):
+            if self.outgoing.types[edge] == self.reports_to:
+                return self.outgoing.targets[edge]
+        return None
+
+    def direct_reports(self, node: int) -> List[int]:
+        return [self.incoming.targets[edge] for edge in self.incoming.edges(node)
+                if self.incoming.types[edge] == self.reports_to]
+
+    def friends(self, node: int) -> List[int]:
+        """Friends in either direction, each once"""
+        friends = {self.outgoing.targets[edge] for edge in self.outgoing.edges(node)
+                   if self.outgoing.types[edge] == self.friends_with}
+        friends.update(self.incoming.targets[edge] for edge in self.incoming.edges(node)
+                       if self.incoming.types[edge] == self.friends_with)
+        return sorted(friends)
+
+    def edge_pairs(self, type_code: int) -> List[Tuple[int, int]]:
+        """(from, to) node pairs of the relationships of one type"""
+        adjacency = self.outgoing
+        return [
+            (node, adjacency.targets[edge])
+            for node in range(self.node_count)
+            for edge in adjacency.edges(node)
+            if adjacency.types[edge] == type_code
+        ]
+
+    # Reads
+
+    def employee(self, node: int) -> Employee:
+        return Employee.model_construct(
+            name=self.names[node],
+            emp_id=self.emp_ids[node],
+            email=self.emails[node],
+            department=self.departments[node],
+            position=self.positions[node],
+        )
+
+    def employee_row(self, node: int) -> dict:
+        """Employee as the plain dict it serializes to"""
+        return {
+            "name": self.names[node],
+            "emp_id": self.emp_ids[node],
+            "email": self.emails[node],
+            "department": self.departments[node],
+            "position": self.positions[node],
+        }
+
+    def employees(self) -> List[Employee]:
+        return [self.employee(node) for node in range(self.node_count)]
+
+    def employee_rows(self) -> List[dict]:
+        return [self.employee_row(node) for node in range(self.node_count)]
+
+    def _network_nodes(self, department: Optional[str], name_prefix: Optional[str],
+                       limit: Optional[int], offset: int) -> List[int]:
+        nodes: Iterable[int] = range(self.node_count)
+        if name_prefix:
+            # Names are sorted, the ones with the prefix are a contiguous range
+            nodes = takewhile(lambda node: self.names[node].startswith(name_prefix),
+                              range(bisect_left(self.names, name_prefix), self.node_count))
+        if department is not None:
+            nodes = (node for node in nodes if self.departments[node] == department)
+        return list(nodes)[offset:offset + limit if limit else None]
+
+    def employees_with_relationships(self, department: Optional[str] = None,
+                                     name_prefix: Optional[str] = None,
+                                     limit: Optional[int] = None,
+                                     offset: int = 0) -> List[EmployeeWithRelationships]:
+        employees = []
+        for node in self._network_nodes(department, name_prefix, limit, offset):
+            boss = self.boss(node)
+            employees.append(EmployeeWithRelationships.model_construct(
+                employee=self.employee(node),
+                boss=self.names[boss] if boss is not None else None,
+                direct_reports=[self.names[other] for other in self.direct_reports(node)],
+                friends=[self.names[other] for other in self.friends(node)],
+            ))
+        return employees
+
+    def employee_network_rows(self, department: Optional[str] = None,
+                              name_prefix: Optional[str] = None,
+                              limit: Optional[int] = None,
+                              offset: int = 0) -> List[dict]:
+        """employees_with_relationships as plain dicts"""
+        rows = []
+        for node in self._network_nodes(department, name_prefix, limit, offset):
+            boss = self.boss(node)
+            rows.append({
+                "employee": self.employee_row(node),
+                "boss": self.names[boss] if boss is not None else None,
+                "direct_reports": [self.names[other] for other in self.direct_reports(node)],
+                "friends": [self.names[other] for other in self.friends(node)],
+            })
+        return rows
+
+    def relationships(self) -> List[Relationship]:
+        adjacency = self.outgoing
+        return [
+            Relationship.model_construct(
+                from_employee=self.names[node],
+                to_employee=self.names[adjacency.targets[edge]],
+                relationship_type=self.type_names[adjacency.types[edge]],
+            )
+            for node in range(self.node_count)
+            for edge in adjacency.edges(node)
+        ]
+
+    def relationship_rows(self) -> List[dict]:
+        """relationships as plain dicts"""
+        adjacency = self.outgoing
+        return [
+            {
+                "from_employee": self.names[node],
+                "to_employee": self.names[adjacency.targets[edge]],
+                "relationship_type": self.type_names[adjacency.types[edge]],
+            }
+            for node in range(self.node_count)
+            for edge in adjacency.edges(node)
+        ]
+
+    def graph_node_id(self, node: int) -> str:
+        emp_id = self.emp_ids[node]
+        return str(emp_id) if emp_id is not None else self.names[node].replace(" ", "_")
+
+    def page_start(self, after: Optional[str]) -> int:
+        """First node of the page after a page_cursor or a bare name (which skips all its namesakes)"""
+        if after is None:
+            return 0
+        name, element_id = parse_page_cursor(after)
+        if element_id is None:
+            return bisect_right(self.names, name)
+        return bisect_right(range(self.node_count), (name, element_id),
+                            key=lambda node: (self.names[node], self.element_ids[node]))
+
+    def iter_graph_data(self, after: Optional[str] = None, limit: Optional[int] = None) -> Iterator[Tuple[str, dict]]:
+        """Same pairs as Neo4jClient.iter_graph_data"""
+        first = self.page_start(after)
+        last = min(first + limit, self.node_count) if limit else self.node_count
+        for node in range(first, last):
+            item = {
+                "id": self.graph_node_id(node),
+                "element_id": self.element_ids[node],
+                "name": self.names[node],
+                "department": self.departments[node],
+                "position": self.positions[node],
+                "email": self.emails[node],
+            }
+            yield "node", {k: v for k, v in item.items() if v is not None}
+        adjacency = self.outgoing
+        for node in range(first, last):
+            for edge in adjacency.edges(node):
+                yield "relationship", {
+                    "id": str(adjacency.rel_ids[edge]),
+                    "from": self.graph_node_id(node),
+                    "to": self.graph_node_id(adjacency.targets[edge]),
+                    "type": self.type_names[adjacency.types[edge]],
+                }
+        next_cursor = page_cursor(self.names[last - 1], self.element_ids[last - 1]) if limit and last - first == limit else None
+        yield "cursor", {"next_cursor": next_cursor}
+
+    def subtree(self, name: str, max_depth: Optional[int] = None, exclude_friends: bool = False,
+                after: Optional[str] = None, limit: Optional[int] = None) -> Optional[HierarchyResponse]:
+        root = self.ids.get(name)
+        if root is None:
+            return None
+        excluded = set(self.friends(root)) if exclude_friends else set()
+        depths = {root: 0}
+        queue = deque([root])
+        while queue:
+            node = queue.popleft()
+            if max_depth is not None and depths[node] >= max_depth:
+                continue
+            for report in self.direct_reports(node):
+                if report not in depths:
+                    depths[report] = depths[node] + 1
+                    queue.append(report)
+        # Node ids are in page order
+        first = self.page_start(after)
+        members = sorted(node for node in depths if node != root and node not in excluded and node >= first)
+        if limit:
+            members = members[:limit]
+        return HierarchyResponse(
+            root=name,
+            employees=[HierarchyMember(employee=self.employee(node), depth=depths[node]) for node in members],
+            total=len(members),
+            next_cursor=page_cursor(self.names[members[-1]], self.element_ids[members[-1]])
+            if limit and len(members) == limit else None,
+        )
+
+    def chain(self, name: str, max_depth: Optional[int] = None) -> Optional[HierarchyResponse]:
+        node = self.ids.get(name)
+        if node is None:
+            return None
+        members = []
+        seen = {node}
+        boss = self.boss(node)
+        while boss is not None and boss not in seen and (max_depth is None or len(members) < max_depth):
+            members.append(HierarchyMember(employee=self.employee(boss), depth=len(members) + 1))
+            seen.add(boss)
+            boss = self.boss(boss)
+        return HierarchyResponse(root=name, employees=members, total=len(members))
@@ -1,10 +1,28 @@
 """
 Test file for the Neo4j Interview API
 """
+import asyncio
 import pytest
+from contextlib import nullcontext
+from types import SimpleNamespace
+from fastapi import FastAPI, Response
 from fastapi.testclient import TestClient
+from neo4j.exceptions import ConstraintError, ServiceUnavailable
 from main import app
-from routes import routes
+from compression import CompressionMiddleware
+from routes import dump_json, routes
+from models import BulkItemError, Employee, EmployeeNetworkResponse, RelationshipResponse
+from database import BOSS_COLUMNS, CHAIN_QUERY, CREATE_EMPLOYEE_QUERY, CREATE_EMPLOYEES_QUERY, FRIENDS_COLUMNS, UPSERT_EMPLOYEES_QUERY, Neo4jClient, neo4j_client
+import changes
+from changes import ChangeFeed, node_added
+from cache import FileGenerationCounter, FileResponseStore, ResponseCache, etag_matches
+from snapshot import GraphSnapshot
+from analytics import GraphAnalytics, betweenness, louvain, pagerank
+from layout import GraphLayout
+from rollup import GraphRollups
+from search import PrefixIndex, fulltext_query
+from ingest import ParallelIngest, round_robin
+from export import EXPORT_NODES_QUERY, export_available, export_graph
 
 client = TestClient(app)
 
@@ -34,3 +52,587 @@ def test_employees_endpoint():
     assert "total" in data
     assert isinstance(data["employees"], list)
     assert isinstance(data["total"], int)
+
+
+def test_read_csv_batches(tmp_path):
+    """Test that CSV rows are streamed in bounded batches"""
+    csv_file = tmp_path / "friends.csv"
+    csv_file.write_text("employee name,is friends with\nA,B\nC,C\nD, E\n", encoding="utf-8")
+    batches = list(Neo4jClient._read_csv_batches(
+        str(csv_file), ("employee name", "is friends with"), 1, skip_self_references=True
+    ))
+    assert batches == [[{"employee": "A", "other": "B"}], [{"employee": "D", "other": "E"}]]
+
+
+def test_incremental_csv_sync(tmp_path):
+    """Test that a sync adds, removes and re-parents only what the files changed, and keeps API employees"""
+    (tmp_path / "boss.csv").write_text("employee name,has boss\nAnnie,Vader\nBradley,Annie\nNewbie,Bradley\n", encoding="utf-8")
+    (tmp_path / "friends.csv").write_text("employee name,is friends with\nAnnie,Bradley\n", encoding="utf-8")
+    employees = [("Vader", "/4:v/", False), ("Annie", "/4:v/4:a/", False), ("Bradley", "/4:v/4:b/", False),
+                 ("Old", "/4:v/4:o/", False), ("Kelly", "/4:k/", True)]
+    relationships = [("Annie", "Vader", "REPORTS_TO"), ("Bradley", "Vader", "REPORTS_TO"), ("Old", "Vader", "REPORTS_TO"),
+                     ("Annie", "Bradley", "FRIENDS_WITH")]
+    reads = {
+        "sync_employees": [{"id": path.split("/")[-2], "name": name, "emp_id": None, "path": path, "from_api": from_api}
+                           for name, path, from_api in employees],
+        "sync_relationships": [{"employee": a, "other": b, "rel_type": rel_type} for a, b, rel_type in relationships],
+    }
+    writes, moves = {}, []
+
+    def write_batches(query_name, query, batches):
+        writes[query_name] = [row for rows in batches for row in rows]
+        return len(writes[query_name])
+
+    sync_client = Neo4jClient()
+    sync_client._read = lambda query_name, query, **params: reads[query_name]
+    sync_client._write_batches = write_batches
+    sync_client._move_subtree = lambda name, new: moves.append((name, new)) or True
+    changes, stale = [], set()
+    counts = sync_client._sync_csv_data(str(tmp_path / "boss.csv"), str(tmp_path / "friends.csv"), 10, changes, stale)
+
+    assert writes["sync_remove_employees"] == [{"name": "Old"}]
+    assert writes["sync_add_employees"] == [{"name": "Newbie"}]
+    assert writes["sync_remove_reports_to"] == [{"employee": "Bradley", "other": "Vader"}]
+    assert writes["sync_add_reports_to"] == [{"employee": "Bradley", "other": "Annie"}, {"employee": "Newbie", "other": "Bradley"}]
+    assert writes["sync_remove_friends_with"] == writes["sync_add_friends_with"] == []
+    # The new boss of a new employee is placed first
+    assert moves == [("Bradley", False), ("Newbie", True)] and counts["moved subtrees"] == 2
+    assert stale == {"Vader", "Annie", "Bradley", "Newbie", "Old"}
+    assert {change["op"] for change in changes} == {"remove_node", "add_node", "remove_relationship", "add_relationship"}
+
+    # A cycle blocks every move: the whole hierarchy is rebuilt instead
+    rebuilds = []
+    sync_client._move_subtree = lambda name, new: False
+    sync_client.update_hierarchy = rebuilds.append
+    sync_client._move_subtrees({"Annie", "Bradley"}, set(), {"Annie": "Bradley", "Bradley": "Annie"}, 10)
+    assert rebuilds == [10]
+
+
+def test_parallel_ingest(tmp_path):
+    """Test that the parallel load writes relationships once their employees exist, in cells of disjoint groups"""
+    for groups in (2, 8):
+        rounds = round_robin(groups)
+        assert len({cell for cells in rounds for cell in cells}) == groups * (groups + 1) // 2
+        for cells in rounds:
+            # No group in two cells of a round
+            assert len({group for cell in cells for group in cell}) == sum(len(set(cell)) for cell in cells)
+
+    boss_file, friends_file = tmp_path / "boss.csv", tmp_path / "friends.csv"
+    boss_file.write_text("employee name,has boss\nAnnie,Vader\nBradley,Vader\n", encoding="utf-8")
+    friends_file.write_text("employee name,is friends with\nAnnie,Bradley\nKelly,Kelly\nKelly,Annie\n", encoding="utf-8")
+    writes = []
+    session = SimpleNamespace(execute_write=lambda write: write(None))
+    fake_client = SimpleNamespace(
+        database="neo4j", driver=SimpleNamespace(session=lambda **kwargs: nullcontext(session)),
+        _run=lambda tx, query_name, query, params: writes.append((query_name, params["rows"])),
+        _read_csv_batches=Neo4jClient._read_csv_batches,
+    )
+    counts = ParallelIngest(fake_client, workers=2, batch_size=2).run([
+        ("REPORTS_TO", str(boss_file), BOSS_COLUMNS, False),
+        ("FRIENDS_WITH", str(friends_file), FRIENDS_COLUMNS, True),
+    ])
+    assert counts == {"employees": 4, "REPORTS_TO": 2, "FRIENDS_WITH": 2}
+    kinds = [query_name for query_name, _ in writes]
+    assert kinds.count("ingest_employees") == 2
+    # Every relationship is written after the employees at both of its ends
+    created = set()
+    for query_name, rows in writes:
+        if query_name == "ingest_employees":
+            created.update(row["name"] for row in rows)
+        else:
+            assert all(row["employee"] in created and row["other"] in created for row in rows)
+    assert sorted(row["name"] for name, rows in writes if name == "ingest_employees" for row in rows) == \
+        ["Annie", "Bradley", "Kelly", "Vader"]
+
+
+def test_bulk_employees_endpoint(monkeypatch):
+    """Test that JSON arrays and NDJSON bodies report invalid and rejected items by index"""
+    written = []
+
+    async def create_employees_async(batch, upsert=False):
+        written.extend(employee.name for _, employee in batch)
+        return [BulkItemError(index=index, error="duplicate") for index, employee in batch if employee.name == "Dup"]
+
+    monkeypatch.setattr(neo4j_client, "create_employees_async", create_employees_async)
+    response = client.post("/employees/bulk", json=[{"name": "Annie"}, {"email": "no-name@x"}, {"name": "Dup"}])
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["written"], body["total"]) == (1, 3)
+    assert [error["index"] for error in body["errors"]] == [1, 2]
+    assert body["errors"][0]["error"].startswith("name:")
+
+    ndjson = b'{"name": "Bradley"}\n\n{"name": 1}\n{"name": "Kelly"}'
+    response = client.post("/employees/bulk", content=ndjson, headers={"Content-Type": "application/x-ndjson"})
+    assert response.json()["written"] == 2 and [error["index"] for error in response.json()["errors"]] == [1]
+    assert written == ["Annie", "Dup", "Bradley", "Kelly"]
+    assert client.post("/employees/bulk", json={"name": "Annie"}).status_code == 400
+
+
+def test_bulk_write_fallback():
+    """Test that only database rejections fall back to one item at a time, outages fail the request"""
+    attempts = []
+
+    class Session:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            return False
+
+        async def execute_write(self, write, rows):
+            attempts.append([row["name"] for row in rows])
+            if outage:
+                raise ServiceUnavailable("down")
+            if any(row["name"] == "Dup" for row in rows):
+                raise ConstraintError("already exists")
+
+    bulk_client = Neo4jClient()
+    bulk_client.async_driver = SimpleNamespace(session=lambda **kwargs: Session())
+    items = [(i, Employee(name=name)) for i, name in enumerate(["Annie", "Dup", "Kelly"])]
+    outage = False
+    errors = asyncio.run(bulk_client.create_employees_async(items, batch_size=3))
+    assert [(error.index, error.error) for error in errors] == [(1, "already exists")]
+    assert attempts == [["Annie", "Dup", "Kelly"], ["Annie"], ["Dup"], ["Kelly"]]
+
+    outage, attempts[:] = True, []
+    with pytest.raises(ServiceUnavailable):
+        asyncio.run(bulk_client.create_employees_async(items, batch_size=3))
+    assert len(attempts) == 1
+
+
+def test_metrics_endpoint():
+    """Test that pool metrics are exposed in the Prometheus text format"""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE neo4j_pool_connections_in_use gauge" in response.text
+    assert 'neo4j_pool_acquisitions_total{driver="async"}' in response.text
+
+
+def test_response_compression():
+    """Test that JSON and text responses are gzipped for clients accepting it"""
+    response = client.get("/metrics", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "neo4j_pool_connections_in_use" in response.text
+    assert "content-encoding" not in client.get("/health", headers={"Accept-Encoding": "gzip"}).headers
+
+    # The compressed body gets a weak ETag, the identity one keeps it strong
+    tagged = FastAPI()
+    tagged.add_middleware(CompressionMiddleware)
+    tagged.get("/tagged")(lambda: Response(b"[" + b"1," * 1000 + b"1]", media_type="application/json", headers={"ETag": '"abc"'}))
+    tagged_client = TestClient(tagged)
+    assert tagged_client.get("/tagged", headers={"Accept-Encoding": "gzip"}).headers["etag"] == 'W/"abc"'
+    assert tagged_client.get("/tagged", headers={"Accept-Encoding": "identity"}).headers["etag"] == '"abc"'
+
+    # Server-sent events are never compressed
+    tagged.get("/events")(lambda: Response(b"data: {}\n\n" * 200, media_type="text/event-stream"))
+    assert "content-encoding" not in tagged_client.get("/events", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_request_timing():
+    """Test that requests report their db/app time split and feed the request histogram"""
+    response = client.get("/health")
+    assert response.headers["server-timing"].startswith("db;dur=0.0, app;dur=")
+    metrics = client.get("/metrics").text
+    assert 'http_request_duration_seconds_count{route="/health",part="db"}' in metrics
+
+
+def test_response_cache_generations():
+    """Test that cached responses are rebuilt once the graph generation moves on"""
+    cache = ResponseCache(max_entries=2, max_bytes=1024, ttl=60)
+    calls = []
+
+    async def produce():
+        calls.append(1)
+        return b'{"total":0}'
+
+    async def read(generation):
+        return await cache.get_or_compute("employees", generation, produce)
+
+    first = asyncio.run(read(0))
+    assert asyncio.run(read(0)) == first
+    assert len(calls) == 1
+    asyncio.run(read(1))
+    assert len(calls) == 2
+    assert etag_matches(f"W/{first.etag}", first.etag)
+    assert not etag_matches('"other"', first.etag)
+
+
+def test_shared_response_cache(tmp_path):
+    """Test that workers share the generation and the responses built by one of them"""
+    counters = [FileGenerationCounter(str(tmp_path / "generation")) for _ in range(2)]
+    assert counters[0].epoch == counters[1].epoch
+    caches = [ResponseCache(ttl=60, shared=FileResponseStore(str(tmp_path / "responses"), 1024, 60)) for _ in range(2)]
+    calls = []
+
+    async def produce():
+        calls.append(1)
+        return b'{"total":0}'
+
+    async def read(worker):
+        return await caches[worker].get_or_compute("employees", counters[worker].value, produce)
+
+    first = asyncio.run(read(0))
+    assert asyncio.run(read(1))[:2] == (first.body, first.etag)
+    assert len(calls) == 1 and caches[1].shared_hits == 1
+    assert counters[0].bump() == 1 and counters[1].value == 1
+    asyncio.run(read(1))
+    assert len(calls) == 2
+
+
+def test_change_feed(monkeypatch):
+    """Test that subscribers get the changes in generation order, and a reset for a missing generation"""
+    monkeypatch.setattr(changes, "GAP_TIMEOUT", 0.05)
+    feed = ChangeFeed(size=10, max_changes=2)
+    current = [0]
+
+    def publish(changes=None):
+        current[0] += 1
+        feed.publish(current[0], changes)
+
+    async def follow():
+        events = []
+        async for event in feed.subscribe(1, lambda: current[0]):
+            events.append(event)
+            if len(events) == 1:
+                publish([node_added({"id": "3", "name": "Leia"})] * 3)  # too many deltas, a reset
+                current[0] += 1  # written by another process, never published here
+            if len(events) == 3:
+                return events
+
+    publish([node_added({"id": "1", "name": "Luke"})])
+    publish([node_added({"id": "2", "name": "Han"})])
+    events = asyncio.run(follow())
+    assert [(event["generation"], event["reset"]) for event in events] == [(2, False), (3, True), (4, True)]
+    assert events[0]["changes"] == [{"op": "add_node", "node": {"id": "2", "name": "Han"}}]
+    assert not feed._waiters
+
+    async def reconnect(generation):
+        async for event in ChangeFeed().subscribe(generation, lambda: 2):
+            return event
+
+    # A Last-Event-ID from before a restart reset the counter gets a reset right away
+    assert asyncio.run(asyncio.wait_for(reconnect(40), 1)) == {"generation": 2, "reset": True, "changes": []}
+
+
+def test_employees_with_relationships_query_filters():
+    """Test that the network query only adds the filters and paging it is given"""
+    query = Neo4jClient._employees_with_relationships_query(name_prefix="Da", limit=10)
+    assert "e.name STARTS WITH $name_prefix" in query
+    assert "LIMIT $limit" in query
+    assert "department" not in query.split("RETURN")[0]
+    assert "OPTIONAL MATCH" not in Neo4jClient._employees_with_relationships_query()
+
+
+def test_graph_page_queries():
+    """Test that a /graph page filters, then orders and limits after a WITH, on the name and element id"""
+    nodes_query, rels_query = Neo4jClient._graph_queries('["Annie", "4:x:7"]', 2)
+    page = ("MATCH (e:Employee)\n            WHERE e.name > $after_name OR (e.name = $after_name AND elementId(e) > $after_id) "
+            "WITH e ORDER BY e.name, elementId(e) LIMIT $limit\n")
+    assert nodes_query.lstrip().startswith(page) and rels_query.lstrip().startswith(page)
+    assert Neo4jClient._graph_queries(None, None)[0].split()[:7] == \
+        ["MATCH", "(e:Employee)", "WITH", "e", "ORDER", "BY", "e.name,"]
+    cursor = Neo4jClient._graph_cursor("Annie", "4:x:7")
+    assert Neo4jClient._graph_page_params(cursor, 2) == {"after_name": "Annie", "after_id": "4:x:7", "limit": 2}
+    assert Neo4jClient._graph_page_params("[Annie]", None)["after_name"] == "[Annie]"
+
+
+def test_hierarchy_paths_use_element_ids():
+    """Test that paths are built from element ids, so namesakes and renames keep their own subtree"""
+    for query in (CREATE_EMPLOYEE_QUERY, CREATE_EMPLOYEES_QUERY, UPSERT_EMPLOYEES_QUERY):
+        assert "path = '/' + elementId(e) + '/'" in query
+        assert "name + '/'" not in query
+    assert "elementId(boss) = ancestors[i]" in CHAIN_QUERY
+
+    # Subtree pages use the (name, element id) keyset of /graph, namesakes at a boundary are kept
+    query = Neo4jClient._subtree_query(None, False, '["Bob", "4:2"]', 1)
+    assert "AND (e.name > $after_name OR (e.name = $after_name AND elementId(e) > $after_id))" in query
+    assert "ORDER BY e.name, elementId(e) LIMIT $limit" in query
+    member = {"name": "Bob", "emp_id": None, "email": None, "department": None, "position": None,
+              "element_id": "4:3", "depth": 1}
+    page = Neo4jClient._hierarchy_from_records([{"root": "Ann", "members": [member]}], limit=1)
+    assert page.next_cursor == '["Bob", "4:3"]'
+
+
+def test_employee_stats():
+    """Test that the stats query orders on one property, and a partial update also refreshes the bosses above"""
+    query = Neo4jClient._employee_stats_query("friends", "asc", min_value=1, limit=5)
+    assert "WHERE e.friend_count IS NOT NULL AND e.friend_count >= $min_value" in query
+    assert "ORDER BY e.friend_count ASC, e.name" in query and "LIMIT $limit" in query
+    assert "department" not in query.split("RETURN")[0]
+    # Null fields stay, as in every other employee response
+    record = {"name": "Kelly", "emp_id": None, "email": None, "department": None, "position": None,
+              "direct_reports": 0, "subtree_size": 0, "friends": 1, "depth": 2}
+    assert Neo4jClient._employee_stats_row(record)["employee"] == \
+        {"name": "Kelly", "emp_id": None, "email": None, "department": None, "position": None}
+
+    written = []
+
+    def write_batches(query_name, query, batches):
+        for rows in batches:
+            written.extend(rows)
+        return len(written)
+
+    fake_client = SimpleNamespace(
+        batch_size=2, ensure_stats_indexes=lambda: None, _path_keys=Neo4jClient._path_keys,
+        _read=lambda query_name, query, names: [{"id": "4:a", "path": "/4:v/4:a/"}, {"id": "4:c", "path": None}],
+        _write_batches=write_batches,
+    )
+    assert Neo4jClient.update_employee_stats(fake_client, names=["Annie", "Cycle"]) == 3
+    assert written == [{"id": "4:a"}, {"id": "4:c"}, {"id": "4:v"}]
+
+
+def test_graph_snapshot_reads():
+    """Test that the in-memory snapshot answers reads like the Cypher queries"""
+    nodes = [
+        {"element_id": name, "name": name, "emp_id": None, "email": None, "department": None, "position": None}
+        for name in ("Vader", "Annie", "Bradley", "Meagan")
+    ]
+    edges = [
+        {"from_id": "Bradley", "to_id": "Vader", "rel_type": "REPORTS_TO", "rel_id": 1},
+        {"from_id": "Meagan", "to_id": "Vader", "rel_type": "REPORTS_TO", "rel_id": 2},
+        {"from_id": "Annie", "to_id": "Bradley", "rel_type": "REPORTS_TO", "rel_id": 3},
+        {"from_id": "Vader", "to_id": "Annie", "rel_type": "FRIENDS_WITH", "rel_id": 4},
+    ]
+    snapshot = GraphSnapshot(0, nodes, edges)
+
+    assert [employee.name for employee in snapshot.employees()] == ["Annie", "Bradley", "Meagan", "Vader"]
+    vader = snapshot.employees_with_relationships(name_prefix="V")[0]
+    assert vader.boss is None
+    assert vader.direct_reports == ["Bradley", "Meagan"]
+    assert vader.friends == ["Annie"]
+    assert [(rel.from_employee, rel.to_employee) for rel in snapshot.relationships()][0] == ("Annie", "Bradley")
+
+    subtree = snapshot.subtree("Vader", exclude_friends=True)
+    assert [(member.employee.name, member.depth) for member in subtree.employees] == [("Bradley", 1), ("Meagan", 1)]
+    chain = snapshot.chain("Annie")
+    assert [member.employee.name for member in chain.employees] == ["Bradley", "Vader"]
+    assert snapshot.subtree("Nobody") is None
+
+    page = list(snapshot.iter_graph_data(limit=2))
+    assert [item["name"] for kind, item in page if kind == "node"] == ["Annie", "Bradley"]
+    assert page[-1] == ("cursor", {"next_cursor": '["Bradley", "Bradley"]'})
+
+    # Pages follow (name, element id) like the Cypher queries: no namesake is skipped at a page boundary
+    namesakes = GraphSnapshot(0, [
+        {"element_id": element_id, "name": name, "emp_id": None, "email": None, "department": None, "position": None}
+        for element_id, name in [("4:1", "Ann"), ("4:3", "Bob"), ("4:2", "Bob"), ("4:4", "Cat")]
+    ], [
+        {"from_id": element_id, "to_id": "4:1", "rel_type": "REPORTS_TO", "rel_id": i}
+        for i, element_id in enumerate(["4:2", "4:3", "4:4"])
+    ])
+    pages, after = [], None
+    while True:
+        page = list(namesakes.iter_graph_data(after=after, limit=2))
+        pages.append([item["name"] for kind, item in page if kind == "node"])
+        after = page[-1][1]["next_cursor"]
+        if after is None:
+            break
+    assert pages == [["Ann", "Bob"], ["Bob", "Cat"], []]
+    assert list(namesakes.iter_graph_data(limit=2))[-1] == ("cursor", {"next_cursor": '["Bob", "4:2"]'})
+    first = namesakes.subtree("Ann", limit=1)
+    assert first.next_cursor == '["Bob", "4:2"]'
+    second = namesakes.subtree("Ann", after=first.next_cursor, limit=1)
+    assert [member.employee.name for member in second.employees] == ["Bob"] and second.next_cursor == '["Bob", "4:3"]'
+    # A bare name cursor skips every namesake, as in Cypher
+    assert [item["name"] for kind, item in namesakes.iter_graph_data(after="Bob") if kind == "node"] == ["Cat"]
+
+    # The plain dict rows of the fast path serialize exactly like the response models
+    network = snapshot.employees_with_relationships()
+    assert dump_json({"employees": snapshot.employee_network_rows(), "total": len(network)}) == \
+        EmployeeNetworkResponse(employees=network, total=len(network)).model_dump_json().encode()
+    relationships = snapshot.relationships()
+    assert dump_json({"relationships": snapshot.relationship_rows(), "total": len(relationships)}) == \
+        RelationshipResponse(relationships=relationships, total=len(relationships)).model_dump_json().encode()
+
+
+def test_analytics_fallback():
+    """Test the Python community detection and centrality used without the GDS plugin"""
+    # Two cliques joined by one edge
+    edges = [(a, b) for group in (range(5), range(5, 10)) for a in group for b in group if a < b] + [(4, 5)]
+    assert louvain(10, edges) == [0] * 5 + [1] * 5
+    assert betweenness(3, [(0, 1), (1, 2)], directed=False) == [0.0, 1.0, 0.0]
+    assert pagerank(3, [(0, 1), (2, 1)]).round(3).tolist() == [0.15, 0.405, 0.15]
+
+
+def test_gds_projection():
+    """Test that projections are named by epoch and generation, shared by workers, and never re-run under PROFILE"""
+    calls = []
+    graphs = {"formal-network", "formal-network-3", "formal-network-a1-1", "formal-network-a1-3", "informal-network-a1-1"}
+
+    async def call(query_name, query, **params):
+        calls.append((query_name, params.get("graph")))
+        if query_name == "gds_exists":
+            return [{"exists": params["graph"] in graphs}]
+        if query_name == "gds_list":
+            return [{"graphName": graph} for graph in sorted(graphs)]
+        if query_name == "gds_drop":
+            graphs.discard(params["graph"])
+        if query_name == "gds_project":
+            graphs.add(params["graph"])
+        return [{"nodeCount": 3, "relationshipCount": 2}]
+
+    async def profiled_read(query_name, query, **params):
+        raise AssertionError(f"{query_name} must not be profiled")
+
+    fake_client = SimpleNamespace(generation=SimpleNamespace(value=4, epoch="a1"), _call_async=call,
+                                  _read_async=profiled_read)
+    analytics = GraphAnalytics(fake_client)
+    assert asyncio.run(analytics._projection("formal")) == "formal-network-a1-4"
+    assert ("gds_project", "formal-network-a1-4") in calls
+    # The previous generation may still be streamed on by another worker
+    assert graphs == {"formal-network-a1-3", "formal-network-a1-4", "informal-network-a1-1"}
+
+    calls.clear()
+    asyncio.run(analytics._projection("formal"))
+    assert calls == []
+    # Already projected by another worker
+    asyncio.run(GraphAnalytics(fake_client)._projection("formal"))
+    assert "gds_project" not in [name for name, _ in calls]
+
+    # After a restart the in-memory counter is back at 0 with a new epoch: the projections
+    # of the earlier process were built from another graph and are never reused
+    graphs.update({"formal-network-a1-0", "formal-network-a1-1"})
+    calls.clear()
+    restarted = SimpleNamespace(generation=SimpleNamespace(value=0, epoch="b2"), _call_async=call,
+                                _read_async=profiled_read)
+    assert asyncio.run(GraphAnalytics(restarted)._projection("formal")) == "formal-network-b2-0"
+    assert ("gds_project", "formal-network-b2-0") in calls
+    assert graphs == {"formal-network-b2-0", "informal-network-a1-1"}
+
+
+def test_graph_layout_incremental():
+    """Test that a new employee is laid out below their boss without moving anyone else, apart from namesakes"""
+    nodes = [
+        {"element_id": name, "name": name, "emp_id": None, "email": None, "department": None, "position": None}
+        for name in ("Vader", "Annie", "Bradley")
+    ]
+    edges = [
+        {"from_id": "Annie", "to_id": "Vader", "rel_type": "REPORTS_TO", "rel_id": 1},
+        {"from_id": "Bradley", "to_id": "Vader", "rel_type": "REPORTS_TO", "rel_id": 2},
+        {"from_id": "Annie", "to_id": "Bradley", "rel_type": "FRIENDS_WITH", "rel_id": 3},
+    ]
+    layout = GraphLayout()
+    layout.full_layout_share = 0.5
+    first = dict(layout.update(GraphSnapshot(0, nodes, edges)))
+    assert first["Vader"][1] < min(first["Annie"][1], first["Bradley"][1])
+
+    nodes.append({"element_id": "Meagan", "name": "Meagan", "emp_id": None, "email": None,
+                  "department": None, "position": None})
+    edges.append({"from_id": "Meagan", "to_id": "Vader", "rel_type": "REPORTS_TO", "rel_id": 4})
+    second = layout.update(GraphSnapshot(1, nodes, edges))
+    assert {name: second[name] for name in first} == first
+    assert second["Meagan"][1] > first["Vader"][1]
+
+    # Namesakes are laid out apart, positions are keyed by element id
+    nodes.append({"element_id": "4:meagan-2", "name": "Meagan", "emp_id": None, "email": None,
+                  "department": None, "position": None})
+    edges.append({"from_id": "4:meagan-2", "to_id": "Vader", "rel_type": "REPORTS_TO", "rel_id": 5})
+    third = layout.update(GraphSnapshot(2, nodes, edges))
+    assert third["4:meagan-2"] != third["Meagan"]
+    graph_data = {"nodes": [], "relationships": []}
+    for kind, item in GraphSnapshot(2, nodes, edges).iter_graph_data():
+        Neo4jClient._add_graph_item(graph_data, kind, item, None, third)
+    assert {(node["element_id"], node["x"], node["y"]) for node in graph_data["nodes"] if node["name"] == "Meagan"} == \
+        {("Meagan", *third["Meagan"]), ("4:meagan-2", *third["4:meagan-2"])}
+
+
+def test_graph_rollups():
+    """Test that departments and teams collapse into super-nodes with weighted relationships"""
+    people = [("Vader", "Exec"), ("Bradley", "Eng"), ("Annie", "Eng"), ("Meagan", "Sales"), ("Kelly", None)]
+    nodes = [
+        {"element_id": name, "name": name, "emp_id": None, "email": None, "department": department, "position": None}
+        for name, department in people
+    ]
+    edges = [
+        {"from_id": employee, "to_id": other, "rel_type": rel_type, "rel_id": i}
+        for i, (employee, other, rel_type) in enumerate([
+            ("Bradley", "Vader", "REPORTS_TO"), ("Annie", "Bradley", "REPORTS_TO"),
+            ("Meagan", "Vader", "REPORTS_TO"), ("Kelly", "Meagan", "REPORTS_TO"),
+            ("Annie", "Kelly", "FRIENDS_WITH"), ("Bradley", "Kelly", "FRIENDS_WITH"),
+        ])
+    ]
+    rollups = GraphRollups(GraphSnapshot(0, nodes, edges))
+
+    departments = rollups.by_department()
+    assert {node["name"]: node["count"] for node in departments["nodes"]} == \
+        {"Eng": 2, "Exec": 1, "Sales": 1, "Unassigned": 1}
+    weights = {(rel["from"], rel["to"], rel["type"]): rel["weight"] for rel in departments["relationships"]}
+    assert weights[("department:Eng", "department:Unassigned", "FRIENDS_WITH")] == 2
+
+    teams = rollups.by_manager("Vader")
+    assert [(node["id"], node["count"]) for node in teams["nodes"]] == \
+        [("Vader", 1), ("team:Bradley", 2), ("team:Meagan", 2)]
+    weights = {(rel["from"], rel["to"], rel["type"]): rel["weight"] for rel in teams["relationships"]}
+    assert weights[("team:Bradley", "team:Meagan", "FRIENDS_WITH")] == 2
+    assert rollups.by_manager("Nobody") is None
+
+
+def test_search_hits_keep_null_fields():
+    """Test that search hits serialize their employee like every other employee response"""
+    async def read(query_name, cypher, **params):
+        return [{"name": "Kelly", "emp_id": None, "email": None, "department": "Eng", "position": None, "score": 1.5}]
+
+    fake_client = SimpleNamespace(_read_async=read, _employee_from_record=Neo4jClient._employee_from_record)
+    hits = asyncio.run(Neo4jClient.search_employees_async(fake_client, "kel"))
+    assert hits == [{"employee": {"name": "Kelly", "emp_id": None, "email": None, "department": "Eng", "position": None},
+                     "score": 1.5}]
+
+
+def test_name_autocomplete():
+    """Test that the name index completes name and word prefixes and follows the writes"""
+    index = PrefixIndex()
+    index.add("Ignored")
+    index.advance(0)  # not built yet
+    index.rebuild(["Darth Vader", "Alex Adams", "Adam Ant", "annie"], 0)
+    assert index.complete("ad") == ["Adam Ant", "Alex Adams"]
+    assert index.complete("A", limit=2) == ["Adam Ant", "Alex Adams"]
+    assert index.complete("vad") == ["Darth Vader"]
+    assert index.complete(" ") == []
+
+    index.add("Ada Lovelace")
+    index.remove("Adam Ant")
+    index.advance(1)
+    assert index.generation == 1
+    assert index.complete("ada") == ["Ada Lovelace", "Alex Adams"]
+    index.advance(3)  # generation 2 was written by another process
+    assert index.generation is None
+    assert index.complete("ignored") == []
+
+    # A rebuild read before a write finishes between its add and its advance, or after both
+    index.add("Kelly")
+    index.rebuild(["Annie"], 3)
+    index.advance(4)
+    index.rebuild(["Annie"], 3)
+    assert (index.generation, index.complete("k")) == (4, ["Kelly"])
+    assert fulltext_query("eng o'brien") == "(eng^2 OR eng*) AND (o'brien^2 OR o'brien*)"
+    assert fulltext_query("c++") == r"(c\+\+^2 OR c\+\+*)"
+
+
+@pytest.mark.skipif(not export_available(), reason="pyarrow is not installed")
+def test_graph_export(tmp_path):
+    """Test that the export writes integer ids and dictionary-encoded columns, batch by batch"""
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    nodes = [{"element_id": f"e{i}", "name": name, "emp_id": i, "email": None, "department": department, "position": None}
+             for i, (name, department) in enumerate([("Annie", "Eng"), ("Bradley", "Eng"), ("Vader", "Exec")])]
+    edges = [{"from_id": "e0", "to_id": "e1", "rel_type": "REPORTS_TO"},
+             {"from_id": "e1", "to_id": "e2", "rel_type": "REPORTS_TO"},
+             {"from_id": "e0", "to_id": "e2", "rel_type": "FRIENDS_WITH"},
+             {"from_id": "e0", "to_id": "new", "rel_type": "FRIENDS_WITH"}]
+    fake_client = SimpleNamespace(
+        database="neo4j", batch_size=2, driver=SimpleNamespace(session=lambda **kwargs: nullcontext()),
+        _stream=lambda session, query_name, query, params=None: iter(nodes if query == EXPORT_NODES_QUERY else edges),
+    )
+    assert export_graph(fake_client, str(tmp_path), "arrow") == {"nodes": 3, "edges": 3}
+
+    with pa.memory_map(str(tmp_path / "nodes.arrow")) as source:
+        node_table = pa.ipc.open_file(source).read_all()
+    assert node_table.column("id").to_pylist() == [0, 1, 2]
+    assert node_table.column("department").to_pylist() == ["Eng", "Eng", "Exec"]
+    assert pa.types.is_dictionary(node_table.schema.field("department").type)
+    with pa.memory_map(str(tmp_path / "edges.arrow")) as source:
+        edge_table = pa.ipc.open_file(source).read_all()
+    assert list(zip(*(edge_table.column(name).to_pylist() for name in ("source", "target", "type")))) == \
+        [(0, 1, "REPORTS_TO"), (1, 2, "REPORTS_TO"), (0, 2, "FRIENDS_WITH")]
@@ -0,0 +1,43 @@
+"""
+Compare two benchmark results written by run.py.
+
+    python benchmarks/compare.py benchmarks/results/before.json benchmarks/results/after.json
+"""
+import argparse
+import json
+
+
+def change(before, after) -> str:
+    if not before or after is None:
+        return ""
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--metric", default="p50_ms", help="result field to compare (default p50_ms)")
+    args = parser.parse_args()
+
+    with open(args.before, encoding="utf-8") as file:
+        before = json.load(file)
+    with open(args.after, encoding="utf-8") as file:
+        after = json.load(file)
+
+    for side, run in (("before", before), ("after", after)):
+        meta = run["meta"]
+        print(f"{side:6} {meta['backend']} {meta['dataset']} ({meta['employees']} employees) "
+              f"commit {meta.get('commit')} at {meta['time']}")
+    print()
+    print(f"{'step':45} {'before':>12} {'after':>12} {'change':>9}   {'rss before':>10} {'rss after':>10}")
+    for name in list(dict.fromkeys([*before["results"], *after["results"]])):
+        old = before["results"].get(name, {})
+        new = after["results"].get(name, {})
+        print(f"{name:45} {old.get(args.metric, '-'):>12} {new.get(args.metric, '-'):>12} "
+              f"{change(old.get(args.metric), new.get(args.metric)):>9}   "
+              f"{old.get('peak_rss_mb', '-'):>10} {new.get('peak_rss_mb', '-'):>10}")
+
+
+if __name__ == "__main__":
+    main()
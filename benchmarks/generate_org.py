@@ -0,0 +1,121 @@
+"""
+Generate a synthetic organisation in the format of the dataset/ CSV files.
+
+The reporting tree is built breadth first from a single root: every manager gets a span
+of control drawn around --fan-out, so the tree is about log(size, fan-out) levels deep.
+Friendships are mostly local (people close in the tree, i.e. with close ids) with a share
+of random ones across the company, for an average of --friend-degree friends each.
+
+    python benchmarks/generate_org.py 100k --output benchmarks/data/100k
+"""
+import argparse
+import csv
+import os
+import random
+import time
+from collections import deque
+
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+FIRST_NAMES = [
+    "Alex", "Annie", "Bradley", "Chloe", "Darth", "Douglas", "Emma", "Filmore", "Grace", "Hugo",
+    "Isla", "Jacob", "Kelly", "Liam", "Louis", "Meagan", "Millie", "Missy", "Nelson", "Olivia",
+    "Priya", "Quentin", "Rosa", "Sami", "Tara", "Umar", "Vera", "Wayne", "Xavier", "Yuki", "Zoe",
+]
+LAST_NAMES = [
+    "Adams", "Brown", "Chen", "Diaz", "Evans", "Fischer", "Garcia", "Haddad", "Ivanova", "Jones",
+    "Kim", "Lopez", "Martin", "Nguyen", "Okafor", "Petit", "Quinn", "Rossi", "Smith", "Tanaka",
+    "Usman", "Vargas", "Weber", "Xu", "Young", "Zimmer",
+]
+
+
+def employee_name(i: int) -> str:
+    """Unique, readable name of employee i"""
+    first = FIRST_NAMES[i % len(FIRST_NAMES)]
+    last = LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    suffix = i // (len(FIRST_NAMES) * len(LAST_NAMES))
+    return f"{first} {last}" if suffix == 0 else f"{first} {last} {suffix}"
+
+
+def generate_bosses(size: int, fan_out: float, rng: random.Random) -> list:
+    """boss[i] is the boss id of employee i, -1 for the root"""
+    bosses = [-1] * size
+    managers = deque([0])
+    next_id = 1
+    while next_id < size:
+        manager = managers.popleft() if managers else rng.randrange(next_id)
+        span = max(1, round(rng.gauss(fan_out, fan_out / 2)))
+        for _ in range(min(span, size - next_id)):
+            bosses[next_id] = manager
+            managers.append(next_id)
+            next_id += 1
+    return bosses
+
+
+def generate_friendships(size: int, friend_degree: float, locality: float, rng: random.Random) -> set:
+    """(employee, friend) id pairs, each friendship listed once"""
+    pairs = set()
+    # Each friendship counts for both ends
+    target = int(size * friend_degree / 2)
+    window = max(2, int(friend_degree * 4))
+    while len(pairs) < target and size > 1:
+        employee = rng.randrange(size)
+        if rng.random() < locality:
+            friend = min(size - 1, max(0, employee + rng.randint(-window, window)))
+        else:
+            friend = rng.randrange(size)
+        if friend != employee and (friend, employee) not in pairs:
+            pairs.add((employee, friend))
+    return pairs
+
+
+def write_dataset(output: str, size: int, fan_out: float, friend_degree: float, locality: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    bosses = generate_bosses(size, fan_out, rng)
+    friendships = generate_friendships(size, friend_degree, locality, rng)
+
+    os.makedirs(output, exist_ok=True)
+    with open(os.path.join(output, "employees-and-their-boss.csv"), "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["employee name", "has boss"])
+        writer.writerows((employee_name(i), employee_name(boss)) for i, boss in enumerate(bosses) if boss >= 0)
+    with open(os.path.join(output, "employees-and-their-friends.csv"), "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["employee name", "is friends with"])
+        writer.writerows((employee_name(a), employee_name(b)) for a, b in sorted(friendships))
+
+    stats = {
+        "size": size,
+        "reports_to": size - 1,
+        "friendships": len(friendships),
+        "fan_out": fan_out,
+        "friend_degree": friend_degree,
+        "seed": seed,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+    print(f"Generated {size} employees, {size - 1} REPORTS_TO and {len(friendships)} FRIENDS_WITH "
+          f"in {stats['seconds']}s into {output}")
+    return stats
+
+
+def parse_size(value: str) -> int:
+    return SIZES.get(value.lower()) or int(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("size", help="number of employees, or one of " + ", ".join(SIZES))
+    parser.add_argument("--output", help="directory of the CSV files, defaults to benchmarks/data/<size>")
+    parser.add_argument("--fan-out", type=float, default=6, help="average direct reports of a manager")
+    parser.add_argument("--friend-degree", type=float, default=6, help="average friends per employee")
+    parser.add_argument("--locality", type=float, default=0.7, help="share of friendships within the same area")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(os.path.dirname(__file__), "data", args.size)
+    write_dataset(output, parse_size(args.size), args.fan_out, args.friend_degree, args.locality, args.seed)
+
+
+if __name__ == "__main__":
+    main()
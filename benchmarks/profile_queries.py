@@ -0,0 +1,128 @@
+"""
+PROFILE the employee network queries and record their plans and db hits.
+
+Runs each query under PROFILE against the database configured by the NEO4J_* environment
+variables and writes the total db hits, rows, timings and plan operators to a JSON file,
+so a regression in the query plan shows up as a diff between two runs.
+
+    python benchmarks/profile_queries.py --output benchmarks/results/profile.json
+    python benchmarks/profile_queries.py --baseline benchmarks/results/profile.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+
+from database import Neo4jClient  # noqa: E402
+
+# The chained OPTIONAL MATCH query this API used before, kept as a reference point
+LEGACY_EMPLOYEES_WITH_RELATIONSHIPS_QUERY = """
+    MATCH (e:Employee)
+    OPTIONAL MATCH (e)-[:REPORTS_TO]->(boss:Employee)
+    OPTIONAL MATCH (subordinate:Employee)-[:REPORTS_TO]->(e)
+    OPTIONAL MATCH (e)-[:FRIENDS_WITH]-(friend:Employee)
+    RETURN e.name as name,
+           e.emp_id as emp_id,
+           e.email as email,
+           e.department as department,
+           e.position as position,
+           e.hire_date as hire_date,
+           boss.name as boss_name,
+           COLLECT(DISTINCT subordinate.name) as direct_reports,
+           COLLECT(DISTINCT friend.name) as friends
+    ORDER BY e.name
+"""
+
+
+def queries():
+    """(name, query, parameters) of every profiled query"""
+    network = Neo4jClient._employees_with_relationships_query
+    return [
+        ("employees_with_relationships_legacy", LEGACY_EMPLOYEES_WITH_RELATIONSHIPS_QUERY, {}),
+        ("employees_with_relationships", network(), {}),
+        ("employees_with_relationships_page", network(limit=100, offset=100), {"limit": 100, "offset": 100}),
+        ("employees_with_relationships_prefix", network(name_prefix="A", limit=100),
+         {"name_prefix": "A", "limit": 100}),
+    ]
+
+
+def plan_stats(plan: dict) -> dict:
+    """Total db hits and the operator tree of a PROFILE plan"""
+    children = [plan_stats(child) for child in plan.get("children", [])]
+    return {
+        "operator": plan.get("operatorType"),
+        "db_hits": plan.get("dbHits", 0) + sum(child["db_hits"] for child in children),
+        "rows": plan.get("rows", 0),
+        "children": children,
+    }
+
+
+def profile(client: Neo4jClient, query: str, parameters: dict) -> dict:
+    with client.driver.session(database=client.database) as session:
+        start = time.perf_counter()
+        result = session.run("PROFILE " + query, **parameters)
+        rows = len(list(result))
+        summary = result.consume()
+        elapsed = time.perf_counter() - start
+    plan = plan_stats(summary.profile)
+    return {
+        "rows": rows,
+        "db_hits": plan["db_hits"],
+        "wall_ms": round(elapsed * 1000, 3),
+        "result_available_after_ms": summary.result_available_after,
+        "result_consumed_after_ms": summary.result_consumed_after,
+        "plan": plan,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Queries whose db hits grew by more than tolerance over the baseline"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before and result["db_hits"] > before["db_hits"] * (1 + tolerance):
+            regressions.append(f"{name}: {before['db_hits']} -> {result['db_hits']} db hits")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="JSON file to write, defaults to benchmarks/results/profile-<time>.json")
+    parser.add_argument("--baseline", help="previous JSON output to compare db hits against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed db hits growth (default 10%%)")
+    args = parser.parse_args()
+
+    client = Neo4jClient()
+    client.connect()
+    try:
+        results = {name: profile(client, query, parameters) for name, query, parameters in queries()}
+    finally:
+        client.close()
+
+    for name, result in results.items():
+        print(f"{name:40} {result['rows']:>8} rows {result['db_hits']:>12} db hits {result['wall_ms']:>10.1f} ms")
+
+    output = args.output or os.path.join(
+        os.path.dirname(__file__), "results",
+        f"profile-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump({"uri": client.uri, "results": results}, file, indent=2)
+    print(f"Wrote {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
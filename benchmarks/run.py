@@ -0,0 +1,268 @@
+"""
+Benchmark the Neo4jClient methods and the API routes on a synthetic dataset.
+
+Backends:
+  neo4j     load the dataset into the database of the NEO4J_* environment variables, e.g.
+            docker run -p 7687:7687 -e NEO4J_AUTH=neo4j/password neo4j:5.15
+            and time the client methods and the routes against it
+  snapshot  no database: the CSV files are read into the in-memory GraphSnapshot, which
+            stands in for Neo4j behind the same reads and routes
+
+Every step reports latency percentiles, throughput and the peak RSS of the process so far,
+and the results are written as JSON (compare two runs with benchmarks/compare.py).
+
+    python benchmarks/generate_org.py 100k
+    python benchmarks/run.py benchmarks/data/100k --backend snapshot
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+
+BOSS_FILE = "employees-and-their-boss.csv"
+FRIENDS_FILE = "employees-and-their-friends.csv"
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile"""
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def measure(name: str, operation: Callable, repeat: int, warmup: int = 1, items: int = None) -> dict:
+    """Time operation repeat times; items is the work per call (rows) used for the throughput"""
+    for _ in range(warmup):
+        operation()
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    total = sum(latencies)
+    result = {
+        "count": repeat,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(total / repeat * 1000, 3),
+        "ops_per_sec": round(repeat / total, 2) if total else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if items is not None:
+        result["items_per_sec"] = round(items * repeat / total, 1) if total else None
+    print(f"{name:45} p50 {result['p50_ms']:>10.2f} ms  p95 {result['p95_ms']:>10.2f} ms  "
+          f"{result['ops_per_sec'] or 0:>9.2f} ops/s  rss {result['peak_rss_mb']:>8.1f} MB")
+    return result
+
+
+def read_dataset(dataset: str) -> dict:
+    """CSV rows of the dataset, plus a root and a deep employee to run the hierarchy reads from"""
+    def rows(file_name):
+        with open(os.path.join(dataset, file_name), encoding="utf-8") as file:
+            reader = csv.reader(file)
+            next(reader)
+            return [(employee.strip(), other.strip()) for employee, other in reader]
+
+    bosses = rows(BOSS_FILE)
+    friends = [(a, b) for a, b in rows(FRIENDS_FILE) if a != b]
+    employees = {name for employee, boss in bosses for name in (employee, boss)}
+    employees.update(name for pair in friends for name in pair)
+    has_boss = {employee for employee, _ in bosses}
+    roots = sorted({boss for _, boss in bosses} - has_boss)
+    return {
+        "bosses": bosses,
+        "friends": friends,
+        "employees": sorted(employees),
+        "root": roots[0] if roots else None,
+        "leaf": bosses[-1][0] if bosses else None,
+    }
+
+
+def client_operations(client, data: dict) -> dict:
+    """Read operations shared by both backends, client is a Neo4jClient or a GraphSnapshot"""
+    network = getattr(client, "get_employees_with_relationships", None) or client.employees_with_relationships
+    operations = {
+        "get_employees": getattr(client, "get_employees", None) or client.employees,
+        "get_employees_with_relationships": network,
+        "get_employees_with_relationships(limit=100)": lambda: network(limit=100),
+        "get_relationships": getattr(client, "get_relationships", None) or client.relationships,
+    }
+    if hasattr(client, "get_graph_data"):
+        operations["get_graph_data"] = client.get_graph_data
+        operations["get_graph_data(limit=1000)"] = lambda: client.get_graph_data(limit=1000)
+        subtree, chain = client.get_subtree, client.get_chain
+    else:
+        operations["get_graph_data"] = lambda: list(client.iter_graph_data())
+        operations["get_graph_data(limit=1000)"] = lambda: list(client.iter_graph_data(limit=1000))
+        subtree, chain = client.subtree, client.chain
+    if data["root"]:
+        operations["get_subtree(root, max_depth=2)"] = lambda: subtree(data["root"], max_depth=2)
+        operations["get_subtree(root)"] = lambda: subtree(data["root"])
+        operations["get_chain(leaf)"] = lambda: chain(data["leaf"])
+    return operations
+
+
+ROUTES = [
+    "/employees",
+    "/employees-with-relationship",
+    "/employees-with-relationship?limit=100",
+    "/relationships",
+    "/graph",
+    "/graph?limit=1000",
+]
+
+
+def route_operations(http, data: dict, response_cache) -> dict:
+    """GET every route with an empty response cache, and /graph once more as a 304"""
+    def get(path):
+        def operation():
+            response_cache.clear()
+            response = http.get(path)
+            response.raise_for_status()
+        return operation
+
+    paths = list(ROUTES)
+    if data["root"]:
+        paths.append(f"/employees/{data['root']}/subtree?max_depth=2")
+    operations = {f"GET {path}": get(path) for path in paths}
+
+    etag = http.get("/graph").headers["etag"]
+
+    def not_modified():
+        assert http.get("/graph", headers={"If-None-Match": etag}).status_code == 304
+
+    operations["GET /graph (304)"] = not_modified
+    return operations
+
+
+def run_neo4j(dataset: str, data: dict, repeat: int) -> dict:
+    os.environ["DATASET_DIR"] = os.path.abspath(dataset)
+    from fastapi.testclient import TestClient
+    from database import neo4j_client
+    from cache import response_cache
+    from main import app
+
+    results = {}
+    rows = len(data["bosses"]) + len(data["friends"])
+    with TestClient(app) as http:
+        # The serial loaders against the parallel ingest, the last load stays for the reads
+        workers = neo4j_client.ingest_workers
+        neo4j_client.ingest_workers = 1
+        results["load_csv_data (serial)"] = measure("load_csv_data (serial)", neo4j_client.load_csv_data, 1,
+                                                    warmup=0, items=rows)
+        neo4j_client.ingest_workers = max(workers, 4)
+        results[f"load_csv_data ({neo4j_client.ingest_workers} writers)"] = measure(
+            f"load_csv_data ({neo4j_client.ingest_workers} writers)", neo4j_client.load_csv_data, 1, warmup=0, items=rows
+        )
+        for name, operation in client_operations(neo4j_client, data).items():
+            results[name] = measure(name, operation, repeat)
+        for name, operation in route_operations(http, data, response_cache).items():
+            results[name] = measure(name, operation, repeat)
+    return results
+
+
+def run_snapshot(data: dict, repeat: int) -> dict:
+    from fastapi.testclient import TestClient
+    from database import neo4j_client
+    from cache import response_cache
+    from snapshot import GraphSnapshot
+    from main import app
+
+    nodes = [
+        {"element_id": name, "name": name, "emp_id": None, "email": None, "department": None, "position": None}
+        for name in data["employees"]
+    ]
+    edges = [
+        {"from_id": employee, "to_id": other, "rel_type": rel_type, "rel_id": rel_id}
+        for rel_id, (employee, other, rel_type) in enumerate(
+            [(employee, boss, "REPORTS_TO") for employee, boss in data["bosses"]]
+            + [(employee, friend, "FRIENDS_WITH") for employee, friend in data["friends"]]
+        )
+    ]
+
+    results = {}
+    snapshots = []
+
+    def build():
+        snapshots.append(GraphSnapshot(neo4j_client.generation.value, nodes, edges))
+
+    results["build_snapshot"] = measure("build_snapshot", build, 1, warmup=0, items=len(edges))
+    snapshot = snapshots[-1]
+    for name, operation in client_operations(snapshot, data).items():
+        results[name] = measure(name, operation, repeat)
+
+    # The routes read through neo4j_client, point it at the snapshot; no lifespan, no database
+    neo4j_client.snapshot_enabled = True
+    neo4j_client._snapshot = snapshot
+    http = TestClient(app)
+    for name, operation in route_operations(http, data, response_cache).items():
+        results[name] = measure(name, operation, repeat)
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dataset", help="directory holding the two CSV files (see generate_org.py)")
+    parser.add_argument("--backend", choices=["neo4j", "snapshot"], default="neo4j")
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs of every read")
+    parser.add_argument("--output", help="JSON file to write, defaults to benchmarks/results/<backend>-<dataset>-<time>.json")
+    args = parser.parse_args()
+
+    data = read_dataset(args.dataset)
+    print(f"Dataset {args.dataset}: {len(data['employees'])} employees, "
+          f"{len(data['bosses'])} REPORTS_TO, {len(data['friends'])} FRIENDS_WITH")
+    if args.backend == "neo4j":
+        results = run_neo4j(args.dataset, data, args.repeat)
+    else:
+        results = run_snapshot(data, args.repeat)
+
+    now = datetime.now(timezone.utc)
+    dataset_name = os.path.basename(os.path.normpath(args.dataset))
+    output = args.output or os.path.join(
+        os.path.dirname(__file__), "results", f"{args.backend}-{dataset_name}-{now.strftime('%Y%m%dT%H%M%SZ')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump({
+            "meta": {
+                "backend": args.backend,
+                "dataset": dataset_name,
+                "employees": len(data["employees"]),
+                "reports_to": len(data["bosses"]),
+                "friends_with": len(data["friends"]),
+                "repeat": args.repeat,
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "time": now.isoformat(),
+            },
+            "results": results,
+        }, file, indent=2)
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,10 +17,14 @@ const InteractiveNvlWrapper = dynamic(
 // Define interfaces for our graph data
 interface GraphNode {
   id: string
+  element_id?: string
   name?: string
   department?: string
   position?: string
   email?: string
+  // Server-side layout coordinates
+  x?: number
+  y?: number
 }
 
 interface GraphRelationship {
@@ -35,6 +39,85 @@ interface GraphData {
   relationships: GraphRelationship[]
 }
 
+// One page of /api/graph, nodes are paged by name and element id
+interface GraphPage extends GraphData {
+  next_cursor: string | null
+}
+
+const GRAPH_PAGE_SIZE = 2000
+
+// Spacing of the server-side layout (api/layout.py LEVEL_GAP and SLOT_GAP)
+const LEVEL_GAP = 150
+const SLOT_GAP = 60
+
+// One delta of a /api/changes event
+type GraphChange =
+  | { op: 'add_node'; node: GraphNode }
+  | { op: 'remove_node'; id: string }
+  | { op: 'add_relationship'; relationship: GraphRelationship }
+  | { op: 'remove_relationship'; from: string; to: string; type: string }
+
+const sameRelationship = (rel: GraphRelationship, from: string, to: string, type?: string) =>
+  rel.from === from && rel.to === to && rel.type === type
+
+// Apply the deltas of one generation; added nodes are merged into the node with the same id
+const applyChanges = (data: GraphData, changes: GraphChange[]): GraphData => {
+  const nodes = new Map(data.nodes.map((node) => [node.id, node]))
+  let relationships = data.relationships
+  for (const change of changes) {
+    if (change.op === 'add_node') {
+      nodes.set(change.node.id, { ...nodes.get(change.node.id), ...change.node })
+    } else if (change.op === 'remove_node') {
+      nodes.delete(change.id)
+      relationships = relationships.filter((rel) => rel.from !== change.id && rel.to !== change.id)
+    } else if (change.op === 'add_relationship') {
+      const { from, to, type } = change.relationship
+      if (!relationships.some((rel) => sameRelationship(rel, from, to, type))) {
+        relationships = [...relationships, change.relationship]
+      }
+    } else {
+      relationships = relationships.filter((rel) => !sameRelationship(rel, change.from, change.to, change.type))
+    }
+  }
+  return { nodes: [...nodes.values()], relationships }
+}
+
+// Give the nodes without coordinates (added by a change) a place below their boss, or next to
+// a neighbour, while the laid out nodes stay where they are
+const placeNewNodes = (data: GraphData): GraphData => {
+  const unplaced = data.nodes.filter((node) => node.x === undefined)
+  if (unplaced.length === 0 || unplaced.length === data.nodes.length) {
+    return data
+  }
+  const nodes = new Map(data.nodes.map((node) => [node.id, node]))
+  // Right of everything, for nodes without a placed neighbour
+  let freeX = Math.max(...data.nodes.filter((node) => node.x !== undefined).map((node) => node.x as number)) + SLOT_GAP
+  // New nodes placed around each anchor so far, so they do not stack
+  const placedAround = new Map<string, number>()
+  for (const node of unplaced) {
+    const bossId = data.relationships.find((rel) => rel.type === 'REPORTS_TO' && rel.from === node.id)?.to
+    const boss = bossId !== undefined ? nodes.get(bossId) : undefined
+    const neighbour = data.relationships
+      .map((rel) => (rel.from === node.id ? rel.to : rel.to === node.id ? rel.from : undefined))
+      .map((id) => (id !== undefined ? nodes.get(id) : undefined))
+      .find((other) => other?.x !== undefined)
+    const anchor = boss?.x !== undefined ? boss : neighbour
+    if (anchor === undefined) {
+      nodes.set(node.id, { ...node, x: freeX, y: 0 })
+      freeX += SLOT_GAP
+      continue
+    }
+    const count = placedAround.get(anchor.id) ?? 0
+    placedAround.set(anchor.id, count + 1)
+    nodes.set(node.id, {
+      ...node,
+      x: (anchor.x as number) + count * SLOT_GAP,
+      y: (anchor.y as number) + (anchor === boss ? LEVEL_GAP : SLOT_GAP)
+    })
+  }
+  return { ...data, nodes: data.nodes.map((node) => nodes.get(node.id) as GraphNode) }
+}
+
 export default function GraphPage() {
   const [graphData, setGraphData] = useState<GraphData>({ nodes: [], relationships: [] })
   const [loading, setLoading] = useState(true)
@@ -90,21 +173,63 @@ export default function GraphPage() {
     }
   }
 
-  // Fetch graph data from API
+  // Fetch graph data from API, one page at a time, then follow its changes
   useEffect(() => {
+    let changes: EventSource | null = null
+    let cancelled = false
+
+    const followChanges = (generation: string) => {
+      changes = new EventSource(`/api/changes?since=${generation}`)
+      changes.addEventListener('changes', (event) => {
+        const deltas: GraphChange[] = JSON.parse((event as MessageEvent).data)
+        setGraphData((data) => placeNewNodes(applyChanges(data, deltas)))
+      })
+      // Too much changed to patch, load the graph again
+      changes.addEventListener('reset', () => fetchGraphData())
+    }
+
     const fetchGraphData = async () => {
+      changes?.close()
+      changes = null
       try {
         setLoading(true)
-        const response = await fetch('/api/graph')
-        
-        if (!response.ok) {
-          throw new Error(`HTTP error! status: ${response.status}`)
+        const nodes: GraphNode[] = []
+        const relationships: GraphRelationship[] = []
+        const loadedIds = new Set<string>()
+        let after: string | null = null
+        // Generation of the first page, the changes after it are replayed on top of all pages
+        let generation: string | null = null
+
+        do {
+          const params = new URLSearchParams({ limit: String(GRAPH_PAGE_SIZE), layout: 'true' })
+          if (after) {
+            params.set('after', after)
+          }
+          const response = await fetch(`/api/graph?${params}`)
+          
+          if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`)
+          }
+          
+          generation = generation ?? response.headers.get('X-Graph-Generation')
+          const page: GraphPage = await response.json()
+          console.log('Fetched graph page:', page.nodes.length, 'nodes')
+          nodes.push(...page.nodes)
+          page.nodes.forEach((node) => loadedIds.add(node.id))
+          relationships.push(...page.relationships)
+
+          // Only hand NVL the relationships whose both ends are already loaded
+          setGraphData({
+            nodes: [...nodes],
+            relationships: relationships.filter((rel) => loadedIds.has(rel.from) && loadedIds.has(rel.to))
+          })
+          setError(null)
+          setLoading(false)
+          after = page.next_cursor
+        } while (after)
+        if (generation !== null && !cancelled) {
+          followChanges(generation)
         }
-        
-        const data: GraphData = await response.json()
-        console.log('Fetched graph data:', data)
-        setGraphData(data)
-        setError(null)
       } catch (err) {
         console.error('Error fetching graph data:', err)
         setError(err instanceof Error ? err.message : 'Unknown error occurred')
@@ -114,6 +239,10 @@ export default function GraphPage() {
     }
 
     fetchGraphData()
+    return () => {
+      cancelled = true
+      changes?.close()
+    }
   }, [])
 
   // Helper function to get node color based on department
@@ -219,6 +348,8 @@ export default function GraphPage() {
             <InteractiveNvlWrapper
               nodes={graphData.nodes.map(node => ({
                 id: node.id,
+                x: node.x,
+                y: node.y,
                 caption: node.name || node.id,
                 size: 25,
                 color: getNodeColor(node.department),
@@ -245,7 +376,9 @@ export default function GraphPage() {
               mouseEventCallbacks={mouseEventCallbacks}
               onClick={(evt) => console.log('custom click event', evt)}
               nvlOptions={{
-                layout: 'd3Force',
+                // The API lays the graph out (new nodes are placed by placeNewNodes), the browser force
+                // layout is only used when no node has coordinates
+                layout: graphData.nodes.some(node => node.x !== undefined) ? 'free' : 'd3Force',
                 initialZoom: 0.8,
                 disableTelemetry: true,
                 allowDynamicMinZoom: true,